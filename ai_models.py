@@ -2,20 +2,32 @@
 AI模型模块 - 处理与不同AI模型的交互
 """
 from abc import ABC, abstractmethod
+from typing import Optional
 import google.generativeai as genai 
 from openai import OpenAI
-from config import AI_CONFIG
-from utils.logger import setup_logger
+from config import AI_CONFIG, TTS_CONFIG
+from speech.chunker import AdaptiveChunker
+from utils.cancellation import CancellationToken
+from utils.logger import SampledLogger, setup_logger
+from utils.tracing import start_span
 
 # 创建logger实例
 logger = setup_logger(__name__)
+# 流式响应每个片段都会经过，按间隔采样
+chunk_log = SampledLogger(logger)
 
 class BaseAIModel(ABC):
     """AI模型的基类"""
     
     @abstractmethod
-    def generate_response(self, prompt: str) -> str:
-        """生成回复的抽象方法"""
+    def generate_response(self, prompt: str, cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        生成回复的抽象方法
+        
+        Args:
+            prompt: 用户输入
+            cancel_token: 取消令牌，取消后停止生成并返回已生成的部分
+        """
         pass
 
 class DeepseekAI(BaseAIModel):
@@ -40,10 +52,12 @@ class DeepseekAI(BaseAIModel):
             {"role": "system", "content": "你是一个智能助手，请用简洁友好的方式回答问题。"}
         ]
     
-    def generate_response(self, prompt: str) -> str:
-        """使用Deepseek生成回复"""
+    def generate_response(self, prompt: str, cancel_token: Optional[CancellationToken] = None) -> str:
+        """使用Deepseek生成回复（流式接收，取消后立即关闭连接）"""
+        llm_span = None
         try:
-            logger.debug(f"向Deepseek发送请求: {prompt}")
+            logger.debug("向Deepseek发送请求: %s", prompt)
+            llm_span = start_span("llm.generate", model="deepseek-chat", prompt_chars=len(prompt))
             
             # 添加用户消息
             self.messages.append({"role": "user", "content": prompt})
@@ -53,23 +67,50 @@ class DeepseekAI(BaseAIModel):
                 messages=self.messages,
                 temperature=0.7,
                 max_tokens=2000,
-                stream=False
+                stream=True
             )
             
+            parts = []
+            try:
+                for chunk in response:
+                    if cancel_token and cancel_token.cancelled:
+                        logger.info("Deepseek生成已取消")
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts:
+                            llm_span.add_event("first_token")
+                        parts.append(chunk.choices[0].delta.content)
+                        chunk_log.debug("收到Deepseek响应片段，累计 %s 段", len(parts),
+                                        extra={"event": "llm.chunk", "model": "deepseek"})
+            finally:
+                # 关闭HTTP连接，取消时不再接收后续token
+                response.close()
+            
+            result = "".join(parts).strip()
+            llm_span.set_attribute("response_chars", len(result))
+            
+            if cancel_token and cancel_token.cancelled:
+                llm_span.set_attribute("cancelled", True)
+                llm_span.end()
+                # 被中断的一轮不写入历史，避免不完整的回复影响后续对话
+                self.messages.pop()
+                return result
+            
             # 添加错误处理和日志
-            if not response or not response.choices:
+            if not result:
                 raise ValueError("API返回空响应")
             
-            result = response.choices[0].message.content.strip()
-            
             # 添加助手回复到消息历史
             self.messages.append({"role": "assistant", "content": result})
             
-            logger.debug(f"Deepseek响应: {result}")
+            logger.debug("Deepseek响应: %s", result)
+            llm_span.end()
             return result
             
         except Exception as e:
-            logger.error(f"Deepseek API调用失败: {str(e)}")
+            logger.error("Deepseek API调用失败: %s", e)
+            if llm_span is not None:
+                llm_span.end(error=e)
             raise
 
 class GeminiAI(BaseAIModel):
@@ -112,51 +153,46 @@ graph TD
         
         # 用于语音合成的回调函数
         self.tts_callback = None
+        # 把流式输出切分为语音合成片段
+        self.chunker = AdaptiveChunker(
+            first_chunk_chars=TTS_CONFIG["first_chunk_chars"],
+            min_chunk_chars=TTS_CONFIG["min_chunk_chars"],
+            max_chunk_chars=TTS_CONFIG["max_chunk_chars"],
+            max_hold_seconds=TTS_CONFIG["max_hold_seconds"]
+        )
     
     def reset_chat(self):
         """重置聊天会话"""
         self.chat = self.model.start_chat(history=[])
         logger.info("重置聊天会话")
     
-    def set_tts_callback(self, callback):
-        """设置语音合成回调函数"""
-        self.tts_callback = callback
+    def _discard_last_exchange(self):
+        """从聊天历史中移除被中断的一轮对话，避免不完整的回复破坏历史"""
+        try:
+            self.chat.rewind()
+        except Exception as e:
+            logger.warning("移除中断的对话失败，重置会话: %s", e)
+            self.reset_chat()
     
-    def _split_into_sentences(self, text: str) -> list:
+    def set_tts_callback(self, callback):
         """
-        将文本分割成句子
+        设置语音合成回调函数
         
         Args:
-            text: 要分割的文本
-            
-        Returns:
-            list: 句子列表
+            callback: callback(text, cancel_token)，令牌为生成该句子的一轮对话的令牌
         """
-        # 使用常见的中文和英文标点符号作为分隔符
-        delimiters = ['。', '！', '？', '；', '.', '!', '?', ';']
-        sentences = []
-        current = []
-        
-        for char in text:
-            current.append(char)
-            if char in delimiters:
-                sentences.append(''.join(current))
-                current = []
-        
-        # 处理最后一个不完整的句子
-        if current:
-            sentences.append(''.join(current))
-        
-        return sentences
+        self.tts_callback = callback
     
-    def generate_response(self, prompt: str) -> str:
+    def generate_response(self, prompt: str, cancel_token: Optional[CancellationToken] = None) -> str:
         """使用Gemini生成回复（流式输出）"""
         max_retries = 3
         retry_count = 0
         
         while retry_count < max_retries:
+            llm_span = start_span("llm.generate", model="gemini-2.0-flash-exp",
+                                  prompt_chars=len(prompt), attempt=retry_count + 1)
             try:
-                logger.debug(f"向Gemini发送请求: {prompt}")
+                logger.debug("向Gemini发送请求: %s", prompt)
                 
                 generation_config = {
                     "temperature": 0.7,
@@ -194,7 +230,7 @@ graph TD
                 
                 # 收集并显示流式响应
                 full_response = []
-                current_sentence = []
+                self.chunker.reset()
                 
                 # 创建一个 Live 上下文用于动态更新 Markdown
                 from rich.live import Live
@@ -204,43 +240,55 @@ graph TD
                 console = Console()
                 console.print("\nJarvis:")
                 
+                cancelled = False
                 with Live(console=console, refresh_per_second=4) as live:
                     for chunk in response:
+                        if cancel_token and cancel_token.cancelled:
+                            # 停止读取流式响应，不再为被放弃的回答消耗token
+                            cancelled = True
+                            break
                         if chunk.text:
+                            if not full_response:
+                                llm_span.add_event("first_token")
                             full_response.append(chunk.text)
-                            current_sentence.append(chunk.text)
+                            chunk_log.debug("收到Gemini响应片段，累计 %s 段", len(full_response),
+                                            extra={"event": "llm.chunk", "model": "gemini"})
                             
-                            # 检查是否有完整的句子
-                            current_text = ''.join(current_sentence)
-                            sentences = self._split_into_sentences(current_text)
-                            
-                            if len(sentences) > 1:  # 有完整的句子
-                                # 保留最后一个不完整的句子
-                                current_sentence = [sentences[-1]]
-                                
-                                # 对完整的句子进行语音合成
-                                if self.tts_callback:
-                                    for sentence in sentences[:-1]:
-                                        self.tts_callback(sentence)
+                            # 对已经可以合成的片段进行语音合成
+                            for piece in self.chunker.feed(chunk.text):
+                                if self.tts_callback and piece.strip():
+                                    llm_span.add_event("sentence", chars=len(piece))
+                                    self.tts_callback(piece, cancel_token)
                             
                             # 实时更新 Markdown 渲染
                             current_response = "".join(full_response)
                             live.update(Markdown(current_response))
                 
-                # 处理最后一个句子
-                if current_sentence and self.tts_callback:
-                    last_sentence = ''.join(current_sentence)
-                    if last_sentence.strip():
-                        self.tts_callback(last_sentence)
+                if cancelled:
+                    self.chunker.discard()
+                    self._discard_last_exchange()
+                    logger.info("Gemini生成已取消")
+                    llm_span.set_attribute("cancelled", True)
+                    llm_span.end()
+                    return "".join(full_response).strip()
+                
+                # 处理剩余的文本
+                for piece in self.chunker.flush():
+                    if self.tts_callback and piece.strip():
+                        llm_span.add_event("sentence", chars=len(piece))
+                        self.tts_callback(piece, cancel_token)
                 
                 # 合并所有响应
                 result = "".join(full_response).strip()
-                logger.debug(f"Gemini响应: {result}")
+                logger.debug("Gemini响应: %s", result)
+                llm_span.set_attribute("response_chars", len(result))
+                llm_span.end()
                 return result
                 
             except Exception as e:
+                llm_span.end(error=e)
                 retry_count += 1
-                logger.error(f"Gemini API调用失败 (尝试 {retry_count}/{max_retries}): {str(e)}")
+                logger.error("Gemini API调用失败 (尝试 %s/%s): %s", retry_count, max_retries, e)
                 
                 if "Unable to build a coherent chat history" in str(e):
                     # 重置聊天会话
@@ -250,7 +298,7 @@ graph TD
                     
                 if retry_count >= max_retries:
                     error_msg = "抱歉，AI响应出现问题。我已重置对话，请重新输入您的问题。"
-                    logger.error(f"达到最大重试次数: {str(e)}")
+                    logger.error("达到最大重试次数: %s", e)
                     return error_msg
                     
             # 短暂延迟后重试
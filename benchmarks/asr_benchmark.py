@@ -0,0 +1,220 @@
+"""
+语音识别基准测试 - 对比不同模型大小和后端的准确率与速度
+
+对 fixtures/asr 中的本地中英文音频样本运行 WhisperRecognizer，统计:
+- 字错率 (CER)
+- 实时率 (RTF = 识别耗时 / 音频时长)
+- 峰值内存 (RSS)
+- 模型加载耗时
+
+每个 (后端, 模型, 语言) 组合在独立进程中运行，保证峰值内存互不影响。
+结果写入 benchmarks/results/asr_<时间>.json，便于跟踪性能回归。
+
+用法:
+    python -m benchmarks.asr_benchmark --models tiny base small --backends whisper faster-whisper
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "asr"
+RESULT_DIR = Path(__file__).parent / "results"
+
+console = Console()
+
+
+def normalize_text(text: str) -> str:
+    """去掉标点和空白并统一大小写，只比较文字内容"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
+    return re.sub(r"\s+", "", text)
+
+
+def edit_distance(reference: str, hypothesis: str) -> int:
+    """计算两个字符串的编辑距离"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,                          # 删除
+                current[j - 1] + 1,                       # 插入
+                previous[j - 1] + (ref_char != hyp_char)  # 替换
+            )
+        previous = current
+    return previous[-1]
+
+
+def load_manifest() -> list:
+    """读取样本清单，并校验随仓库提供的音频与清单中的 sha256 一致"""
+    entries = []
+    with open(FIXTURE_DIR / "manifest.jsonl", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+
+    for entry in entries:
+        path = FIXTURE_DIR / entry["audio"]
+        if not path.exists():
+            raise FileNotFoundError(f"缺少音频样本: {path}")
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        if digest != entry["sha256"]:
+            # 样本不同的结果之间没有可比性
+            raise ValueError(f"音频样本校验失败: {entry['audio']}，"
+                             f"请恢复仓库中的文件或运行 python -m benchmarks.generate_asr_fixtures")
+    return entries
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(backend: str, model_name: str, language: str, entries: list) -> dict:
+    """在子进程中加载模型并识别一种语言的全部样本"""
+    from speech.audio import WHISPER_SAMPLE_RATE, load_audio
+    from speech.recognizer import WhisperRecognizer
+
+    # 先解码音频，避免把解码时间计入识别耗时
+    samples = [(entry, load_audio(str(FIXTURE_DIR / entry["audio"]))) for entry in entries]
+
+    start = time.perf_counter()
+    recognizer = WhisperRecognizer(model_name=model_name, language=language, backend=backend)
+    load_time = time.perf_counter() - start
+
+    # 预热一次，排除首次推理的初始化开销
+    recognizer.transcribe_audio(samples[0][1])
+
+    errors = 0
+    reference_chars = 0
+    audio_seconds = 0.0
+    processing_seconds = 0.0
+    details = []
+    for entry, audio in samples:
+        start = time.perf_counter()
+        hypothesis = recognizer.transcribe_audio(audio)
+        elapsed = time.perf_counter() - start
+
+        reference = normalize_text(entry["text"])
+        distance = edit_distance(reference, normalize_text(hypothesis))
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        errors += distance
+        reference_chars += len(reference)
+        audio_seconds += duration
+        processing_seconds += elapsed
+        details.append({
+            "audio": entry["audio"],
+            "reference": entry["text"],
+            "hypothesis": hypothesis,
+            "cer": distance / max(len(reference), 1),
+            "duration": duration,
+            "rtf": elapsed / duration,
+        })
+
+    return {
+        "backend": backend,
+        "model": model_name,
+        "language": language,
+        "samples": len(samples),
+        "cer": errors / max(reference_chars, 1),
+        "rtf": processing_seconds / audio_seconds,
+        "load_time": load_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "details": details,
+    }
+
+
+def run_benchmark(models: list, backends: list) -> list:
+    """
+    依次运行所有组合
+
+    Args:
+        models: 模型名称列表
+        backends: 后端名称列表
+
+    Returns:
+        list: 每个组合的结果
+    """
+    entries = load_manifest()
+    languages = sorted({entry["language"] for entry in entries})
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    for backend in backends:
+        for model_name in models:
+            for language in languages:
+                cases = [e for e in entries if e["language"] == language]
+                console.print(f"[cyan]测试 {backend}/{model_name} ({language}, {len(cases)} 条)...[/cyan]")
+                try:
+                    with context.Pool(1) as pool:
+                        result = pool.apply(_run_case, (backend, model_name, language, cases))
+                except Exception as e:
+                    console.print(f"[red]{backend}/{model_name} 测试失败: {str(e)}[/red]")
+                    result = {"backend": backend, "model": model_name,
+                              "language": language, "error": str(e)}
+                results.append(result)
+    return results
+
+
+def print_results(results: list):
+    """以表格形式输出结果"""
+    table = Table(title="语音识别基准测试")
+    for column in ["后端", "模型", "语言", "CER", "RTF", "加载耗时", "峰值内存"]:
+        table.add_column(column)
+    for r in results:
+        if "error" in r:
+            table.add_row(r["backend"], r["model"], r["language"], "[red]失败[/red]", "", "", "")
+            continue
+        table.add_row(
+            r["backend"], r["model"], r["language"],
+            f"{r['cer']:.2%}", f"{r['rtf']:.3f}",
+            f"{r['load_time']:.1f}秒", f"{r['peak_rss_mb']:.0f}MB"
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音识别基准测试")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"],
+                        help="要测试的模型大小")
+    parser.add_argument("--backends", nargs="+", default=["whisper"],
+                        help="要测试的后端 (whisper / faster-whisper)")
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.models, args.backends)
+    print_results(results)
+
+    output = Path(args.output) if args.output else \
+        RESULT_DIR / f"asr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    console.print(f"[green]结果已保存到 {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
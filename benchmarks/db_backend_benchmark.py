@@ -0,0 +1,139 @@
+"""
+数据库后端基准测试 - 对比 SQLite 与 MySQL 的写入和查询吞吐量
+
+每个后端使用独立的测试数据库，依次测量:
+- single_insert: 逐条 save_chat（每条一个事务）
+- batch_insert: save_chats 每批50条（与后台写入器相同的方式）
+- session_history: 按会话查询最近10条
+- recent_history: 查询全部会话最近10条
+- stats: 从汇总表读取统计信息
+
+结果写入 benchmarks/results/db_backend_<时间>.json。
+注意: MySQL 测试数据库会被删除后重建，不要指向正在使用的数据库。
+
+用法:
+    python -m benchmarks.db_backend_benchmark --backends sqlite mysql --rows 20000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from config import DB_CONFIG
+
+RESULT_DIR = Path(__file__).parent / "results"
+
+console = Console()
+
+
+def open_sqlite(workdir: Path):
+    from utils.sqlite_database import SQLiteDatabase
+    return SQLiteDatabase(str(workdir / "benchmark.db"))
+
+
+def open_mysql(database: str):
+    import mysql.connector
+    from utils.mysql_database import MySQLDatabase
+
+    if database == DB_CONFIG["database"]:
+        raise ValueError("测试数据库不能与正在使用的数据库相同")
+    server = mysql.connector.connect(**{key: DB_CONFIG[key] for key in ("host", "port", "user", "password")})
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.close()
+    server.close()
+    # 连接池在首次创建数据库实例时按 DB_CONFIG 初始化
+    DB_CONFIG["database"] = database
+    return MySQLDatabase()
+
+
+def make_records(count: int, sessions: list, rng: random.Random) -> list:
+    start = datetime.now() - timedelta(days=30)
+    return [
+        (rng.choice(sessions), start + timedelta(seconds=rng.randrange(30 * 24 * 3600)),
+         rng.choice(("text", "voice")), "今天天气怎么样？" * rng.randint(1, 4),
+         "今天北京天气晴朗，最高气温二十五度。" * rng.randint(1, 8),
+         rng.choice(("GeminiAI", "DeepseekAI")), rng.uniform(0.5, 8.0))
+        for _ in range(count)
+    ]
+
+
+def timed(operation, repeats: int) -> float:
+    """执行 repeats 次，返回每秒次数"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        operation()
+    return repeats / (time.perf_counter() - start)
+
+
+def _single_args(record: tuple) -> tuple:
+    session_id, _, input_type, user_input, ai_response, model_used, response_time = record
+    return session_id, input_type, user_input, ai_response, model_used, response_time
+
+
+def run(db, rows: int, single: int, queries: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    sessions = [f"bench-{i:04d}" for i in range(200)]
+    results = {}
+
+    records = make_records(single, sessions, rng)
+    it = iter(records)
+    results["single_insert"] = timed(lambda: db.save_chat(*_single_args(next(it))), single)
+
+    records = make_records(rows, sessions, rng)
+    batches = [records[i:i + 50] for i in range(0, rows, 50)]
+    it = iter(batches)
+    results["batch_insert"] = timed(lambda: db.save_chats(next(it)), len(batches)) * 50
+
+    results["session_history"] = timed(
+        lambda: db.get_chat_history(session_id=rng.choice(sessions), limit=10), queries)
+    results["recent_history"] = timed(lambda: db.get_chat_history(limit=10), queries)
+    results["stats"] = timed(lambda: db.get_session_stats(), queries)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库后端基准测试")
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "mysql"], choices=["sqlite", "mysql"])
+    parser.add_argument("--rows", type=int, default=20000, help="批量写入的记录数")
+    parser.add_argument("--single", type=int, default=1000, help="逐条写入的记录数")
+    parser.add_argument("--queries", type=int, default=500, help="每种查询的执行次数")
+    parser.add_argument("--mysql-database", default="jarvis_chat_benchmark", help="MySQL测试数据库名（会被重建）")
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backends:
+            console.print(f"[cyan]测试 {backend}...[/cyan]")
+            db = open_sqlite(Path(workdir)) if backend == "sqlite" else open_mysql(args.mysql_database)
+            try:
+                results[backend] = run(db, args.rows, args.single, args.queries)
+            finally:
+                db.close()
+
+    table = Table(title="数据库后端吞吐量（次/秒，写入为行/秒）")
+    table.add_column("操作")
+    for backend in results:
+        table.add_column(backend)
+    for operation in next(iter(results.values())):
+        table.add_row(operation, *(f"{results[b][operation]:,.0f}" for b in results))
+    console.print(table)
+
+    output = Path(args.output) if args.output else \
+        RESULT_DIR / f"db_backend_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "rows": args.rows, "single": args.single,
+                   "queries": args.queries, "results": results}, f, ensure_ascii=False, indent=2)
+    console.print(f"[green]结果已保存到 {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
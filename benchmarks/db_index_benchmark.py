@@ -0,0 +1,192 @@
+"""
+对话历史索引基准测试 - 对比添加索引前后的查询延迟
+
+在独立的测试数据库中生成指定行数（默认100万行）的 chat_history，先只应用
+迁移1（仅主键）测量，再只应用迁移2（索引）重新测量，之后的迁移（统计汇总、
+全文索引等）不参与对比:
+- session_history: 按会话查询最近10条（get_chat_history(session_id=...)）
+- recent_history: 查询全部会话最近10条（get_chat_history()）
+- clear_session: 按会话删除（clear_history(session_id=...)，测量后回滚）
+
+结果写入 benchmarks/results/db_index_<时间>.json。
+注意: 测试数据库会被删除后重建，不要指向正在使用的数据库。
+
+用法:
+    python -m benchmarks.db_index_benchmark --rows 1000000 --database jarvis_chat_benchmark
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import mysql.connector
+from rich.console import Console
+from rich.progress import Progress
+from rich.table import Table
+
+from config import DB_CONFIG
+from utils.migrations import MIGRATIONS, apply_migrations
+
+RESULT_DIR = Path(__file__).parent / "results"
+
+# 添加索引的迁移，"索引后"只升级到这个版本
+INDEX_MIGRATION_VERSION = 2
+
+QUERIES = {
+    "session_history": (
+        "SELECT * FROM chat_history WHERE session_id = %s ORDER BY timestamp DESC, id DESC LIMIT 10",
+        True,
+    ),
+    "recent_history": (
+        "SELECT * FROM chat_history ORDER BY timestamp DESC, id DESC LIMIT 10",
+        False,
+    ),
+    "clear_session": (
+        "DELETE FROM chat_history WHERE session_id = %s",
+        True,
+    ),
+}
+
+console = Console()
+
+
+def connect(database: str = None):
+    config = {key: DB_CONFIG[key] for key in ("host", "port", "user", "password")}
+    if database:
+        config["database"] = database
+    return mysql.connector.connect(**config)
+
+
+def populate(conn, rows: int, sessions: int, batch_size: int = 5000, seed: int = 0) -> list:
+    """生成测试数据，返回会话ID列表"""
+    rng = random.Random(seed)
+    session_ids = [f"bench-{i:06d}" for i in range(sessions)]
+    start = datetime.now() - timedelta(days=365)
+    query = """
+        INSERT INTO chat_history
+        (session_id, timestamp, input_type, user_input, ai_response, model_used, response_time)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+    cursor = conn.cursor()
+    with Progress(console=console) as progress:
+        task = progress.add_task("生成测试数据", total=rows)
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for _ in range(min(batch_size, rows - offset)):
+                batch.append((
+                    rng.choice(session_ids),
+                    start + timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                    rng.choice(("text", "voice")),
+                    "今天天气怎么样？" * rng.randint(1, 4),
+                    "今天北京天气晴朗，最高气温二十五度。" * rng.randint(1, 8),
+                    rng.choice(("GeminiAI", "DeepseekAI")),
+                    rng.uniform(0.5, 8.0),
+                ))
+            cursor.executemany(query, batch)
+            conn.commit()
+            progress.advance(task, len(batch))
+    cursor.close()
+    return session_ids
+
+
+def explain(conn, sql: str, params: tuple) -> str:
+    """返回查询计划使用的索引和访问方式"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"EXPLAIN {sql}", params)
+    plan = cursor.fetchall()[0]
+    cursor.close()
+    return f"{plan['type']}/{plan['key'] or '-'}"
+
+
+def measure(conn, session_ids: list, repeats: int, seed: int = 1) -> dict:
+    """每种查询执行 repeats 次，返回延迟统计（毫秒）"""
+    rng = random.Random(seed)
+    results = {}
+    for name, (sql, per_session) in QUERIES.items():
+        cursor = conn.cursor()
+        samples = []
+        plan = None
+        for _ in range(repeats):
+            params = (rng.choice(session_ids),) if per_session else ()
+            if plan is None:
+                plan = explain(conn, sql, params)
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            if cursor.with_rows:
+                cursor.fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+            # 删除只用于测量，不改变数据
+            conn.rollback()
+        cursor.close()
+        samples.sort()
+        results[name] = {
+            "plan": plan,
+            "p50_ms": statistics.median(samples),
+            "p90_ms": samples[min(len(samples) - 1, int(0.9 * len(samples)))],
+            "max_ms": samples[-1],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话历史索引基准测试")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="生成的记录数")
+    parser.add_argument("--sessions", type=int, default=2000, help="会话数量")
+    parser.add_argument("--repeats", type=int, default=20, help="每种查询的执行次数")
+    parser.add_argument("--database", default="jarvis_chat_benchmark", help="测试数据库名（会被重建）")
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    if args.database == DB_CONFIG["database"]:
+        parser.error("测试数据库不能与正在使用的数据库相同")
+
+    server = connect()
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    conn = connect(args.database)
+    try:
+        # 只应用第一个迁移：仅有主键的原始表结构
+        apply_migrations(conn, target_version=MIGRATIONS[0].version)
+        session_ids = populate(conn, args.rows, args.sessions)
+
+        console.print("[cyan]测量无索引时的查询延迟...[/cyan]")
+        before = measure(conn, session_ids, args.repeats)
+
+        start = time.perf_counter()
+        version = apply_migrations(conn, target_version=INDEX_MIGRATION_VERSION)
+        migration_seconds = time.perf_counter() - start
+        console.print(f"[cyan]迁移到版本 {version} 耗时 {migration_seconds:.1f}秒，测量有索引时的查询延迟...[/cyan]")
+        after = measure(conn, session_ids, args.repeats)
+    finally:
+        conn.close()
+
+    table = Table(title=f"chat_history 查询延迟（{args.rows:,} 行，毫秒）")
+    for column in ["查询", "索引前P50", "索引后P50", "加速", "索引前计划", "索引后计划"]:
+        table.add_column(column)
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        table.add_row(name, f"{b['p50_ms']:.2f}", f"{a['p50_ms']:.2f}",
+                      f"{b['p50_ms'] / a['p50_ms']:.0f}x" if a["p50_ms"] else "-",
+                      b["plan"], a["plan"])
+    console.print(table)
+
+    output = Path(args.output) if args.output else \
+        RESULT_DIR / f"db_index_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "rows": args.rows,
+                   "sessions": args.sessions, "repeats": args.repeats,
+                   "migration_seconds": migration_seconds, "schema_version": version,
+                   "before": before, "after": after}, f, ensure_ascii=False, indent=2)
+    console.print(f"[green]结果已保存到 {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
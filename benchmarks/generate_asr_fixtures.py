@@ -0,0 +1,126 @@
+"""
+生成语音识别基准测试使用的音频样本
+
+音频样本（16kHz 单声道 FLAC）和 sha256 校验值已随仓库提供，基准测试不需要运行本脚本。
+修改 fixtures/asr/manifest.jsonl 中的参考文本后，用本脚本重新生成音频并更新校验值。
+
+样本使用离线的 espeak-ng 合成（通过 espeakng-loader 获取，不需要联网），
+同样的文本和 espeak-ng 版本得到同样的音频；带 noise_snr_db 的样本
+按固定随机种子叠加噪声。这是合成语音，只用于比较模型和后端之间的相对差异，
+字错率不代表真实录音上的表现。
+
+用法:
+    pip install espeakng-loader
+    python -m benchmarks.generate_asr_fixtures
+"""
+import ctypes
+import hashlib
+import json
+import zlib
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from speech.audio import WHISPER_SAMPLE_RATE, resample
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "asr"
+
+# 每种语言使用的 espeak-ng 声音
+VOICES = {
+    "zh": "cmn",
+    "en": "en-us",
+}
+
+# espeak-ng 常量
+AUDIO_OUTPUT_RETRIEVAL = 1
+POS_CHARACTER = 1
+ESPEAK_CHARS_UTF8 = 1
+
+
+class EspeakSynthesizer:
+    """通过 ctypes 调用 espeak-ng，把文本合成为 PCM"""
+
+    def __init__(self):
+        try:
+            import espeakng_loader
+        except ImportError as e:
+            raise ImportError("生成音频样本需要先安装: pip install espeakng-loader") from e
+
+        self._lib = ctypes.CDLL(espeakng_loader.get_library_path())
+        self.sample_rate = self._lib.espeak_Initialize(
+            AUDIO_OUTPUT_RETRIEVAL, 0, espeakng_loader.get_data_path().encode(), 0
+        )
+        if self.sample_rate <= 0:
+            raise RuntimeError("espeak-ng 初始化失败")
+        self._chunks = []
+        callback_type = ctypes.CFUNCTYPE(
+            ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p
+        )
+        # 保留引用，避免回调被回收
+        self._callback = callback_type(self._on_samples)
+        self._lib.espeak_SetSynthCallback(self._callback)
+
+    def _on_samples(self, wav, num_samples, events):
+        if num_samples > 0:
+            self._chunks.append(np.ctypeslib.as_array(wav, (num_samples,)).copy())
+        return 0
+
+    def synthesize(self, text: str, voice: str) -> np.ndarray:
+        """
+        合成一段文本
+
+        Args:
+            text: 文本
+            voice: espeak-ng 声音名称
+
+        Returns:
+            np.ndarray: 16kHz 单声道 float32 音频
+        """
+        if self._lib.espeak_SetVoiceByName(voice.encode()) != 0:
+            raise ValueError(f"espeak-ng 不支持的声音: {voice}")
+        self._chunks = []
+        data = text.encode("utf-8")
+        self._lib.espeak_Synth(data, len(data) + 1, 0, POS_CHARACTER, 0, ESPEAK_CHARS_UTF8, None, None)
+        self._lib.espeak_Synchronize()
+        audio = np.concatenate(self._chunks).astype(np.float32) / 32768.0
+        return resample(audio, self.sample_rate, WHISPER_SAMPLE_RATE)
+
+
+def add_noise(audio: np.ndarray, snr_db: float, seed: int) -> np.ndarray:
+    """按固定随机种子叠加白噪声，信噪比为 snr_db"""
+    rng = np.random.default_rng(seed)
+    signal_power = float(np.mean(audio ** 2))
+    noise = rng.standard_normal(len(audio)).astype(np.float32)
+    noise *= np.sqrt(signal_power / 10 ** (snr_db / 10))
+    return np.clip(audio + noise, -1.0, 1.0)
+
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def main():
+    manifest = FIXTURE_DIR / "manifest.jsonl"
+    with open(manifest, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    synthesizer = EspeakSynthesizer()
+    for entry in entries:
+        audio = synthesizer.synthesize(entry["text"], VOICES[entry["language"]])
+        if entry.get("noise_snr_db") is not None:
+            # 种子取自文件名，每个样本的噪声固定
+            audio = add_noise(audio, entry["noise_snr_db"], zlib.crc32(entry["audio"].encode()))
+        audio_path = FIXTURE_DIR / entry["audio"]
+        sf.write(audio_path, audio, WHISPER_SAMPLE_RATE, format="FLAC", subtype="PCM_16")
+        entry["sha256"] = file_sha256(audio_path)
+        print(f"已生成: {audio_path.name} ({len(audio) / WHISPER_SAMPLE_RATE:.1f}秒)")
+
+    with open(manifest, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"已更新校验值: {manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+语音合成基准测试 - 测量每句话的合成开销
+
+对比两种调用方式:
+- asyncio-run: 每句话调用一次 asyncio.run（旧实现）
+- persistent: 使用 EdgeTTSSynthesizer 的常驻事件循环
+
+统计每句话的首个音频块延迟和总耗时，结果写入 benchmarks/results/tts_<时间>.json。
+加上 --playback 时还会经过播放器（ffmpeg 解码 + 空输出）测量首个PCM到达的延迟。
+需要联网访问 Edge TTS 服务。
+
+用法:
+    python -m benchmarks.tts_benchmark --rounds 3 --playback
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from config import TTS_CONFIG
+from speech.player import NullAudioSink, StreamingAudioPlayer
+from speech.synthesizer import EdgeTTSSynthesizer
+
+RESULT_DIR = Path(__file__).parent / "results"
+
+SENTENCES = [
+    "好的。",
+    "今天北京天气晴朗，最高气温二十五度。",
+    "我已经为您设置了明天早上七点的闹钟。",
+    "抱歉，我没有听清楚，请您再说一遍。",
+    "这是一个比较长的句子，用来测试较长文本的合成耗时，以及首个音频块返回的速度。",
+]
+
+console = Console()
+
+
+async def _measure(synthesizer: EdgeTTSSynthesizer, text: str) -> dict:
+    """合成一句话，返回首块延迟和总耗时"""
+    start = time.perf_counter()
+    first_chunk = None
+    size = 0
+    async for chunk in synthesizer.stream(text):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        size += len(chunk)
+    return {"first_chunk": first_chunk, "total": time.perf_counter() - start, "bytes": size}
+
+
+def run_asyncio_run(synthesizer: EdgeTTSSynthesizer, text: str) -> dict:
+    """旧实现：每句话新建并销毁一个事件循环"""
+    start = time.perf_counter()
+    result = asyncio.run(_measure(synthesizer, text))
+    result["total"] = time.perf_counter() - start
+    return result
+
+
+def run_persistent(synthesizer: EdgeTTSSynthesizer, text: str) -> dict:
+    """新实现：在常驻事件循环中执行"""
+    start = time.perf_counter()
+    result = synthesizer._run(_measure(synthesizer, text))
+    result["total"] = time.perf_counter() - start
+    return result
+
+
+def run_playback(synthesizer: EdgeTTSSynthesizer, player: StreamingAudioPlayer, text: str) -> dict:
+    """合成并解码一句话，首块延迟为首个PCM写入音频输出的时间"""
+    sink = player.sink
+    sink.reset()
+    start = time.perf_counter()
+    size = 0
+    for chunk in synthesizer.open_stream(text):
+        player.write(chunk)
+        size += len(chunk)
+    # 解码器在读取线程中输出，等待首个PCM到达
+    sink.audio_received.wait(timeout=10)
+    first_pcm = sink.first_write_at - start if sink.first_write_at is not None else None
+    return {"first_chunk": first_pcm, "total": time.perf_counter() - start, "bytes": size}
+
+
+MODES = {
+    "asyncio-run": run_asyncio_run,
+    "persistent": run_persistent,
+}
+
+
+def summarize(samples: list) -> dict:
+    """计算延迟的中位数和P90"""
+    def percentile(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    first = [s["first_chunk"] for s in samples if s["first_chunk"] is not None]
+    total = [s["total"] for s in samples]
+    return {
+        "sentences": len(samples),
+        "first_chunk_p50": statistics.median(first) if first else None,
+        "first_chunk_p90": percentile(first, 0.9) if first else None,
+        "total_p50": statistics.median(total),
+        "total_p90": percentile(total, 0.9),
+        "total_mean": statistics.mean(total),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音合成基准测试")
+    parser.add_argument("--rounds", type=int, default=3, help="每种方式重复的轮数")
+    parser.add_argument("--voice", default="zh-CN-XiaoxiaoNeural", help="合成声音")
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    parser.add_argument("--playback", action="store_true", help="同时测量经过解码播放器的首个PCM延迟")
+    args = parser.parse_args()
+
+    # 关闭缓存，测量的是真实的网络合成开销
+    synthesizer = EdgeTTSSynthesizer(voice=args.voice, use_cache=False)
+    # 预热一次，排除DNS解析等一次性开销
+    synthesizer.text_to_speech("你好", str(synthesizer.output_dir / "benchmark_warmup.mp3"))
+
+    results = {}
+    try:
+        for mode, run in MODES.items():
+            samples = []
+            for _ in range(args.rounds):
+                for text in SENTENCES:
+                    samples.append(run(synthesizer, text))
+            results[mode] = {"summary": summarize(samples), "samples": samples}
+
+        if args.playback:
+            player = StreamingAudioPlayer(NullAudioSink(TTS_CONFIG["playback_sample_rate"]))
+            try:
+                samples = []
+                for _ in range(args.rounds):
+                    for text in SENTENCES:
+                        samples.append(run_playback(synthesizer, player, text))
+                results["playback"] = {"summary": summarize(samples), "samples": samples}
+            finally:
+                player.close()
+    finally:
+        synthesizer.close()
+
+    table = Table(title="语音合成每句耗时（秒）")
+    for column in ["方式", "首块P50", "首块P90", "总耗时P50", "总耗时P90"]:
+        table.add_column(column)
+    for mode, result in results.items():
+        s = result["summary"]
+        table.add_row(mode, f"{s['first_chunk_p50']:.3f}", f"{s['first_chunk_p90']:.3f}",
+                      f"{s['total_p50']:.3f}", f"{s['total_p90']:.3f}")
+    console.print(table)
+
+    output = Path(args.output) if args.output else \
+        RESULT_DIR / f"tts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "voice": args.voice,
+                   "rounds": args.rounds, "results": results}, f, ensure_ascii=False, indent=2)
+    console.print(f"[green]结果已保存到 {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,4 +19,115 @@ AI_CONFIG = {
 }
 
 # 默认使用的AI模型
-DEFAULT_AI_MODEL = "gemini" 
\ No newline at end of file
+DEFAULT_AI_MODEL = "gemini" 
+
+# 数据库配置
+DB_CONFIG = {
+    # 存储后端: "mysql" 或 "sqlite" (嵌入式，无需数据库服务器)
+    "backend": os.getenv("DB_BACKEND", "mysql"),
+    "sqlite_path": os.getenv("DB_SQLITE_PATH", "data/jarvis.db"),
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "88888888"),
+    "database": os.getenv("DB_NAME", "jarvis_chat"),
+    # 进程内共享的连接池大小，以及连接池耗尽时等待空闲连接的最长时间（秒）
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    # 后台批量写入：每批最多条数、攒批等待时间（秒）、队列上限和失败重试次数
+    "write_batch_size": int(os.getenv("DB_WRITE_BATCH_SIZE", "50")),
+    "write_flush_interval": float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.5")),
+    "write_queue_size": int(os.getenv("DB_WRITE_QUEUE_SIZE", "1000")),
+    "write_max_retries": int(os.getenv("DB_WRITE_MAX_RETRIES", "5")),
+    # 保留策略：记录在主表中保留的天数（默认 0，不归档），更早的记录压缩后移入归档表；
+    # 归档后的记录不再出现在历史记录、全文检索和导出中，只能通过 get_archived_history 读取；
+    # 后台每隔 archive_interval 秒分批归档，每批 archive_batch_size 条，批次间隔 archive_batch_pause 秒
+    "retention_days": int(os.getenv("DB_RETENTION_DAYS", "0")),
+    "archive_batch_size": int(os.getenv("DB_ARCHIVE_BATCH_SIZE", "1000")),
+    "archive_interval": float(os.getenv("DB_ARCHIVE_INTERVAL", "3600")),
+    "archive_batch_pause": float(os.getenv("DB_ARCHIVE_BATCH_PAUSE", "0.05")),
+}
+# 语音识别配置
+ASR_CONFIG = {
+    # 识别后端: "whisper" (openai-whisper) 或 "faster-whisper" (CTranslate2 int8，CPU更快)
+    "backend": os.getenv("ASR_BACKEND", "whisper"),
+    "faster-whisper": {
+        "compute_type": os.getenv("ASR_COMPUTE_TYPE", "int8"),
+        "cpu_threads": int(os.getenv("ASR_CPU_THREADS", "0")),
+    },
+    # 用户开口说话时打断正在播放的回答
+    "barge_in": os.getenv("ASR_BARGE_IN", "true").lower() == "true",
+    # 播放期间麦克风也会录到扬声器的声音，音量达到 VAD 阈值的这个倍数才算用户打断
+    "barge_in_ratio": float(os.getenv("ASR_BARGE_IN_RATIO", "3.0")),
+    # 播放结束后仍按播放期间处理的时长（秒），覆盖扬声器余音和录音延迟
+    "echo_tail": float(os.getenv("ASR_ECHO_TAIL", "0.5")),
+}
+
+# 语音合成配置
+TTS_CONFIG = {
+    "rate": os.getenv("TTS_RATE", "+0%"),
+    # 同时进行的合成请求数，后续句子在播放当前句子时提前合成
+    "max_concurrency": int(os.getenv("TTS_MAX_CONCURRENCY", "3")),
+    # 合成分块：首个片段尽早输出，之后合并短句、强制切分过长的文本
+    "first_chunk_chars": int(os.getenv("TTS_FIRST_CHUNK_CHARS", "8")),
+    "min_chunk_chars": int(os.getenv("TTS_MIN_CHUNK_CHARS", "40")),
+    "max_chunk_chars": int(os.getenv("TTS_MAX_CHUNK_CHARS", "120")),
+    # 不足 min_chunk_chars 的完整句子最多等待合并的时间（秒）
+    "max_hold_seconds": float(os.getenv("TTS_MAX_HOLD_SECONDS", "0.5")),
+    # 播放：常驻的 ffmpeg 进程把mp3解码为PCM，写入常驻的音频输出流
+    "ffmpeg_path": os.getenv("FFMPEG_PATH", "ffmpeg"),
+    # 音频输出: "sounddevice" (声卡) 或 "null" (丢弃音频，用于无声卡环境和基准测试)
+    "audio_sink": os.getenv("TTS_AUDIO_SINK", "sounddevice"),
+    # Edge TTS 输出 24kHz 单声道音频
+    "playback_sample_rate": int(os.getenv("TTS_PLAYBACK_SAMPLE_RATE", "24000")),
+    # 输出流前的PCM缓冲时长（秒），缓冲满时解码进程暂停，内存占用不随回答长度增长
+    "playback_buffer_seconds": float(os.getenv("TTS_PLAYBACK_BUFFER_SECONDS", "2.0")),
+    # 合成结果缓存：磁盘层按LRU淘汰，内存层保存最近使用的音频
+    "cache_enabled": os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true",
+    "cache_dir": os.getenv("TTS_CACHE_DIR", "cache/tts"),
+    "cache_max_mb": int(os.getenv("TTS_CACHE_MAX_MB", "200")),
+    "memory_cache_mb": int(os.getenv("TTS_MEMORY_CACHE_MB", "16")),
+}
+
+# 日志配置
+LOG_CONFIG = {
+    "level": os.getenv("LOG_LEVEL", "INFO").upper(),
+    "dir": os.getenv("LOG_DIR", "logs"),
+    # 文件按大小轮转：单个文件上限（MB）和保留的备份数
+    "max_mb": int(os.getenv("LOG_MAX_MB", "10")),
+    "backup_count": int(os.getenv("LOG_BACKUP_COUNT", "5")),
+    # 用户输入、AI回复等长文本在日志中保留的字符数（0 表示不截断）
+    "max_message_chars": int(os.getenv("LOG_MAX_MESSAGE_CHARS", "200")),
+    # 单独设置部分 logger 的级别，按名称前缀匹配，如 "speech.recognizer=DEBUG,utils.mysql_database=WARNING"
+    "levels": {
+        name.strip(): level.strip().upper()
+        for name, _, level in (item.partition("=") for item in os.getenv("LOG_LEVELS", "").split(","))
+        if name.strip() and level.strip()
+    },
+    # 文件日志格式: json（每行一个对象，需要 python-json-logger）或 text
+    "file_format": os.getenv("LOG_FILE_FORMAT", "json").lower(),
+    # 不在控制台显示的事件（文件中仍然记录）
+    "console_quiet_events": [
+        event.strip() for event in os.getenv(
+            "LOG_CONSOLE_QUIET_EVENTS",
+            "chat.input,chat.response,tts.start,tts.done,db.connected,db.saved,asr.tmp_removed"
+        ).split(",") if event.strip()
+    ],
+    # 高频路径（流式片段、音频回调）的日志最短间隔（秒）
+    "sample_interval": float(os.getenv("LOG_SAMPLE_INTERVAL", "1.0")),
+}
+
+# 请求追踪配置
+TRACE_CONFIG = {
+    # 是否把 span 导出到 JSONL 文件（内存中的瀑布图不受影响）
+    "enabled": os.getenv("TRACE_ENABLED", "true").lower() == "true",
+    "path": os.getenv("TRACE_PATH", "logs/traces.jsonl"),
+    # 内存中保留的最近 trace 数量
+    "max_traces": int(os.getenv("TRACE_MAX_TRACES", "50")),
+}
+
+# WebSocket 服务配置
+SERVER_CONFIG = {
+    # 会话超过该时长（秒）没有消息时释放其 Jarvis 实例（线程、解码进程、数据库连接）
+    "session_idle_timeout": int(os.getenv("SERVER_SESSION_IDLE_TIMEOUT", "1800")),
+}
@@ -9,9 +9,13 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from server.jarvis import Jarvis
 import json
-from typing import Dict
+from typing import Dict, Optional
 import asyncio
-from utils.logger import setup_logger
+import time
+from config import SERVER_CONFIG
+from utils.database import BaseDatabase, create_database
+from utils.logger import setup_logger, truncate
+from utils.tracing import span
 
 # 配置日志
 logger = setup_logger(__name__)
@@ -29,11 +33,116 @@ app.add_middleware(
 
 # 存储每个会话的Jarvis实例
 jarvis_instances: Dict[str, Jarvis] = {}
+# 每个会话最后一次收到消息的时间（time.monotonic）
+last_active: Dict[str, float] = {}
+# 正在释放的实例，保留任务引用直到完成
+cleanup_tasks = set()
+
+def release_jarvis(jarvis: Jarvis):
+    """
+    在后台线程中释放不再使用的Jarvis实例
+    
+    cleanup 会等待语音线程退出、写入剩余的对话记录并关闭解码进程，不能在事件循环中执行。
+    """
+    jarvis.cancel()
+    task = asyncio.create_task(asyncio.to_thread(jarvis.cleanup))
+    cleanup_tasks.add(task)
+    task.add_done_callback(cleanup_tasks.discard)
+
+def get_jarvis(session_id: str, model: str) -> Jarvis:
+    """获取会话的Jarvis实例，不存在或模型不同时新建"""
+    last_active[session_id] = time.monotonic()
+    # 检查是否已存在相同会话的Jarvis实例
+    if session_id not in jarvis_instances:
+        logger.info("Creating new Jarvis instance for session %s", session_id)
+        jarvis = Jarvis(ai_model=model)
+        jarvis_instances[session_id] = jarvis
+    else:
+        jarvis = jarvis_instances[session_id]
+        # 如果AI模型与当前不同,重新初始化
+        if model != jarvis.ai_model.__class__.__name__.lower().replace('ai', ''):
+            logger.info("Switching AI model to %s for session %s", model, session_id)
+            release_jarvis(jarvis)
+            jarvis = Jarvis(ai_model=model)
+            jarvis_instances[session_id] = jarvis
+    return jarvis
+
+# 检索历史记录使用的数据库（首次检索时创建）
+search_db: Optional[BaseDatabase] = None
+
+def get_search_db() -> BaseDatabase:
+    global search_db
+    if search_db is None:
+        search_db = create_database()
+    return search_db
+
+# 每次检索返回的最大记录数
+SEARCH_MAX_LIMIT = 50
+
+def clamp_int(value, default: int, minimum: int, maximum: int = None) -> int:
+    """
+    把客户端传入的数值参数转换为整数并限制在范围内
+
+    Args:
+        value: 客户端传入的值
+        default: 值缺失或无法转换时使用的默认值
+        minimum: 最小值
+        maximum: 最大值，None 表示不限制
+
+    Returns:
+        int: 限制后的值
+    """
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = default
+    value = max(value, minimum)
+    return value if maximum is None else min(value, maximum)
+
+async def search(websocket: WebSocket, message_data: dict):
+    """全文检索对话历史，结果中的时间转换为ISO格式字符串"""
+    query = message_data.get('query', '')
+    # 负数的 LIMIT 在 SQLite 中表示不限制条数，负数的 OFFSET 没有意义
+    offset = clamp_int(message_data.get('offset'), 0, 0)
+    limit = clamp_int(message_data.get('limit'), 10, 1, SEARCH_MAX_LIMIT)
+    session_id = message_data.get('sessionId') if message_data.get('currentSessionOnly') else None
+    
+    with span("ws.search", session_id=message_data.get('sessionId')):
+        results = await asyncio.to_thread(get_search_db().search_history, query, session_id, limit, offset)
+    for record in results:
+        record['timestamp'] = record['timestamp'].isoformat() if record['timestamp'] else None
+    await websocket.send_json({
+        'type': 'search_results',
+        'query': query,
+        'offset': offset,
+        'results': results
+    })
+
+async def respond(websocket: WebSocket, jarvis: Jarvis, session_id: str, content: str):
+    """在线程中生成响应并发送，期间事件循环可以继续接收取消消息"""
+    try:
+        # to_thread 复制当前上下文，Jarvis.chat 中的阶段记录在这个 trace 下
+        with span("ws.respond", session_id=session_id):
+            response = await asyncio.to_thread(jarvis.chat, content)
+            logger.info("Generated response for session %s", session_id)
+            
+            # 发送响应
+            await websocket.send_json({
+                'content': response
+            })
+            logger.info("Sent response to session %s", session_id)
+    except Exception as e:
+        logger.error("Error processing message: %s", e)
+        await websocket.send_json({
+            'error': f'处理消息时出错: {str(e)}'
+        })
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("New WebSocket connection accepted")
+    tasks = set()
+    session_id = None
     
     try:
         while True:
@@ -42,7 +151,19 @@ async def websocket_endpoint(websocket: WebSocket):
                 data = await websocket.receive_text()
                 message_data = json.loads(data)
                 session_id = message_data.get('sessionId')
-                logger.info(f"Received message from session {session_id}: {message_data}")
+                logger.info("Received message from session %s: %s", session_id, truncate(message_data))
+                
+                # 打断当前回答
+                if message_data.get('type') == 'cancel':
+                    jarvis = jarvis_instances.get(session_id)
+                    if jarvis:
+                        jarvis.cancel()
+                    continue
+                
+                # 检索历史记录
+                if message_data.get('type') == 'search':
+                    await search(websocket, message_data)
+                    continue
                 
                 # 提取消息内容和配置
                 content = message_data.get('content', '')
@@ -50,57 +171,67 @@ async def websocket_endpoint(websocket: WebSocket):
                 whisper_model = message_data.get('whisperModel', 'small')
                 tts_voice = message_data.get('ttsVoice', 'zh-CN-XiaoxiaoNeural')
                 
-                # 检查是否已存在相同会话的Jarvis实例
-                if session_id not in jarvis_instances:
-                    logger.info(f"Creating new Jarvis instance for session {session_id}")
-                    jarvis = Jarvis(ai_model=model)
-                    jarvis_instances[session_id] = jarvis
-                else:
-                    jarvis = jarvis_instances[session_id]
-                    # 如果AI模型与当前不同,重新初始化
-                    if model != jarvis.ai_model.__class__.__name__.lower().replace('ai', ''):
-                        logger.info(f"Switching AI model to {model} for session {session_id}")
-                        jarvis = Jarvis(ai_model=model)
-                        jarvis_instances[session_id] = jarvis
+                jarvis = get_jarvis(session_id, model)
                 
-                # 生成响应
-                response = jarvis.chat(content)
-                logger.info(f"Generated response for session {session_id}")
-                
-                # 发送响应
-                await websocket.send_json({
-                    'content': response
-                })
-                logger.info(f"Sent response to session {session_id}")
+                # 生成响应（不阻塞接收循环）
+                task = asyncio.create_task(respond(websocket, jarvis, session_id, content))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
                 
             except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON: {str(e)}")
+                logger.error("Invalid JSON: %s", e)
                 await websocket.send_json({
                     'error': '无效的消息格式'
                 })
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
-                logger.error(f"Error processing message: {str(e)}")
+                logger.error("Error processing message: %s", e)
                 await websocket.send_json({
                     'error': f'处理消息时出错: {str(e)}'
                 })
                 
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected")
+        logger.info("WebSocket disconnected")
     except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
+        logger.error("WebSocket error: %s", e)
     finally:
-        # 不要立即清理资源,保留实例以便重连时复用
-        pass
+        # 连接断开后不再需要正在生成的回答
+        if tasks and session_id in jarvis_instances:
+            jarvis_instances[session_id].cancel()
+        for task in tasks:
+            task.cancel()
+        # 不要立即清理资源,保留实例以便重连时复用；空闲超过 SERVER_SESSION_IDLE_TIMEOUT 后由 cleanup_instances 释放
+        if session_id in last_active:
+            last_active[session_id] = time.monotonic()
 
 # 定期清理长时间未使用的实例
 @app.on_event("startup")
 async def startup_event():
+    timeout = SERVER_CONFIG["session_idle_timeout"]
+    
     async def cleanup_instances():
         while True:
-            await asyncio.sleep(3600)  # 每小时检查一次
-            # TODO: 添加实例使用时间戳,清理超过一定时间未使用的实例
+            await asyncio.sleep(min(timeout, 300))
+            now = time.monotonic()
+            for session_id in [s for s, at in last_active.items() if now - at > timeout]:
+                del last_active[session_id]
+                jarvis = jarvis_instances.pop(session_id, None)
+                if jarvis is not None:
+                    logger.info("Releasing idle Jarvis instance for session %s", session_id)
+                    release_jarvis(jarvis)
             
     asyncio.create_task(cleanup_instances())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 写入所有会话剩余的对话记录
+    for jarvis in jarvis_instances.values():
+        release_jarvis(jarvis)
+    jarvis_instances.clear()
+    last_active.clear()
+    if cleanup_tasks:
+        await asyncio.gather(*cleanup_tasks, return_exceptions=True)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5001) 
\ No newline at end of file
@@ -2,16 +2,16 @@
 图像生成模块，使用Replicate API进行AI图像生成
 """
 import os
-import logging
 from pathlib import Path
 import replicate
 from rich import print
 from datetime import datetime
 from typing import Literal, Optional, Union, List
 from dataclasses import dataclass
+from utils.logger import setup_logger, truncate
 
 # 配置日志
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
 
 # 定义支持的模型
 ModelType = Literal[
@@ -101,7 +101,7 @@ class ImageGenerator:
             if isinstance(params, str):
                 params = ImageGenerationParams(prompt=params)
                 
-            logger.info(f"开始生成图像，使用模型: {model_type}，提示词: {params.prompt}")
+            logger.info("开始生成图像，使用模型: %s，提示词: %s", model_type, truncate(params.prompt))
             print(f"[bold green]开始生成图像...[/bold green]")
             print(f"[blue]使用模型:[/blue] {model_type}")
             
@@ -157,7 +157,7 @@ class ImageGenerator:
                         file.write(item.read())
                         
                     image_paths.append(str(filepath))
-                    logger.info(f"图像已保存: {filepath}")
+                    logger.info("图像已保存: %s", filepath)
                     print(f"[green]✓[/green] 已保存图像: {filepath}")
                 
             return ImageGenerationResult(
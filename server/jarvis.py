@@ -4,13 +4,17 @@
 Jarvis - 个人智能助手系统
 基于钢铁侠电影中的 J.A.R.V.I.S. (Just A Rather Very Intelligent System)
 """
-import os
-from config import DEFAULT_AI_MODEL
+from config import ASR_CONFIG, DEFAULT_AI_MODEL
 from ai_models import DeepseekAI, GeminiAI
 from speech.recognizer import WhisperRecognizer
 from speech.synthesizer import EdgeTTSSynthesizer
-from utils.logger import setup_logger
-from utils.database import Database
+from speech.player import StreamingAudioPlayer
+from utils.logger import setup_logger, truncate
+from utils.database import create_database, page_cursor
+from utils.history_writer import ChatHistoryWriter
+from utils.retention import start_archive_worker
+from utils.cancellation import CancellationToken
+from utils.tracing import current_span, format_waterfall, get_trace, span, use_span
 import uuid
 import time
 from rich.console import Console
@@ -22,8 +26,6 @@ from rich.progress import Progress
 from rich.markdown import Markdown
 import threading
 import queue
-import subprocess
-from pathlib import Path
 
 # 创建logger实例
 logger = setup_logger(__name__)
@@ -39,20 +41,33 @@ class Jarvis:
             ai_model: 选择使用的AI模型 ('deepseek' 或 'gemini')
         """
         self.name = "Jarvis"
-        logger.info(f"正在初始化 Jarvis，使用 {ai_model} 模型")
+        logger.info("正在初始化 Jarvis，使用 %s 模型", ai_model)
         self.ai_model = self._initialize_ai_model(ai_model)
         self.speech_recognizer = WhisperRecognizer()
         self.speech_synthesizer = EdgeTTSSynthesizer()
-        self.db = Database()
+        self.audio_player = StreamingAudioPlayer()
+        self.db = create_database()
+        # 对话记录在后台批量写入，数据库慢或不可用时不影响回答
+        self.history_writer = ChatHistoryWriter(self.db)
+        # 把超过保留期的记录分批压缩归档（整个进程一个线程，DB_RETENTION_DAYS=0 时不启动）
+        self.archive_worker = start_archive_worker()
         self.session_id = str(uuid.uuid4())  # 为每次运行创建唯一会话ID
         
-        # 初始化语音合成队列和播放队列
-        self.synthesis_queue = queue.Queue()  # 待合成的文本队列
-        self.playback_queue = queue.Queue()   # 待播放的音频文件队列
+        # 当前一轮对话的取消令牌，随文本和音频流经生成、合成和播放
+        self._turn_lock = threading.Lock()
+        self._turn_token = CancellationToken()
+        # 同一时间只生成一个回答，新输入先打断上一轮再等待其退出
+        self._chat_lock = threading.Lock()
+        
+        # 用户开口说话时打断正在进行的回答
+        self.speech_recognizer.on_speech_start = self._on_speech_start
         
-        # 创建临时文件目录
-        self.temp_dir = Path("temp")
-        self.temp_dir.mkdir(exist_ok=True)
+        # 初始化语音合成队列和播放队列
+        # 队列中同时传递所属一轮对话的 span，工作线程中的阶段记录在同一个 trace 下
+        self.synthesis_queue = queue.Queue()  # 待合成的 (令牌, 文本, span) 队列
+        self.playback_queue = queue.Queue()   # 按句子顺序排列的 (令牌, 音频流, span) 队列
+        # 最近一轮对话的 trace，用于显示各阶段耗时
+        self.last_trace_id = None
         
         # 启动语音合成线程
         self.synthesis_thread = threading.Thread(target=self._synthesis_worker, daemon=True)
@@ -87,7 +102,7 @@ class Jarvis:
                 logger.error(error_msg)
                 raise ValueError(error_msg)
         except Exception as e:
-            logger.error(f"初始化AI模型时出错: {str(e)}")
+            logger.error("初始化AI模型时出错: %s", e)
             raise
     
     def greet(self):
@@ -117,75 +132,128 @@ class Jarvis:
         return text
     
     def _synthesis_worker(self):
-        """语音合成工作线程"""
+        """语音合成工作线程：按句子顺序开始合成，音频流立即交给播放线程"""
         while True:
             try:
-                text = self.synthesis_queue.get()
-                if text is None:  # 停止信号
+                item = self.synthesis_queue.get()
+                if item is None:  # 停止信号
                     break
+                
+                token, text, parent = item
+                if token.cancelled:  # 所属回答已被打断，不再合成
+                    continue
                     
                 # 清理 Markdown 标记
                 clean_text = self._clean_markdown(text)
                 
-                # 生成唯一的音频文件名
-                audio_file = self.temp_dir / f"response_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}.mp3"
-                
-                # 生成语音文件
-                self.speech_synthesizer.text_to_speech(clean_text, str(audio_file))
-                
-                # 将音频文件加入播放队列
-                self.playback_queue.put(audio_file)
+                # 开始合成（不等待完成），后续句子在播放当前句子时并发合成
+                with use_span(parent):
+                    stream = self.speech_synthesizer.open_stream(clean_text)
+                if stream is not None:
+                    token.on_cancel(stream.cancel)
+                    self.playback_queue.put((token, stream, parent))
                 
             except Exception as e:
-                logger.error(f"语音合成失败: {str(e)}")
+                logger.error("语音合成失败: %s", e)
             finally:
                 self.synthesis_queue.task_done()
     
     def _playback_worker(self):
-        """语音播放工作线程"""
+        """语音播放工作线程：按顺序把各句音频流写入常驻播放进程"""
         while True:
             try:
-                audio_file = self.playback_queue.get()
-                if audio_file is None:  # 停止信号
+                item = self.playback_queue.get()
+                if item is None:  # 停止信号
                     break
                 
-                if not audio_file.exists():
-                    logger.error(f"音频文件不存在: {audio_file}")
-                    continue
-                
-                try:
-                    # 使用 subprocess 播放音频（不阻塞主线程）
-                    if os.name == 'posix':  # Mac/Linux
-                        subprocess.run(['afplay', str(audio_file)], check=True)
-                    else:  # Windows
-                        subprocess.run(['start', str(audio_file)], shell=True, check=True)
-                finally:
-                    # 播放完成后删除临时文件
-                    try:
-                        audio_file.unlink()
-                    except Exception as e:
-                        logger.warning(f"删除临时文件失败: {str(e)}")
+                token, stream, parent = item
+                with span("audio.playback", parent=parent, chars=len(stream.text)) as playback_span:
+                    # 音频块到达即播放，无需等待整句合成完成
+                    size = 0
+                    for chunk in stream:
+                        if token.cancelled:
+                            playback_span.set_attribute("cancelled", True)
+                            break
+                        if not size:
+                            playback_span.add_event("first_chunk")
+                        self.audio_player.write(chunk)
+                        size += len(chunk)
+                    playback_span.set_attribute("bytes", size)
                     
             except Exception as e:
-                logger.error(f"语音播放失败: {str(e)}")
+                logger.error("语音播放失败: %s", e)
             finally:
                 self.playback_queue.task_done()
     
-    def speak(self, text: str):
+    def speak(self, text: str, token: CancellationToken = None):
         """
         将文字加入语音合成队列
         
         Args:
             text: 要说出的文字
+            token: 生成这句话的一轮对话的令牌，默认为当前一轮；
+                   新一轮开始后旧回答仍可能送来句子，这些句子的令牌已取消，直接丢弃
         """
+        if token is None:
+            with self._turn_lock:
+                token = self._turn_token
+        if token.cancelled:
+            return
         try:
-            self.synthesis_queue.put(text)
+            self.synthesis_queue.put((token, text, current_span()))
         except Exception as e:
-            logger.error(f"添加语音合成任务失败: {str(e)}")
+            logger.error("添加语音合成任务失败: %s", e)
+    
+    def _new_turn(self) -> CancellationToken:
+        """打断上一轮回答并开始新的一轮"""
+        with self._turn_lock:
+            previous, self._turn_token = self._turn_token, CancellationToken()
+        self._interrupt(previous)
+        return self._turn_token
+    
+    def _interrupt(self, token: CancellationToken):
+        """取消令牌并丢弃播放器中已缓冲的音频"""
+        if token.cancelled:
+            return
+        token.cancel()
+        self.audio_player.stop()
+    
+    def _on_speech_start(self, volume: float) -> bool:
+        """
+        录音中检测到语音时决定是否打断当前回答
+        
+        播放期间麦克风录到的可能是 Jarvis 自己的声音，只有音量明显高于
+        VAD 阈值（ASR_BARGE_IN_RATIO 倍）时才打断。
+        
+        Args:
+            volume: 当前音频块的音量
+            
+        Returns:
+            bool: False 表示这次不处理，之后的语音会再次回调
+        """
+        if not ASR_CONFIG["barge_in"]:
+            return True
+        if self.audio_player.is_playing(ASR_CONFIG["echo_tail"]):
+            threshold = self.speech_recognizer.vad.threshold * ASR_CONFIG["barge_in_ratio"]
+            if volume < threshold:
+                return False
+        self.cancel()
+        return True
+    
+    def cancel(self):
+        """
+        打断当前回答：停止生成，丢弃尚未合成和尚未播放的句子
+        """
+        with self._turn_lock:
+            token = self._turn_token
+        if not token.cancelled:
+            logger.info("当前回答已被打断")
+        self._interrupt(token)
     
     def stop_speaking(self):
         """停止语音合成和播放线程"""
-        # 发送停止信号
+        # 丢弃尚未播放的句子，然后发送停止信号
+        self.cancel()
         self.synthesis_queue.put(None)
         self.playback_queue.put(None)
         
@@ -201,33 +269,79 @@ class Jarvis:
             message: 用户输入的消息
             input_type: 输入类型 ('text' 或 'voice')
         """
-        try:
-            logger.info(f"收到用户输入: {message}")
-            start_time = time.time()
-            
-            # 生成响应（AI模型内部会处理流式输出和语音合成）
-            response = self.ai_model.generate_response(message)
-            
-            # 计算响应时间
-            response_time = time.time() - start_time
-            
-            # 保存对话记录
-            self.db.save_chat(
-                session_id=self.session_id,
-                input_type=input_type,
-                user_input=message,
-                ai_response=response,
-                model_used=self.ai_model.__class__.__name__,
-                response_time=response_time
-            )
-            
-            logger.info(f"AI响应: {response}")
-            return response
-            
-        except Exception as e:
-            error_msg = f"处理请求时出错: {str(e)}"
-            logger.error(error_msg)
-            return f"抱歉，{error_msg}"
+        with span("chat.turn", input_type=input_type, model=self.ai_model.__class__.__name__) as turn_span:
+            self.last_trace_id = turn_span.trace_id
+            try:
+                logger.info("收到用户输入: %s", truncate(message),
+                            extra={"event": "chat.input", "input_type": input_type, "chars": len(message)})
+                # 新的输入打断上一轮尚未说完的回答
+                token = self._new_turn()
+                start_time = time.time()
+                
+                with self._chat_lock:
+                    if token.cancelled:
+                        return ""
+                    # 生成响应（AI模型内部会处理流式输出和语音合成）
+                    response = self.ai_model.generate_response(message, cancel_token=token)
+                
+                # 计算响应时间
+                response_time = time.time() - start_time
+                
+                if token.cancelled:
+                    turn_span.set_attribute("cancelled", True)
+                    logger.info("回答被打断，不保存记录: %s", truncate(response))
+                    return response
+                
+                # 保存对话记录（放入后台写入队列，立即返回）
+                queued = self.history_writer.save_chat(
+                    session_id=self.session_id,
+                    input_type=input_type,
+                    user_input=message,
+                    ai_response=response,
+                    model_used=self.ai_model.__class__.__name__,
+                    response_time=response_time
+                )
+                turn_span.add_event("history_queued", accepted=queued)
+                
+                logger.info("AI响应: %s", truncate(response),
+                            extra={"event": "chat.response", "chars": len(response),
+                                   "response_time": round(response_time, 3)})
+                return response
+                
+            except Exception as e:
+                error_msg = f"处理请求时出错: {str(e)}"
+                logger.error(error_msg)
+                turn_span.set_attribute("error", str(e))
+                return f"抱歉，{error_msg}"
+
+    def voice_chat(self) -> str:
+        """
+        语音输入的一轮对话，识别和回答记录在同一个 trace 中
+        
+        Returns:
+            str: 识别出的文字，没有识别到语音时为空字符串
+        """
+        with span("voice.turn") as turn_span:
+            self.last_trace_id = turn_span.trace_id
+            user_input = self.listen()
+            if user_input:
+                self.chat(user_input, "voice")
+            return user_input
+
+    def show_trace(self, trace_id: str = None):
+        """
+        显示一轮对话各阶段耗时的瀑布图（默认最近一轮）
+        
+        Args:
+            trace_id: trace ID
+        """
+        trace_id = trace_id or self.last_trace_id
+        spans = get_trace(trace_id) if trace_id else []
+        if not spans:
+            console.print("\n[yellow]暂无耗时记录[/yellow]")
+            return
+        # 语音合成和播放可能仍在进行，只显示已结束的阶段
+        console.print(Panel(Text(format_waterfall(spans)), title="最近一轮各阶段耗时", style="cyan"))
 
     def listen(self) -> str:
         """
@@ -253,42 +367,150 @@ class Jarvis:
             logger.warning(str(e))
             return ""
         except Exception as e:
-            logger.error(f"语音识别失败: {str(e)}")
+            logger.error("语音识别失败: %s", e)
             return ""
 
     def show_history(self, limit: int = 10):
-        """显示最近的对话历史"""
+        """
+        按时间倒序分页显示对话历史
+        
+        Args:
+            limit: 每页显示的记录数
+        """
         try:
-            history = self.db.get_chat_history(limit=limit)
-            if not history:
-                console.print("\n[yellow]暂无对话记录[/yellow]")
-                return
-            
-            console.print("\n[bold cyan]最近对话记录[/bold cyan]")
-            
-            for record in history:
-                console.print(f"\n[dim]{record['timestamp']}[/dim] ([magenta]{record['input_type']}[/magenta])")
-                console.print(f"[green]用户:[/green] {record['user_input']}")
-                console.print("[blue]Jarvis:[/blue]")
-                console.print(Markdown(record['ai_response']))
-                console.print(f"[yellow]响应时间: {record['response_time']:.2f}秒[/yellow]")
-                console.print("─" * 50)
+            # 先写入队列中的记录，保证能看到刚才的对话
+            self.history_writer.flush(timeout=2.0)
+            before = None
+            while True:
+                history = self.db.get_chat_history(limit=limit, before=before)
+                if not history:
+                    if before is None:
+                        console.print("\n[yellow]暂无对话记录[/yellow]")
+                    return
+                
+                console.print("\n[bold cyan]最近对话记录[/bold cyan]" if before is None else "\n[bold cyan]更早的对话记录[/bold cyan]")
+                
+                for record in history:
+                    console.print(f"\n[dim]{record['timestamp']}[/dim] ([magenta]{record['input_type']}[/magenta])")
+                    console.print(f"[green]用户:[/green] {record['user_input']}")
+                    console.print("[blue]Jarvis:[/blue]")
+                    console.print(Markdown(record['ai_response']))
+                    console.print(f"[yellow]响应时间: {record['response_time']:.2f}秒[/yellow]")
+                    console.print("─" * 50)
+                
+                if len(history) < limit:
+                    return
+                more = Prompt.ask("显示更早的记录？", choices=["y", "n"], default="n")
+                if more != 'y':
+                    return
+                # 游标翻页：从上一页最后一条记录之后继续，不需要 OFFSET 扫描
+                before = page_cursor(history)
 
         except Exception as e:
-            logger.error(f"显示对话记录失败: {str(e)}")
+            logger.error("显示对话记录失败: %s", e)
             console.print(f"\n[red]获取对话记录失败: {str(e)}[/red]")
 
+    def search_history(self, query: str, page_size: int = 5):
+        """
+        全文检索对话历史并分页显示
+        
+        Args:
+            query: 检索词
+            page_size: 每页显示的记录数
+        """
+        try:
+            # 先写入队列中的记录，保证能检索到刚才的对话
+            self.history_writer.flush(timeout=2.0)
+            offset = 0
+            while True:
+                start = time.perf_counter()
+                results = self.db.search_history(query, limit=page_size, offset=offset)
+                elapsed = time.perf_counter() - start
+                if not results:
+                    if offset == 0:
+                        console.print(f"\n[yellow]没有找到与 \"{query}\" 相关的对话[/yellow]")
+                    return
+                
+                console.print(f"\n[bold cyan]检索结果 {offset + 1}-{offset + len(results)}[/bold cyan] [dim]({elapsed * 1000:.1f}毫秒)[/dim]")
+                for record in results:
+                    console.print(f"\n[dim]{record['timestamp']}[/dim] ([magenta]{record['input_type']}[/magenta]) [dim]相关度 {record['score']:.2f}[/dim]")
+                    console.print(f"[green]用户:[/green] {record['user_input']}")
+                    console.print("[blue]Jarvis:[/blue]")
+                    console.print(Markdown(record['ai_response']))
+                    console.print("─" * 50)
+                
+                if len(results) < page_size:
+                    return
+                more = Prompt.ask("显示更多结果？", choices=["y", "n"], default="n")
+                if more != 'y':
+                    return
+                offset += page_size
+        
+        except Exception as e:
+            logger.error("检索对话记录失败: %s", e)
+            console.print(f"\n[red]检索对话记录失败: {str(e)}[/red]")
+
     def show_stats(self):
         """显示统计信息"""
         try:
-            stats = self.db.get_session_stats()
+            self.history_writer.flush(timeout=2.0)
+            stats = self.db.get_session_stats(session_id=self.session_id)
             
             table = Table(title="统计信息")
             table.add_column("类别", style="cyan")
             table.add_column("数值", style="yellow")
             
             table.add_row("总对话数", str(stats['total']))
-            table.add_row("平均响应时间", f"{stats['avg_response_time']:.2f}秒")
+            if stats['avg_response_time'] is not None:
+                table.add_row("平均响应时间", f"{stats['avg_response_time']:.2f}秒")
+            percentiles = stats['response_time_percentiles']
+            if percentiles['p50'] is not None:
+                table.add_row(
+                    "响应时间(P50/P90/P99)",
+                    f"{percentiles['p50']:.2f} / {percentiles['p90']:.2f} / {percentiles['p99']:.2f}秒"
+                )
+            if stats.get('session'):
+                session = stats['session']
+                table.add_row(
+                    "本次会话",
+                    f"{session['turns']}轮，平均 {session['total_response_time'] / session['turns']:.2f}秒"
+                )
+            
+            asr_stats = self.speech_recognizer.get_stats()
+            if asr_stats['real_time_factor'] is not None:
+                table.add_row(
+                    f"语音识别实时率 ({asr_stats['backend']}/{asr_stats['model']})",
+                    f"{asr_stats['real_time_factor']:.3f}"
+                )
+            
+            cache_stats = self.speech_synthesizer.cache_stats()
+            if cache_stats:
+                table.add_row(
+                    "语音缓存命中率",
+                    f"{cache_stats['hit_rate']:.1%} "
+                    f"(内存 {cache_stats['memory_hits']} / 磁盘 {cache_stats['disk_hits']} / "
+                    f"未命中 {cache_stats['misses']})"
+                )
+            
+            writer_stats = self.history_writer.stats()
+            if writer_stats['flush_latency_p50'] is not None:
+                table.add_row(
+                    "记录写入延迟(P50/P90)",
+                    f"{writer_stats['flush_latency_p50'] * 1000:.1f} / "
+                    f"{writer_stats['flush_latency_p90'] * 1000:.1f}毫秒"
+                )
+            table.add_row(
+                "记录写入队列",
+                f"待写入 {writer_stats['queue_depth']} / 丢弃 {writer_stats['dropped']}"
+            )
+            
+            archive_stats = self.db.get_archive_stats()
+            if archive_stats['rows']:
+                table.add_row(
+                    "已归档记录",
+                    f"{archive_stats['rows']}条，压缩后 {archive_stats['compressed_bytes'] / 1024:.0f}KB"
+                    f"（原始 {archive_stats['raw_bytes'] / 1024:.0f}KB）"
+                )
             
             console.print(table)
             
@@ -312,8 +534,39 @@ class Jarvis:
             
             console.print(model_table)
             
+            # 最近会话统计
+            sessions = self.db.get_recent_sessions(limit=5)
+            if sessions:
+                session_table = Table(title="最近会话")
+                session_table.add_column("会话", style="magenta")
+                session_table.add_column("对话数", style="green")
+                session_table.add_column("平均响应时间", style="yellow")
+                session_table.add_column("最后活跃", style="dim")
+                for session in sessions:
+                    session_table.add_row(
+                        session['session_id'][:8],
+                        str(session['turns']),
+                        f"{session['avg_response_time']:.2f}秒",
+                        str(session['last_at'])
+                    )
+                console.print(session_table)
+            
+            # 语音合成分块统计
+            chunker = getattr(self.ai_model, 'chunker', None)
+            if chunker and chunker.chunks:
+                chunk_stats = chunker.stats()
+                chunk_table = Table(title="语音合成分块统计")
+                chunk_table.add_column("指标", style="cyan")
+                chunk_table.add_column("数值", style="yellow")
+                chunk_table.add_row("平均每次回复片段数", f"{chunk_stats['chunks_per_response']:.1f}")
+                chunk_table.add_row("平均片段长度", f"{chunk_stats['avg_chunk_chars']:.0f}字")
+                chunk_table.add_row("强制切分次数", str(chunk_stats['forced_splits']))
+                chunk_table.add_row("首个片段延迟(P50)", f"{chunk_stats['first_chunk_latency_p50']:.2f}秒")
+                chunk_table.add_row("首个片段延迟(P90)", f"{chunk_stats['first_chunk_latency_p90']:.2f}秒")
+                console.print(chunk_table)
+            
         except Exception as e:
-            logger.error(f"显示统计信息失败: {str(e)}")
+            logger.error("显示统计信息失败: %s", e)
             console.print(f"\n[red]获取统计信息失败: {str(e)}[/red]")
 
     def continuous_chat(self, mode: str = "text"):
@@ -333,21 +586,19 @@ class Jarvis:
                 try:
                     if mode == "text":
                         user_input = input("\n您: ")
+                        if not user_input:
+                            continue
+                        response = self.chat(user_input, mode)
                     else:  # voice mode
                         print("\n正在听...")
-                        user_input = self.listen()
-                        
-                    if not user_input:
-                        continue
-                        
-                    response = self.chat(user_input, mode)
+                        self.voice_chat()
                     
                 except KeyboardInterrupt:
                     print("\n\n退出持续对话模式")
                     break
                     
         except Exception as e:
-            logger.error(f"持续对话模式出错: {str(e)}")
+            logger.error("持续对话模式出错: %s", e)
             print(f"\n持续对话模式出错: {str(e)}")
 
     def cleanup(self):
@@ -355,15 +606,17 @@ class Jarvis:
         try:
             # 停止语音线程
             self.stop_speaking()
-            
-            # 清理临时文件
-            for file in self.temp_dir.glob("response_*.mp3"):
-                try:
-                    file.unlink()
-                except Exception as e:
-                    logger.warning(f"清理临时文件失败: {str(e)}")
+            # 写入剩余的对话记录
+            self.history_writer.close()
+            logger.info("对话记录写入统计: %s", self.history_writer.stats())
+            self.db.close()
+            self.audio_player.close()
+            self.speech_synthesizer.close()
+            cache_stats = self.speech_synthesizer.cache_stats()
+            if cache_stats:
+                logger.info("语音缓存统计: %s", cache_stats)
         except Exception as e:
-            logger.error(f"清理资源失败: {str(e)}")
+            logger.error("清理资源失败: %s", e)
 
 def main():
     """主程序入口"""
@@ -380,7 +633,9 @@ def main():
 [cyan]3[/cyan]: 持续文字对话
 [cyan]4[/cyan]: 持续语音对话
 [cyan]h[/cyan]: 显示历史记录
+[cyan]f[/cyan]: 搜索历史记录
 [cyan]s[/cyan]: 显示统计信息
+[cyan]t[/cyan]: 显示最近一轮各阶段耗时
 [cyan]c[/cyan]: 清除历史记录
 [cyan]q[/cyan]: 退出
             """, title="Jarvis 命令菜单", border_style="green")
@@ -396,12 +651,21 @@ def main():
             elif choice == 'h':
                 jarvis.show_history()
                 continue
+            elif choice == 'f':
+                query = Prompt.ask("\n请输入要搜索的内容")
+                if query.strip():
+                    jarvis.search_history(query)
+                continue
             elif choice == 's':
                 jarvis.show_stats()
                 continue
+            elif choice == 't':
+                jarvis.show_trace()
+                continue
             elif choice == 'c':
                 confirm = Prompt.ask("确定要清除所有历史记录吗？", choices=["y", "n"], default="n")
                 if confirm == 'y':
+                    jarvis.history_writer.flush(timeout=2.0)
                     jarvis.db.clear_history()
                     console.print("[green]历史记录已清除[/green]")
                 continue
@@ -412,11 +676,7 @@ def main():
                 if user_input:
                     jarvis.chat(user_input, input_type)
             elif choice == '2':
-                user_input = jarvis.listen()
-                input_type = "voice"
-                if user_input:
-                    jarvis.chat(user_input, input_type)
-                else:
+                if not jarvis.voice_chat():
                     console.print("[red]未能识别语音，请重试[/red]")
             elif choice == '3':
                 jarvis.continuous_chat(mode="text")
@@ -427,7 +687,7 @@ def main():
                 continue
             
     except Exception as e:
-        logger.error(f"系统运行时出错: {str(e)}")
+        logger.error("系统运行时出错: %s", e)
         console.print(f"[red]系统错误: {str(e)}[/red]")
     finally:
         if jarvis:
@@ -0,0 +1,105 @@
+"""
+音频工具模块 - 在内存中完成音频解码、声道合并和重采样
+"""
+import io
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import soundfile as sf
+
+# Whisper 模型要求的采样率
+WHISPER_SAMPLE_RATE = 16000
+
+AudioSource = Union[str, Path, bytes, bytearray, memoryview, np.ndarray]
+
+
+def to_mono_float32(audio: np.ndarray) -> np.ndarray:
+    """
+    将任意形状/类型的音频数组转换为单声道 float32
+
+    Args:
+        audio: 形状为 (n,) 或 (n, channels) 的音频数组
+
+    Returns:
+        np.ndarray: 一维 float32 数组，取值范围 [-1, 1]
+    """
+    audio = np.asarray(audio)
+    if np.issubdtype(audio.dtype, np.integer):
+        # 整型 PCM 按位宽归一化
+        scale = float(np.iinfo(audio.dtype).max) + 1.0
+        audio = audio.astype(np.float32) / scale
+    elif audio.dtype != np.float32:
+        audio = audio.astype(np.float32)
+
+    if audio.ndim == 2:
+        # 单声道直接取视图，多声道取平均
+        audio = audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1, dtype=np.float32)
+    elif audio.ndim != 1:
+        raise ValueError(f"不支持的音频数组形状: {audio.shape}")
+
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def _lowpass_kernel(cutoff: float, num_taps: int = 63) -> np.ndarray:
+    """生成加汉明窗的 sinc 低通滤波器（cutoff 为相对采样率的归一化频率）"""
+    n = np.arange(num_taps, dtype=np.float32) - (num_taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps).astype(np.float32)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    重采样音频，采样率一致时原样返回
+
+    Args:
+        audio: 一维 float32 音频
+        orig_sr: 原始采样率
+        target_sr: 目标采样率
+
+    Returns:
+        np.ndarray: 重采样后的音频
+    """
+    if orig_sr == target_sr or audio.size == 0:
+        return audio
+
+    if target_sr < orig_sr:
+        # 降采样前先低通滤波，避免混叠
+        audio = np.convolve(audio, _lowpass_kernel(0.5 * target_sr / orig_sr), mode="same")
+
+    duration = audio.shape[0] / orig_sr
+    target_length = int(round(duration * target_sr))
+    src_positions = np.arange(audio.shape[0], dtype=np.float64)
+    dst_positions = np.linspace(0, audio.shape[0] - 1, num=target_length, dtype=np.float64)
+    return np.interp(dst_positions, src_positions, audio).astype(np.float32)
+
+
+def load_audio(source: AudioSource, source_rate: Optional[int] = None,
+               sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    将文件路径、编码后的字节或数组统一转换为 Whisper 可直接使用的音频
+
+    Args:
+        source: 音频文件路径、编码后的音频字节（wav/flac/ogg 等）或 PCM 数组
+        source_rate: 数组输入的采样率，默认视为已经是目标采样率
+        sample_rate: 目标采样率
+
+    Returns:
+        np.ndarray: 单声道 float32 音频
+    """
+    if isinstance(source, np.ndarray):
+        audio = to_mono_float32(source)
+        return resample(audio, source_rate or sample_rate, sample_rate)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data, file_rate = sf.read(io.BytesIO(bytes(source)), dtype="float32", always_2d=True)
+        return resample(to_mono_float32(data), file_rate, sample_rate)
+
+    path = str(source)
+    try:
+        data, file_rate = sf.read(path, dtype="float32", always_2d=True)
+    except RuntimeError:
+        # libsndfile 不支持的格式（如 m4a/webm）交给 ffmpeg 解码
+        import whisper
+        return whisper.load_audio(path, sr=sample_rate)
+    return resample(to_mono_float32(data), file_rate, sample_rate)
@@ -0,0 +1,200 @@
+"""
+语音识别后端模块 - 统一不同Whisper推理引擎的接口
+"""
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from speech.audio import WHISPER_SAMPLE_RATE
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class BaseASRBackend(ABC):
+    """语音识别后端的基类，负责统计实时率（RTF = 处理耗时 / 音频时长）"""
+
+    name = "base"
+
+    def __init__(self, model_name: str, language: str):
+        """
+        初始化后端
+
+        Args:
+            model_name: 模型名称 ("tiny", "base", "small", "medium", "large")
+            language: 主要识别的语言
+        """
+        self.model_name = model_name
+        self.language = language
+        self.load_time = 0.0          # 模型加载耗时（秒）
+        self.audio_seconds = 0.0      # 累计处理的音频时长（秒）
+        self.processing_seconds = 0.0  # 累计识别耗时（秒）
+        self.last_rtf = None          # 最近一次识别的实时率
+
+        start = time.perf_counter()
+        self._load()
+        self.load_time = time.perf_counter() - start
+        logger.info("%s 后端加载 %s 模型耗时 %.2f秒", self.name, model_name, self.load_time)
+
+    @abstractmethod
+    def _load(self):
+        """加载模型"""
+        pass
+
+    @abstractmethod
+    def _transcribe(self, audio: np.ndarray, initial_prompt: Optional[str]) -> str:
+        """识别 16kHz 单声道 float32 音频"""
+        pass
+
+    def transcribe(self, audio: np.ndarray, initial_prompt: Optional[str] = None) -> str:
+        """
+        识别音频并记录实时率
+
+        Args:
+            audio: 16kHz 单声道 float32 音频
+            initial_prompt: 提示文本
+
+        Returns:
+            str: 识别文本
+        """
+        start = time.perf_counter()
+        text = self._transcribe(audio, initial_prompt)
+        elapsed = time.perf_counter() - start
+
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        self.audio_seconds += duration
+        self.processing_seconds += elapsed
+        self.last_rtf = elapsed / duration if duration > 0 else None
+        if self.last_rtf is not None:
+            logger.debug("%s 识别 %.2f秒音频耗时 %.2f秒，RTF=%.3f", self.name, duration, elapsed, self.last_rtf)
+        return text
+
+    @property
+    def real_time_factor(self) -> Optional[float]:
+        """累计实时率，小于1表示快于实时"""
+        if self.audio_seconds == 0:
+            return None
+        return self.processing_seconds / self.audio_seconds
+
+    def stats(self) -> dict:
+        """
+        获取后端统计信息
+
+        Returns:
+            dict: 包含后端名称、模型、加载耗时和实时率的字典
+        """
+        return {
+            "backend": self.name,
+            "model": self.model_name,
+            "load_time": self.load_time,
+            "audio_seconds": self.audio_seconds,
+            "processing_seconds": self.processing_seconds,
+            "real_time_factor": self.real_time_factor,
+            "last_rtf": self.last_rtf,
+        }
+
+
+class WhisperBackend(BaseASRBackend):
+    """openai-whisper 后端（PyTorch）"""
+
+    name = "whisper"
+
+    def _load(self):
+        import whisper
+        self.model = whisper.load_model(self.model_name)
+        self.decode_options = {
+            "language": self.language,     # 主要语言
+            "fp16": False,                # CPU不支持FP16
+            "without_timestamps": True,    # 不需要时间戳信息
+            "temperature": 0.0,
+        }
+
+    def _transcribe(self, audio: np.ndarray, initial_prompt: Optional[str]) -> str:
+        result = self.model.transcribe(
+            audio,
+            **self.decode_options,
+            initial_prompt=initial_prompt
+        )
+        return result["text"].strip()
+
+
+class FasterWhisperBackend(BaseASRBackend):
+    """faster-whisper 后端（CTranslate2，CPU上使用int8量化推理）"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str, language: str,
+                 compute_type: str = "int8", cpu_threads: int = 0, beam_size: int = 1):
+        """
+        初始化faster-whisper后端
+
+        Args:
+            model_name: 模型名称
+            language: 主要识别的语言
+            compute_type: 计算精度 ("int8", "int8_float32", "float32")
+            cpu_threads: 推理线程数，0 表示使用全部核心
+            beam_size: 束搜索宽度，1 为贪心解码（最快）
+        """
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads or os.cpu_count() or 1
+        self.beam_size = beam_size
+        super().__init__(model_name, language)
+
+    def _load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("使用 faster-whisper 后端需要先安装: pip install faster-whisper") from e
+
+        self.model = WhisperModel(
+            self.model_name,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads
+        )
+
+    def _transcribe(self, audio: np.ndarray, initial_prompt: Optional[str]) -> str:
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=self.beam_size,
+            temperature=0.0,
+            without_timestamps=True,
+            initial_prompt=initial_prompt
+        )
+        # segments 是惰性生成器，遍历时才真正解码
+        return "".join(segment.text for segment in segments).strip()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["compute_type"] = self.compute_type
+        return stats
+
+
+ASR_BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(backend: str, model_name: str, language: str, **options) -> BaseASRBackend:
+    """
+    根据名称创建语音识别后端
+
+    Args:
+        backend: 后端名称 ("whisper" 或 "faster-whisper")
+        model_name: 模型名称
+        language: 主要识别的语言
+        **options: 传给后端的额外参数
+
+    Returns:
+        BaseASRBackend: 后端实例
+    """
+    if backend not in ASR_BACKENDS:
+        error_msg = f"不支持的语音识别后端: {backend}"
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+    return ASR_BACKENDS[backend](model_name, language, **options)
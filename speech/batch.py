@@ -0,0 +1,238 @@
+"""
+批量语音转写模块 - 使用进程池批量转写音频文件
+
+用法:
+    python -m speech.batch <音频目录或清单文件> -o transcripts.jsonl [--model small] [--workers 8]
+
+清单文件可以是每行一个路径的文本文件，也可以是每行包含 "path" 字段的 JSONL。
+结果逐条追加写入 JSONL，重新运行时会跳过已成功转写的文件。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from rich.console import Console
+from rich.progress import (
+    Progress,
+    SpinnerColumn,
+    TextColumn,
+    BarColumn,
+    MofNCompleteColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn
+)
+
+from config import ASR_CONFIG
+from speech.audio import WHISPER_SAMPLE_RATE, load_audio
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+console = Console()
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".opus", ".flac", ".webm", ".aac", ".amr"}
+
+# 每个工作进程独立持有的模型，只在进程初始化时加载一次
+_worker_backend = None
+_worker_vad = None
+
+
+def collect_audio_files(source: str) -> List[str]:
+    """
+    收集待转写的音频文件
+
+    Args:
+        source: 音频目录（递归查找）或清单文件
+
+    Returns:
+        list: 音频文件的绝对路径列表
+    """
+    source_path = Path(source)
+    if source_path.is_dir():
+        files = (p for p in source_path.rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+        return sorted(str(p.resolve()) for p in files)
+
+    files = []
+    with open(source_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                line = entry.get("path") or entry["audio"]
+            path = Path(line)
+            # 清单中的相对路径相对于清单文件所在目录
+            if not path.is_absolute():
+                path = source_path.parent / path
+            files.append(str(path.resolve()))
+    return files
+
+
+def load_completed(output_path: str) -> Set[str]:
+    """
+    读取已有结果文件中转写成功的文件路径
+
+    Args:
+        output_path: JSONL 结果文件
+
+    Returns:
+        set: 已完成的文件路径
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 上次运行中断时可能留下不完整的最后一行
+                continue
+            if not record.get("error"):
+                completed.add(record["path"])
+    return completed
+
+
+def _init_worker(backend: str, model_name: str, language: str, threads: int):
+    """工作进程初始化：限制线程数并加载模型"""
+    global _worker_backend, _worker_vad
+    from speech.backends import create_backend
+    from speech.vad import VoiceActivityDetector
+
+    options = dict(ASR_CONFIG.get(backend, {}))
+    if backend == "whisper":
+        # 避免多个进程各自占满全部核心
+        import torch
+        torch.set_num_threads(threads)
+    else:
+        options["cpu_threads"] = threads
+
+    _worker_backend = create_backend(backend, model_name, language, **options)
+    _worker_vad = VoiceActivityDetector(sample_rate=WHISPER_SAMPLE_RATE)
+
+
+def _transcribe_file(path: str) -> dict:
+    """在工作进程中转写单个文件"""
+    record = {"path": path, "text": "", "duration": None,
+              "processing_time": None, "rtf": None, "error": None}
+    start = time.perf_counter()
+    try:
+        audio = load_audio(path)
+        record["duration"] = len(audio) / WHISPER_SAMPLE_RATE
+        speech = _worker_vad.trim(audio)
+        if len(speech):
+            record["text"] = _worker_backend.transcribe(speech)
+    except Exception as e:
+        record["error"] = str(e)
+    elapsed = time.perf_counter() - start
+    record["processing_time"] = elapsed
+    if record["duration"]:
+        record["rtf"] = elapsed / record["duration"]
+    return record
+
+
+def transcribe_batch(files: Iterable[str], output_path: str,
+                     model_name: str = "small", language: str = "zh",
+                     backend: Optional[str] = None, workers: Optional[int] = None) -> dict:
+    """
+    使用进程池批量转写音频文件，结果逐条写入 JSONL
+
+    Args:
+        files: 音频文件路径
+        output_path: JSONL 结果文件，已成功的文件会被跳过
+        model_name: 模型名称
+        language: 主要识别的语言
+        backend: 识别后端，默认读取配置
+        workers: 工作进程数，默认等于CPU核心数
+
+    Returns:
+        dict: 本次运行的汇总统计
+    """
+    backend = backend or ASR_CONFIG["backend"]
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, workers or cpu_count)
+    threads = max(1, cpu_count // workers)
+
+    files = list(files)
+    completed = load_completed(output_path)
+    pending = [f for f in files if f not in completed]
+    summary = {
+        "total": len(files),
+        "skipped": len(files) - len(pending),
+        "succeeded": 0,
+        "failed": 0,
+        "audio_seconds": 0.0,
+        "processing_seconds": 0.0,
+        "wall_seconds": 0.0,
+    }
+    logger.info("批量转写: 共 %s 个文件，跳过已完成 %s 个，%s 个进程 x %s 线程",
+                len(files), summary['skipped'], workers, threads)
+    if not pending:
+        return summary
+
+    start = time.perf_counter()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=_init_worker,
+                      initargs=(backend, model_name, language, threads)) as pool, \
+            open(output_path, "a", encoding="utf-8") as out, \
+            Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(complete_style="green", finished_style="bright_green"),
+                MofNCompleteColumn(),
+                TimeElapsedColumn(),
+                TimeRemainingColumn(),
+                console=console
+            ) as progress:
+        task = progress.add_task("[cyan]批量转写中...", total=len(pending))
+        for record in pool.imap_unordered(_transcribe_file, pending):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if record["error"]:
+                summary["failed"] += 1
+                logger.warning("转写失败 %s: %s", record['path'], record['error'])
+            else:
+                summary["succeeded"] += 1
+                summary["audio_seconds"] += record["duration"]
+                summary["processing_seconds"] += record["processing_time"]
+            progress.advance(task)
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    if summary["wall_seconds"] > 0:
+        # 整体吞吐：每秒墙钟时间处理的音频秒数
+        summary["throughput"] = summary["audio_seconds"] / summary["wall_seconds"]
+    logger.info("批量转写完成: %s", summary)
+    return summary
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="批量转写音频文件")
+    parser.add_argument("source", help="音频目录或清单文件（每行一个路径或JSONL）")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl", help="结果JSONL文件")
+    parser.add_argument("--model", default="small", help="Whisper模型名称")
+    parser.add_argument("--language", default="zh", help="主要识别的语言")
+    parser.add_argument("--backend", default=None, help="识别后端 (whisper / faster-whisper)")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认等于CPU核心数")
+    args = parser.parse_args()
+
+    files = collect_audio_files(args.source)
+    summary = transcribe_batch(
+        files,
+        args.output,
+        model_name=args.model,
+        language=args.language,
+        backend=args.backend,
+        workers=args.workers
+    )
+    console.print(f"[bold green]完成[/bold green] 成功 {summary['succeeded']}，"
+                  f"失败 {summary['failed']}，跳过 {summary['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+语音合成分块模块 - 把流式生成的文本切分为适合合成的片段
+"""
+import time
+from collections import deque
+from typing import List, Optional
+
+# 句末标点：在这里切分不会打断语义
+SENTENCE_DELIMITERS = set("。！？；!?;\n")
+# 英文句点需要后面跟空白才算句末，避免切开小数和缩写
+AMBIGUOUS_DELIMITERS = set(".")
+# 分句标点：句子过长时优先在这里强制切分
+CLAUSE_DELIMITERS = set("，、：,:—）)")
+
+
+class AdaptiveChunker:
+    """
+    自适应分块器
+
+    - 第一个片段尽早输出（遇到句末或分句标点即可），缩短首次发声的等待时间
+    - 之后把较短的句子合并为更大的片段，减少合成请求次数；
+      已完整的短句最多等到下一句结束或等待 max_hold_seconds 后输出
+    - 没有标点的长文本在超过上限时按分句标点或空白强制切分
+    """
+
+    def __init__(self, first_chunk_chars: int = 8, min_chunk_chars: int = 40,
+                 max_chunk_chars: int = 120, max_hold_seconds: float = 0.5,
+                 history_size: int = 200):
+        """
+        初始化分块器
+
+        Args:
+            first_chunk_chars: 第一个片段在分句标点处切分所需的最少字符数
+            min_chunk_chars: 之后每个片段的目标最少字符数
+            max_chunk_chars: 片段的最大字符数，超过时强制切分
+            max_hold_seconds: 不足目标长度的完整句子最多等待合并的时间（秒），
+                在收到下一段文本时检查
+            history_size: 用于统计的最近记录条数
+        """
+        self.first_chunk_chars = first_chunk_chars
+        self.min_chunk_chars = min_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.max_hold_seconds = max_hold_seconds
+
+        self._pending = ""
+        self._started_at: Optional[float] = None
+        # 待输出的文本中第一次出现完整句子的时间
+        self._held_since: Optional[float] = None
+        self._emitted_in_response = 0
+
+        # 统计信息
+        self.responses = 0
+        self.chunks = 0
+        self.total_chars = 0
+        self.forced_splits = 0
+        self.chunk_sizes = deque(maxlen=history_size)
+        self.first_chunk_latencies = deque(maxlen=history_size)
+
+    def reset(self):
+        """开始新的回复，首个片段延迟从这里开始计时"""
+        self._pending = ""
+        self._started_at = time.perf_counter()
+        self._held_since = None
+        self._emitted_in_response = 0
+        self.responses += 1
+
+    def feed(self, text: str) -> List[str]:
+        """
+        输入新生成的文本
+
+        Args:
+            text: 流式输出的文本增量
+
+        Returns:
+            list: 可以立即合成的片段
+        """
+        if self._started_at is None:
+            self.reset()
+        self._pending += text
+        return self._drain()
+
+    def flush(self) -> List[str]:
+        """
+        回复结束，输出剩余的全部文本
+
+        Returns:
+            list: 剩余片段
+        """
+        chunks = self._drain(final=True)
+        if self._pending.strip():
+            chunks.append(self._emit(len(self._pending)))
+        self._pending = ""
+        self._started_at = None
+        self._held_since = None
+        return chunks
+
+    def discard(self):
+        """回复被取消，丢弃剩余的文本（不计入统计）"""
+        self._pending = ""
+        self._started_at = None
+        self._held_since = None
+
+    def _is_boundary(self, index: int, final: bool) -> bool:
+        """判断 index 处的字符是否是句末"""
+        char = self._pending[index]
+        if char in SENTENCE_DELIMITERS:
+            return True
+        if char in AMBIGUOUS_DELIMITERS:
+            if index + 1 < len(self._pending):
+                return self._pending[index + 1].isspace()
+            return final
+        return False
+
+    def _drain(self, final: bool = False) -> List[str]:
+        chunks = []
+        while self._pending:
+            end = self._next_cut(final)
+            if end is None:
+                break
+            chunks.append(self._emit(end))
+        return chunks
+
+    def _next_cut(self, final: bool) -> Optional[int]:
+        """返回下一个片段的结束位置（不含），暂不切分时返回None"""
+        pending = self._pending
+        limit = min(len(pending), self.max_chunk_chars)
+
+        if self._emitted_in_response == 0:
+            # 第一个片段：第一个句末，或足够长之后的第一个分句标点
+            for i in range(len(pending)):
+                if self._is_boundary(i, final):
+                    return i + 1
+                if pending[i] in CLAUSE_DELIMITERS and i + 1 >= self.first_chunk_chars:
+                    return i + 1
+                if i + 1 >= self.max_chunk_chars:
+                    break
+        else:
+            # 后续片段：上限以内最后一个句末，且长度达到目标
+            boundaries = [i + 1 for i in range(limit) if self._is_boundary(i, final)]
+            if boundaries:
+                now = time.perf_counter()
+                if self._held_since is None:
+                    self._held_since = now
+                # 长度不足时，短句最多等到下一句结束，或等待 max_hold_seconds
+                if (boundaries[-1] >= self.min_chunk_chars
+                        or len(boundaries) >= 2
+                        or now - self._held_since >= self.max_hold_seconds
+                        or len(pending) >= self.max_chunk_chars):
+                    return boundaries[-1]
+
+        if len(pending) < self.max_chunk_chars:
+            return None
+
+        # 超过上限仍无句末：依次尝试分句标点、空白，最后硬切
+        self.forced_splits += 1
+        window = pending[:self.max_chunk_chars]
+        cut = max((i for i, ch in enumerate(window) if ch in CLAUSE_DELIMITERS), default=-1)
+        if cut > 0:
+            return cut + 1
+        space = window.rfind(" ")
+        return space + 1 if space > 0 else self.max_chunk_chars
+
+    def _emit(self, end: int) -> str:
+        chunk, self._pending = self._pending[:end], self._pending[end:]
+        if self._emitted_in_response == 0 and self._started_at is not None:
+            self.first_chunk_latencies.append(time.perf_counter() - self._started_at)
+        self._emitted_in_response += 1
+        self._held_since = None
+        self.chunks += 1
+        self.total_chars += len(chunk)
+        self.chunk_sizes.append(len(chunk))
+        return chunk
+
+    def stats(self) -> dict:
+        """
+        获取分块统计信息，用于调整参数
+
+        Returns:
+            dict: 片段数量、长度分布和首个片段延迟
+        """
+        sizes = sorted(self.chunk_sizes)
+        latencies = sorted(self.first_chunk_latencies)
+
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+        return {
+            "responses": self.responses,
+            "chunks": self.chunks,
+            "chunks_per_response": self.chunks / self.responses if self.responses else 0.0,
+            "avg_chunk_chars": self.total_chars / self.chunks if self.chunks else 0.0,
+            "p50_chunk_chars": percentile(sizes, 0.5),
+            "max_chunk_chars": sizes[-1] if sizes else None,
+            "forced_splits": self.forced_splits,
+            "first_chunk_latency_p50": percentile(latencies, 0.5),
+            "first_chunk_latency_p90": percentile(latencies, 0.9),
+        }
@@ -0,0 +1,343 @@
+"""
+音频播放模块 - 把合成的音频流解码为PCM，送入常驻的音频输出流
+"""
+import os
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from config import TTS_CONFIG
+from speech.ring_buffer import ByteRingBuffer
+from utils.logger import SampledLogger, setup_logger
+
+logger = setup_logger(__name__)
+# 输出回调中的日志按间隔采样
+underrun_log = SampledLogger(logger)
+
+
+class AudioSink(ABC):
+    """PCM音频输出的抽象基类（16位有符号整数，小端）"""
+
+    name = "base"
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        """
+        初始化输出
+
+        Args:
+            sample_rate: 采样率
+            channels: 声道数
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bytes_per_second = sample_rate * channels * 2
+        self.bytes_written = 0
+        # 已写入的音频预计播放完毕的时间（time.monotonic）
+        self.playing_until = 0.0
+
+    @abstractmethod
+    def write(self, pcm: bytes):
+        """写入PCM数据，不等待播放"""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """丢弃尚未播放的PCM数据"""
+        pass
+
+    @abstractmethod
+    def drain(self, timeout: Optional[float] = None):
+        """等待已写入的PCM数据播放完毕"""
+        pass
+
+    def close(self):
+        """关闭输出"""
+        pass
+
+    def _scheduled(self, size: int):
+        """记录新写入的PCM，更新预计播放完毕的时间"""
+        now = time.monotonic()
+        self.playing_until = max(now, self.playing_until) + size / self.bytes_per_second
+
+
+class SoundDeviceSink(AudioSink):
+    """
+    sounddevice 常驻输出流
+
+    输出流只打开一次，回调从PCM缓冲区取数据；缓冲区为空时输出静音，
+    所以句子之间首尾相接，不会因为重新打开设备产生停顿。
+    缓冲区是预分配的有界环形队列，写满时 write 阻塞，解码速度被限制在播放速度。
+    """
+
+    name = "sounddevice"
+
+    # 缓冲区持续写不进数据的最长等待时间（秒），超过时认为输出流已停止工作
+    WRITE_TIMEOUT = 5.0
+
+    def __init__(self, sample_rate: int, channels: int = 1, blocksize: int = 1024,
+                 buffer_seconds: float = None):
+        super().__init__(sample_rate, channels)
+        self.blocksize = blocksize
+        if buffer_seconds is None:
+            buffer_seconds = TTS_CONFIG["playback_buffer_seconds"]
+        # 按整帧对齐，避免16位采样在环形缓冲区边界处被拆开
+        frame_bytes = channels * 2
+        capacity = max(int(buffer_seconds * self.bytes_per_second) // frame_bytes, blocksize) * frame_bytes
+        self._buffer = ByteRingBuffer(capacity)
+        self._lock = threading.Lock()
+        self._stream = None
+        self.underruns = 0
+
+    def _ensure_stream(self):
+        """首次写入时打开输出流（调用方持有锁）"""
+        if self._stream is None:
+            import sounddevice as sd
+            self._stream = sd.RawOutputStream(
+                samplerate=self.sample_rate,
+                channels=self.channels,
+                dtype="int16",
+                blocksize=self.blocksize,
+                callback=self._callback
+            )
+            self._stream.start()
+            logger.debug("音频输出流已打开: %sHz, %s声道", self.sample_rate, self.channels)
+
+    def _callback(self, outdata, frames, time_info, status):
+        size = frames * self.channels * 2
+        available = self._buffer.read_into(outdata, size)
+        if available < size:
+            # 播放中途缓冲区不够（解码跟不上）记为欠载，其余部分补静音
+            if available:
+                self.underruns += 1
+                underrun_log.debug("播放欠载: 缺少 %s 字节，共 %s 次", size - available, self.underruns,
+                                   extra={"event": "audio.underrun"})
+            outdata[available:] = b"\x00" * (size - available)
+
+    def write(self, pcm: bytes):
+        """写入PCM数据，缓冲区满时等待播放腾出空间"""
+        with self._lock:
+            self._ensure_stream()
+        written = self._buffer.write(pcm, timeout=self.WRITE_TIMEOUT)
+        self.bytes_written += written
+        self._scheduled(written)
+        if written < len(pcm) and len(self._buffer) == self._buffer.capacity:
+            logger.warning("音频输出停滞，丢弃 %s 字节", len(pcm) - written)
+
+    def clear(self):
+        """丢弃尚未播放的PCM数据，阻塞中的 write 立即返回"""
+        self._buffer.clear()
+        self.playing_until = 0.0
+
+    def drain(self, timeout: Optional[float] = None):
+        self._buffer.wait_empty(timeout)
+
+    def close(self):
+        with self._lock:
+            stream, self._stream = self._stream, None
+        self._buffer.clear()
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+
+class NullAudioSink(AudioSink):
+    """丢弃音频的输出，用于无声卡环境和基准测试，记录PCM到达的时间"""
+
+    name = "null"
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        super().__init__(sample_rate, channels)
+        self.first_write_at: Optional[float] = None
+        self.audio_received = threading.Event()
+
+    def write(self, pcm: bytes):
+        if self.first_write_at is None:
+            self.first_write_at = time.perf_counter()
+        self.bytes_written += len(pcm)
+        self.audio_received.set()
+
+    def clear(self):
+        pass
+
+    def drain(self, timeout: Optional[float] = None):
+        pass
+
+    def reset(self):
+        """清空到达时间记录"""
+        self.first_write_at = None
+        self.audio_received.clear()
+
+    @property
+    def duration(self) -> float:
+        """已写入音频的总时长（秒）"""
+        return self.bytes_written / self.bytes_per_second
+
+
+AUDIO_SINKS = {
+    SoundDeviceSink.name: SoundDeviceSink,
+    NullAudioSink.name: NullAudioSink,
+}
+
+
+def create_sink(sink: str, sample_rate: int, channels: int = 1) -> AudioSink:
+    """
+    根据名称创建音频输出
+
+    Args:
+        sink: 输出名称 ("sounddevice", "null")
+        sample_rate: 采样率
+        channels: 声道数
+
+    Returns:
+        AudioSink: 音频输出实例
+    """
+    if sink not in AUDIO_SINKS:
+        raise ValueError(f"不支持的音频输出: {sink}，可选: {', '.join(AUDIO_SINKS)}")
+    return AUDIO_SINKS[sink](sample_rate, channels)
+
+
+class StreamingAudioPlayer:
+    """
+    流式音频播放器
+
+    所有句子的 mp3 数据写入同一个常驻的 ffmpeg 解码进程，解码得到的PCM
+    由读取线程送入常驻的音频输出流。首个音频块到达即开始发声，句子之间
+    不启动新进程、不重新打开音频设备，也不产生临时文件。
+    """
+
+    def __init__(self, sink: Optional[AudioSink] = None):
+        """
+        初始化播放器
+
+        Args:
+            sink: 音频输出，默认按配置创建
+        """
+        self.sink = sink or create_sink(TTS_CONFIG["audio_sink"], TTS_CONFIG["playback_sample_rate"])
+        self.command = [
+            TTS_CONFIG["ffmpeg_path"], "-loglevel", "error",
+            "-fflags", "nobuffer", "-probesize", "32", "-analyzeduration", "0",
+            "-f", "mp3", "-i", "pipe:0",
+            "-f", "s16le", "-ac", str(self.sink.channels), "-ar", str(self.sink.sample_rate),
+            "-flush_packets", "1", "pipe:1"
+        ]
+        if shutil.which(self.command[0]) is None:
+            logger.warning("未找到 %s，语音无法播放", self.command[0])
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 停止播放期间读取线程丢弃解码结果，不再等待输出缓冲区
+        self._discarding = threading.Event()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        """启动解码进程（首次使用或进程退出后，调用方持有锁）"""
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+            self._reader = threading.Thread(
+                target=self._read_pcm, args=(self._process,), name="audio-decoder", daemon=True
+            )
+            self._reader.start()
+            logger.debug("解码进程已启动: %s (pid=%s)", self.command[0], self._process.pid)
+        return self._process
+
+    def _read_pcm(self, process: subprocess.Popen):
+        """读取解码后的PCM并写入音频输出，直到解码进程退出"""
+        fd = process.stdout.fileno()
+        # 按整帧写入，避免16位采样被拆开
+        frame_bytes = self.sink.channels * 2
+        remainder = b""
+        while True:
+            data = os.read(fd, 8192)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - len(data) % frame_bytes
+            remainder = data[usable:]
+            if usable and not self._discarding.is_set():
+                # 输出缓冲区满时在这里阻塞，解码进程随之暂停
+                self.sink.write(data[:usable])
+
+    def write(self, chunk: bytes):
+        """
+        写入一个音频块
+
+        Args:
+            chunk: mp3 数据
+        """
+        with self._lock:
+            for attempt in range(2):
+                process = self._ensure_process()
+                try:
+                    process.stdin.write(chunk)
+                    process.stdin.flush()
+                    return
+                except (BrokenPipeError, OSError) as e:
+                    # 解码进程意外退出，重启后重试一次
+                    self._process = None
+                    if attempt:
+                        raise RuntimeError(f"解码进程不可用: {str(e)}") from e
+
+    def is_playing(self, tail: float = 0.0) -> bool:
+        """
+        是否正在播放
+
+        Args:
+            tail: 播放完毕后仍视为正在播放的时长（秒）
+        """
+        return time.monotonic() < self.sink.playing_until + tail
+
+    def play(self, chunks: Iterable[bytes]):
+        """
+        播放一句话的音频流，音频块到达即写入
+
+        Args:
+            chunks: 音频数据块
+        """
+        for chunk in chunks:
+            self.write(chunk)
+
+    def _stop_process(self):
+        """结束解码进程并等待读取线程退出（调用方持有锁）"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._reader is not None:
+            self._reader.join()
+        self._process = None
+        self._reader = None
+
+    def stop(self):
+        """立即停止当前播放（丢弃解码中和已缓冲的音频），下次写入时重新启动解码进程"""
+        # 写入方可能正阻塞在解码进程的输入管道上并持有锁：先让读取线程丢弃数据、
+        # 唤醒等待输出缓冲区的写入，解码进程继续消费输入，写入方随之返回
+        self._discarding.set()
+        self.sink.clear()
+        try:
+            with self._lock:
+                self._stop_process()
+                self.sink.clear()
+        finally:
+            self._discarding.clear()
+
+    def close(self):
+        """等待已写入的音频播放完毕后关闭解码进程和音频输出"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                try:
+                    self._process.stdin.close()
+                    self._process.wait(timeout=30)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._process.kill()
+            if self._reader is not None:
+                self._reader.join()
+            self._process = None
+            self._reader = None
+        self.sink.drain(timeout=30)
+        self.sink.close()
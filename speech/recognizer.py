@@ -3,6 +3,7 @@
 """
 import os
 from pathlib import Path
+from typing import Callable, Optional
 from rich.progress import (
     Progress,
     SpinnerColumn,
@@ -13,57 +14,73 @@ from rich.progress import (
 )
 from rich.console import Console
 import sounddevice as sd
-import soundfile as sf
 import numpy as np
-import whisper
-from utils.logger import setup_logger
+from config import ASR_CONFIG
+from speech.audio import AudioSource, load_audio
+from speech.backends import create_backend
+from speech.ring_buffer import AudioRingBuffer
+from speech.transcripts import join_transcripts, stitch_transcripts
+from speech.vad import VoiceActivityDetector
+from utils.logger import SampledLogger, setup_logger, truncate
+from utils.tracing import span, start_span, use_span
 from rich.live import Live
 from rich.text import Text
-import time
+import contextvars
+import threading
 
 logger = setup_logger(__name__)
 console = Console()
+# 录音回调每 0.1 秒执行一次，其中的日志按间隔采样
+callback_log = SampledLogger(logger)
+
 
 class WhisperRecognizer:
     """Whisper语音识别器"""
     
-    def __init__(self, model_name: str = "small", language: str = "zh"):
+    def __init__(self, model_name: str = "small", language: str = "zh", backend: str = None):
         """
         初始化Whisper模型
         
         Args:
             model_name: 模型名称 ("tiny", "base", "small", "medium", "large")
             language: 主要识别的语言 ("zh", "en", "ja" 等)
+            backend: 识别后端 ("whisper", "faster-whisper")，默认读取配置
         """
-        logger.info(f"正在加载Whisper {model_name}模型...")
-        self.model = whisper.load_model(model_name)
+        backend = backend or ASR_CONFIG["backend"]
+        logger.info("正在加载Whisper %s模型（%s后端）...", model_name, backend)
+        self.backend = create_backend(backend, model_name, language, **ASR_CONFIG.get(backend, {}))
         self.language = language
         
         # 录音设置
         self.sample_rate = 16000
         self.channels = 1
         
-        # 识别设置
-        self.decode_options = {
-            "language": language,          # 主要语言
-            "fp16": False,                # 使用FP16加速（如果GPU支持）
-            "without_timestamps": True,    # 不需要时间戳信息
-        }
-        
         # VAD（语音活动检测）设置
-        self.vad_threshold = 0.005       # 降低音量阈值
         self.silence_duration = 5.0      # 停顿检测时长（秒）
-        self.min_speech_duration = 0.5   # 最短语音要求
+        self.min_speech_duration = 0.2   # 最短语音要求（秒）
+        self.vad = VoiceActivityDetector(
+            sample_rate=self.sample_rate,
+            min_speech_duration=self.min_speech_duration
+        )
         
         # 调试设置
         self.show_volume = True         # 显示音量
         
-        # 实时识别设置
-        self.segment_duration = 3.0    # 每个音频段的长度（秒）
-        self.buffer = []               # 音频缓冲区
-        self.last_text = ""           # 最后一段识别的文本
+        # 检测到用户开始说话时的回调（用于打断正在播放的回答），参数为当前音量；
+        # 返回 False 表示这段声音不算打断（例如录到的是扬声器的声音），之后的语音会再次回调
+        self.on_speech_start: Optional[Callable[[float], Optional[bool]]] = None
+        
+        # 实时识别设置（固定长度的重叠滑动窗口）
+        self.window_duration = 6.0     # 每个识别窗口的长度（秒）
+        self.window_overlap = 1.0      # 相邻窗口的重叠长度（秒）
+        self.buffer_duration = 30.0    # 录音环形缓冲区保留的时长（秒）
+        self.copy_headroom = 12.0      # 窗口距离被覆盖不足该时长（秒）时复制后再识别
+        self.last_text = ""           # 拼接后的识别文本
+        
+        # 预分配的录音缓冲区，长时间录音时内存占用保持不变
+        self.audio_buffer = AudioRingBuffer(int(self.buffer_duration * self.sample_rate))
         
-        logger.info(f"Whisper {model_name}模型加载完成，语言设置: {language}")
+        logger.info("Whisper %s模型加载完成，语言设置: %s", model_name, language)
     
     def _get_volume(self, audio_chunk: np.ndarray) -> float:
         """计算音频块的音量"""
@@ -71,33 +88,35 @@ class WhisperRecognizer:
     
     def _is_silent(self, audio_chunk: np.ndarray) -> bool:
         """检测音频片段是否为静音"""
-        volume = self._get_volume(audio_chunk)
-        return volume < self.vad_threshold
+        return not self.vad.update(audio_chunk)
     
     def record_and_transcribe(self) -> str:
         """实时录音并识别"""
         logger.info("开始录音和实时识别...")
+        record_span = start_span("asr.record")
         console.print("[bold cyan]请说话[/bold cyan]（静音超过5秒或按Ctrl+C停止）...")
-        console.print(f"音量阈值: [yellow]{self.vad_threshold:.4f}[/yellow]")
         
-        audio_chunks = []
+        self.last_text = ""
+        self.vad.reset()
+        self.audio_buffer.reset()
         silence_counter = 0
         speech_detected = False
+        speech_start_handled = False
         max_volume = 0.0
-        segment_samples = int(self.segment_duration * self.sample_rate)
-        accumulated_samples = 0
         
         def callback(indata, frames, time, status):
+            # 实时音频回调中只写入预分配的缓冲区，识别在独立线程完成
             if status:
-                logger.warning(f"录音状态: {status}")
-            audio_chunks.append(indata.copy())
-            
-            nonlocal accumulated_samples
-            accumulated_samples += len(indata)
-            
-            if accumulated_samples >= segment_samples:
-                self._process_audio_segment(audio_chunks)
-                accumulated_samples = 0
+                callback_log.warning("录音状态: %s", status, extra={"event": "asr.audio_status"})
+            else:
+                callback_log.debug("录音回调: %s帧", frames, extra={"event": "asr.audio_callback"})
+            self.audio_buffer.write(indata[:, 0])
+        
+        # 识别线程中的 span 属于本次录音
+        with use_span(record_span):
+            worker_context = contextvars.copy_context()
+        worker = threading.Thread(target=worker_context.run, args=(self._transcription_worker,), daemon=True)
+        worker.start()
         
         try:
             with Live(auto_refresh=True) as live:
@@ -106,19 +125,26 @@ class WhisperRecognizer:
                                   callback=callback,
                                   blocksize=int(self.sample_rate * 0.1)):
                     
+                    last_total = 0
                     while True:
                         sd.sleep(50)  # 减少刷新间隔
                         
-                        if len(audio_chunks) > 0:
-                            current_chunk = audio_chunks[-1]
+                        total = self.audio_buffer.total_written
+                        if total != last_total:
+                            # 上次检查之后新录到的音频（零拷贝视图）
+                            current_chunk = self.audio_buffer.read(
+                                max(last_total, self.audio_buffer.oldest), total
+                            )
+                            last_total = total
                             volume = self._get_volume(current_chunk)
                             max_volume = max(max_volume, volume)
-                            is_silent = volume < self.vad_threshold
+                            is_silent = self._is_silent(current_chunk)
+                            threshold = self.vad.threshold
                             
                             # 更新音量显示
                             if self.show_volume:
                                 bar_length = 40
-                                volume_ratio = volume/max(max_volume, self.vad_threshold)
+                                volume_ratio = min(volume/max(max_volume, threshold), 1.0)
                                 volume_bar = "█" * int(volume_ratio * bar_length)
                                 # 根据音量大小改变颜色
                                 if volume_ratio > 0.8:
@@ -137,19 +163,23 @@ class WhisperRecognizer:
                                 display.append(" " * (bar_length - len(volume_bar)))
                                 display.append("] | ")
                                 display.append("阈值: ", style="bold")
-                                display.append(f"{self.vad_threshold:.4f}", style="cyan")
+                                display.append(f"{threshold:.4f}", style="cyan")
                                 
                                 # 更新显示
                                 live.update(display)
                             
                             if is_silent:
-                                silence_counter += 0.1
+                                silence_counter += len(current_chunk) / self.sample_rate
                                 if speech_detected and silence_counter >= self.silence_duration:
                                     console.print("\n[yellow]检测到静音，停止录音[/yellow]")
                                     break
                             else:
                                 silence_counter = 0
+                                if not speech_detected:
+                                    record_span.add_event("speech_start")
                                 speech_detected = True
+                                if not speech_start_handled and self.on_speech_start:
+                                    speech_start_handled = self.on_speech_start(volume) is not False
         
         except KeyboardInterrupt:
             logger.info("用户手动停止录音")
@@ -157,109 +187,194 @@ class WhisperRecognizer:
         
         finally:
             console.print()
-            if audio_chunks:
-                self._process_audio_segment(audio_chunks)
+            # 通知识别线程处理剩余音频并退出
+            self.audio_buffer.close()
+            worker.join()
+            record_span.set_attribute("chars", len(self.last_text))
+            record_span.end()
         
-        # 返回最后一段识别的文本
-        logger.info(f"完整识别结果: {self.last_text}")
+        logger.info("完整识别结果: %s", truncate(self.last_text))
         console.print(f"\n[bold green]识别完成![/bold green]")
-        return self.last_text  # 返回最后识别的文本
+        return self.last_text
     
-    def _process_audio_segment(self, audio_chunks: list):
-        """处理音频段并进行识别"""
-        if not audio_chunks:
-            return
+    def _transcription_worker(self):
+        """
+        识别工作线程：按固定长度的重叠窗口识别，并拼接各窗口文本
         
-        # 合并音频块
-        audio_data = np.concatenate(audio_chunks)
+        每个窗口的识别代价固定，不会随录音时长增长；窗口直接取自
+        环形缓冲区的零拷贝视图，识别落后较多时改为复制（见 _read_window）。
+        """
+        buffer = self.audio_buffer
+        window_samples = int(self.window_duration * self.sample_rate)
+        overlap_samples = int(self.window_overlap * self.sample_rate)
+        step_samples = window_samples - overlap_samples
+        window_start = 0  # 当前窗口起点的绝对下标
         
-        # 保存临时文件
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        # 使用时间戳作为文件名，避免冲突
-        temp_file = temp_dir / f"segment_{int(time.time() * 1000)}.wav"
-        sf.write(str(temp_file), audio_data, self.sample_rate)
+        while buffer.wait_for(window_start + window_samples):
+            if window_start < buffer.oldest:
+                # 识别速度跟不上录音，跳过已被覆盖的音频
+                logger.warning("识别速度落后于录音，跳过部分音频")
+                window_start = buffer.oldest
+                continue
+            
+            window, copied = self._read_window(window_start, window_start + window_samples)
+            self._process_window(window, show_progress=False, start=None if copied else window_start)
+            # 保留重叠部分作为下一个窗口的开头
+            window_start += step_samples
+        
+        # 录音结束，识别最后一个不完整的窗口（只含重叠部分时无需再识别）
+        window_start = max(window_start, buffer.oldest)
+        end = buffer.total_written
+        if end - window_start > (overlap_samples if window_start > 0 else 0):
+            window, copied = self._read_window(window_start, end)
+            self._process_window(window, show_progress=True, start=None if copied else window_start)
+    
+    def _read_window(self, start: int, end: int):
+        """
+        读取识别窗口
         
+        录音回调会在缓冲区写满一圈后覆盖 start 处的样本。距离覆盖还有较长时间时
+        返回零拷贝视图；识别落后、剩余时间不足 copy_headroom 秒时复制一份。
+        
+        Returns:
+            tuple: (音频, 是否为副本)
+        """
+        buffer = self.audio_buffer
+        window = buffer.read(start, end)
+        headroom = start + buffer.capacity - buffer.total_written
+        if headroom < self.copy_headroom * self.sample_rate:
+            return window.copy(), True
+        return window, False
+    
+    def _process_window(self, audio: np.ndarray, show_progress: bool, start: Optional[int] = None):
+        """
+        识别单个窗口并拼接到已识别的文本
+        
+        Args:
+            audio: 窗口音频
+            show_progress: 是否显示进度条
+            start: 音频为缓冲区视图时窗口起点的绝对下标，用于检查识别期间是否被覆盖
+        """
         try:
-            # 识别当前段
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(complete_style="green", finished_style="bright_green"),
-                TimeElapsedColumn(),
-                TimeRemainingColumn(),
-                console=console,
-                transient=True
-            ) as progress:
-                
-                task = progress.add_task("[cyan]识别中...", total=100)
-                
-                def progress_callback(value):
-                    progress.update(task, completed=int(value * 100))
-                
-                result = self.model.transcribe(
-                    str(temp_file),
-                    **self.decode_options,
-                    initial_prompt="这是一段中文对话。",
-                    temperature=0.0
-                )
-                
-                # 确保进度条完成
-                progress.update(task, completed=100)
+            text = self._transcribe_speech(audio, "[cyan]识别中...", show_progress=show_progress)
+        except Exception as e:
+            logger.error("窗口识别失败: %s", e)
+            return
+        
+        if start is not None and start < self.audio_buffer.oldest:
+            # 识别期间录音写满一圈，视图中的样本已被新录音覆盖
+            logger.warning("识别期间窗口音频已被覆盖，丢弃该窗口的结果")
+            return
+        
+        if text:
+            self.last_text = stitch_transcripts(self.last_text, text)
+            console.print(f"[green]当前识别:[/green] {self.last_text}")
+    
+    def _transcribe_speech(self, audio: np.ndarray, description: str,
+                           show_progress: bool = True) -> str:
+        """
+        先用VAD去掉静音并按停顿切分语句，只把语音部分交给Whisper
+        
+        Args:
+            audio: 单声道 float32 音频
+            description: 进度条描述
+            show_progress: 是否显示进度条
             
-            text = result["text"].strip()
-            if text:
-                console.print(f"\n[green]当前识别:[/green] {text}")
-                self.last_text = text  # 只保存最新的文本
+        Returns:
+            str: 各语句识别文本拼接后的结果，整段静音时返回空字符串
+        """
+        utterances = self.vad.split(audio)
+        if not utterances:
+            logger.debug("未检测到语音，跳过识别")
+            return ""
         
-        finally:
-            # 清理临时文件
-            try:
-                os.remove(temp_file)
-            except Exception as e:
-                logger.warning(f"删除临时文件失败: {str(e)}")
+        text = ""
+        for utterance in utterances:
+            text = join_transcripts(
+                text,
+                self._transcribe_array(utterance, description, show_progress=show_progress)
+            )
+        return text
     
-    def transcribe_audio(self, audio_path: str) -> str:
-        """将音频转换为文字"""
+    def _transcribe_array(self, audio: np.ndarray, description: str,
+                          show_progress: bool = True) -> str:
+        """
+        对内存中的 16kHz float32 音频进行识别
+        
+        Args:
+            audio: 单声道 float32 音频
+            description: 进度条描述
+            show_progress: 是否显示进度条（录音界面显示期间需关闭）
+            
+        Returns:
+            str: 识别文本
+        """
+        if not show_progress:
+            return self._run_model(audio)
+        
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(complete_style="green", finished_style="bright_green"),
+            TimeElapsedColumn(),
+            TimeRemainingColumn(),
+            console=console,
+            transient=True
+        ) as progress:
+            task = progress.add_task(description, total=100)
+            
+            text = self._run_model(audio)
+            
+            # 确保进度条完成
+            progress.update(task, completed=100)
+        
+        return text
+    
+    def _run_model(self, audio: np.ndarray) -> str:
+        """调用识别后端识别音频"""
+        with span("asr.transcribe", backend=self.backend.name,
+                  audio_seconds=round(len(audio) / self.sample_rate, 2)):
+            return self.backend.transcribe(audio, initial_prompt="这是一段中文对话。")
+    
+    def get_stats(self) -> dict:
+        """
+        获取识别后端的统计信息
+        
+        Returns:
+            dict: 包含后端名称、加载耗时和实时率（RTF）的字典
+        """
+        return self.backend.stats()
+    
+    def transcribe_audio(self, audio: AudioSource, sample_rate: Optional[int] = None) -> str:
+        """
+        将音频转换为文字
+        
+        Args:
+            audio: 音频文件路径、编码后的音频字节或 PCM 数组
+            sample_rate: 数组输入的采样率，默认与录音采样率一致
+            
+        Returns:
+            str: 识别文本
+        """
+        is_path = isinstance(audio, (str, Path))
         try:
-            logger.info(f"开始转写音频: {audio_path}")
+            source = audio if is_path else f"<{type(audio).__name__}>"
+            logger.info("开始转写音频: %s", source)
             console.print("\n[bold cyan]正在进行语音识别...[/bold cyan]")
             
-            # 使用rich的进度条
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(complete_style="green", finished_style="bright_green"),
-                TimeElapsedColumn(),
-                TimeRemainingColumn(),
-                console=console,
-                transient=True
-            ) as progress:
-                task = progress.add_task("[cyan]语音识别中...", total=100)
-                
-                # 使用转写选项
-                result = self.model.transcribe(
-                    audio_path,
-                    **self.decode_options,
-                    initial_prompt="这是一段中文对话。",
-                    temperature=0.0,
-                )
-                
-                # 确保进度条完成
-                progress.update(task, completed=100)
-            
-            text = result["text"].strip()
-            logger.info(f"音频转写完成: {text}")
+            audio_data = load_audio(audio, source_rate=sample_rate or self.sample_rate)
+            text = self._transcribe_speech(audio_data, "[cyan]语音识别中...")
+            logger.info("音频转写完成: %s", truncate(text))
             return text
             
         except Exception as e:
-            logger.error(f"音频转写失败: {str(e)}")
+            logger.error("音频转写失败: %s", e)
             raise
         finally:
             # 清理临时文件
-            if audio_path.startswith(str(Path("temp"))):
+            if is_path and str(audio).startswith(str(Path("temp"))):
                 try:
-                    os.remove(audio_path)
-                    logger.debug(f"已删除临时音频文件: {audio_path}")
+                    os.remove(audio)
+                    logger.debug("已删除临时音频文件: %s", audio, extra={"event": "asr.tmp_removed"})
                 except Exception as e:
-                    logger.warning(f"删除临时文件失败: {str(e)}") 
\ No newline at end of file
+                    logger.warning("删除临时文件失败: %s", e)
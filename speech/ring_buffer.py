@@ -0,0 +1,221 @@
+"""
+音频环形缓冲区模块 - 预分配内存的录音缓冲（支持零拷贝读取）和播放缓冲（有界，写满时阻塞）
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    预分配的 float32 环形缓冲区
+
+    内部使用两倍容量的镜像存储：每个样本同时写在 i 和 i + capacity 处，
+    因此任意长度不超过 capacity 的区间都是连续内存，可以直接返回视图。
+    样本位置使用从录音开始计数的绝对下标。
+    """
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 最多保留的样本数
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=np.float32)
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def total_written(self) -> int:
+        """累计写入的样本数（即下一个样本的绝对下标）"""
+        return self._total
+
+    @property
+    def oldest(self) -> int:
+        """仍保留在缓冲区中的最早样本的绝对下标"""
+        return max(0, self._total - self.capacity)
+
+    @property
+    def closed(self) -> bool:
+        """录音是否已结束"""
+        return self._closed
+
+    def reset(self):
+        """清空缓冲区，开始新的录音"""
+        with self._cond:
+            self._total = 0
+            self._closed = False
+
+    def write(self, samples: np.ndarray):
+        """
+        写入样本（录音回调线程调用，不分配新内存）
+
+        Args:
+            samples: 一维 float32 样本
+        """
+        n = len(samples)
+        skipped = 0
+        if n > self.capacity:
+            # 超出容量的部分只保留最新的样本
+            skipped, n = n - self.capacity, self.capacity
+            samples = samples[skipped:]
+
+        with self._cond:
+            pos = (self._total + skipped) % self.capacity
+            first = min(n, self.capacity - pos)
+            rest = n - first
+            self._data[pos:pos + first] = samples[:first]
+            self._data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+            if rest:
+                self._data[:rest] = samples[first:]
+                self._data[self.capacity:self.capacity + rest] = samples[first:]
+            self._total += skipped + n
+            self._cond.notify_all()
+
+    def close(self):
+        """标记录音结束，唤醒等待中的读取方"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wait_for(self, index: int, timeout: Optional[float] = None) -> bool:
+        """
+        等待直到写入的样本数达到 index 或录音结束
+
+        Args:
+            index: 需要等待的绝对样本下标
+            timeout: 超时时间（秒）
+
+        Returns:
+            bool: 样本是否已经足够
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._total >= index or self._closed, timeout)
+            return self._total >= index
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        获取 [start, end) 区间样本的零拷贝视图
+
+        视图在被后续写入覆盖前有效，读取方需要在缓冲区写满一圈前用完。
+
+        Args:
+            start: 起始绝对下标
+            end: 结束绝对下标（不含）
+
+        Returns:
+            np.ndarray: 样本视图
+        """
+        if start < self.oldest or end > self._total or end - start > self.capacity:
+            raise IndexError(f"请求的区间 [{start}, {end}) 超出缓冲区范围 "
+                             f"[{self.oldest}, {self._total})")
+        offset = start % self.capacity
+        return self._data[offset:offset + (end - start)]
+
+    def latest(self, n: int) -> np.ndarray:
+        """获取最近 n 个样本的零拷贝视图"""
+        total = self._total
+        n = min(n, total, self.capacity)
+        return self.read(total - n, total)
+
+
+class ByteRingBuffer:
+    """
+    预分配的有界字节环形队列（一个写入方、一个读取方）
+
+    缓冲区满时 write 阻塞，把压力传回写入方；read_into 从不阻塞，
+    可以在音频回调中调用。读写都不分配新内存，也不移动已缓冲的数据。
+    """
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 最多缓冲的字节数
+        """
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self._view = memoryview(self._data)
+        self._read = 0      # 累计读出的字节数
+        self._written = 0   # 累计写入的字节数
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        """已缓冲、尚未读出的字节数"""
+        return self._written - self._read
+
+    def write(self, data: bytes, timeout: Optional[float] = None) -> int:
+        """
+        写入数据，缓冲区满时等待读取方腾出空间
+
+        等待期间调用 clear() 时放弃剩余的数据并立即返回。
+
+        Args:
+            data: 要写入的数据
+            timeout: 每次等待空间的超时时间（秒）
+
+        Returns:
+            int: 实际写入的字节数
+        """
+        data = memoryview(data)
+        done = 0
+        with self._cond:
+            generation = self._generation
+            while done < len(data):
+                if not self._cond.wait_for(
+                    lambda: len(self) < self.capacity or self._generation != generation, timeout
+                ) or self._generation != generation:
+                    break
+                pos = self._written % self.capacity
+                n = min(len(data) - done, self.capacity - len(self), self.capacity - pos)
+                self._view[pos:pos + n] = data[done:done + n]
+                self._written += n
+                done += n
+                self._cond.notify_all()
+        return done
+
+    def read_into(self, out, size: int) -> int:
+        """
+        读出最多 size 个字节写入 out 的开头，不等待
+
+        Args:
+            out: 可写的缓冲区（如音频回调的 outdata）
+            size: 最多读出的字节数
+
+        Returns:
+            int: 实际读出的字节数
+        """
+        with self._cond:
+            n = min(size, len(self))
+            pos = self._read % self.capacity
+            first = min(n, self.capacity - pos)
+            out[:first] = self._view[pos:pos + first]
+            if n > first:
+                out[first:n] = self._view[:n - first]
+            self._read += n
+            if n:
+                self._cond.notify_all()
+            return n
+
+    def clear(self):
+        """丢弃已缓冲的数据，并让等待中的 write 放弃剩余数据"""
+        with self._cond:
+            self._read = self._written
+            self._generation += 1
+            self._cond.notify_all()
+
+    def wait_empty(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待缓冲的数据全部读出
+
+        Returns:
+            bool: 超时前是否已读空
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self) == 0, timeout)
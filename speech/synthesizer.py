@@ -2,27 +2,156 @@
 语音合成模块 - 使用Edge-TTS进行文字转语音
 """
 import asyncio
+import queue
+import threading
+from concurrent.futures import Future
 from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
 import edge_tts
-from utils.logger import setup_logger
+from config import TTS_CONFIG
+from speech.tts_cache import TTSCache
+from utils.logger import SampledLogger, setup_logger, truncate
+from utils.tracing import start_span
 
 logger = setup_logger(__name__)
+# 每个音频片段都会经过，按间隔采样
+chunk_log = SampledLogger(logger)
+
+class SpeechStream:
+    """
+    一句话的合成音频流
+    
+    合成在事件循环中进行，音频块到达后立即放入队列，
+    播放线程可以在合成完成之前开始读取。
+    """
+    
+    _END = object()
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.error = None
+        self._chunks = queue.Queue()
+        self._future: Optional[Future] = None
+    
+    def _feed(self, chunk: bytes):
+        self._chunks.put(chunk)
+    
+    def _finish(self, error: Exception = None):
+        self.error = error
+        self._chunks.put(self._END)
+    
+    def __iter__(self) -> Iterator[bytes]:
+        """按到达顺序读取音频块，合成失败时抛出异常"""
+        while True:
+            chunk = self._chunks.get()
+            if chunk is self._END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield chunk
+    
+    def cancel(self):
+        """取消尚未完成的合成，正在读取的播放线程随即结束"""
+        if self._future is not None:
+            self._future.cancel()
+        # 合成协程可能还未开始执行，不会再调用 _finish，这里直接结束读取
+        self._finish()
 
 class EdgeTTSSynthesizer:
     """Edge TTS语音合成器"""
     
-    def __init__(self, voice: str = "zh-CN-XiaoxiaoNeural"):
+    def __init__(self, voice: str = "zh-CN-XiaoxiaoNeural", rate: str = None,
+                 use_cache: bool = None):
         """
         初始化Edge TTS
         
         Args:
             voice: 声音选项，默认使用中文女声
+            rate: 语速，如 "+10%"，默认读取配置
+            use_cache: 是否使用合成结果缓存，默认读取配置
         """
         self.voice = voice
+        self.rate = rate or TTS_CONFIG["rate"]
         self.enabled = True  # 添加enabled标志
         self.output_dir = Path("temp")
         self.output_dir.mkdir(exist_ok=True)
-        logger.info(f"初始化Edge TTS，使用声音: {voice}")
+        
+        # 合成结果缓存，命中时不再请求Edge TTS服务
+        if use_cache is None:
+            use_cache = TTS_CONFIG["cache_enabled"]
+        self.cache = TTSCache(
+            cache_dir=TTS_CONFIG["cache_dir"],
+            max_disk_bytes=TTS_CONFIG["cache_max_mb"] * 1024 * 1024,
+            max_memory_bytes=TTS_CONFIG["memory_cache_mb"] * 1024 * 1024
+        ) if use_cache else None
+        
+        # 长期运行的事件循环，避免每句话都创建和销毁事件循环
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="edge-tts-loop",
+            daemon=True
+        )
+        self._loop_thread.start()
+        
+        # 同时进行的合成请求上限，等待者按提交顺序获得许可
+        self._semaphore = asyncio.Semaphore(TTS_CONFIG["max_concurrency"])
+        logger.info("初始化Edge TTS，使用声音: %s", voice)
+    
+    def _run(self, coro):
+        """在合成器的事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        """
+        流式获取合成的音频数据（mp3）
+        
+        Edge TTS 服务每次合成都需要一次独立的 WebSocket 会话，
+        edge_tts 库不支持复用连接，这里复用的是事件循环。
+        缓存命中时直接返回缓存的音频，不访问网络。磁盘缓存的读写在线程池中进行，
+        不阻塞事件循环中并发的其它合成。
+        
+        Args:
+            text: 要转换的文本
+        
+        Yields:
+            bytes: 音频数据块
+        """
+        key = None
+        if self.cache is not None:
+            key = TTSCache.make_key(self.voice, self.rate, text)
+            cached = self.cache.get_memory(key)
+            if cached is None:
+                cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                logger.debug("语音缓存命中: %s", text)
+                yield cached
+                return
+        
+        chunks = []
+        communicate = edge_tts.Communicate(text, self.voice, rate=self.rate)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                chunks.append(chunk["data"])
+                yield chunk["data"]
+        
+        # 只缓存完整合成的音频（中途取消时不会执行到这里）
+        if key is not None and chunks:
+            # 不等待写入完成，音频流立即结束
+            asyncio.get_running_loop().run_in_executor(None, self.cache.put, key, b"".join(chunks))
+    
+    async def synthesize(self, text: str) -> bytes:
+        """
+        合成完整的音频数据（异步接口）
+        
+        Args:
+            text: 要转换的文本
+        
+        Returns:
+            bytes: mp3 音频数据
+        """
+        chunks = [chunk async for chunk in self.stream(text)]
+        return b"".join(chunks)
     
     async def _generate_speech(self, text: str, output_file: str):
         """
@@ -32,8 +161,57 @@ class EdgeTTSSynthesizer:
             text: 要转换的文本
             output_file: 输出文件路径
         """
-        communicate = edge_tts.Communicate(text, self.voice)
-        await communicate.save(output_file)
+        audio = await self.synthesize(text)
+        with open(output_file, "wb") as f:
+            f.write(audio)
+    
+    def open_stream(self, text: str) -> Optional[SpeechStream]:
+        """
+        开始合成并立即返回音频流，不等待合成完成
+        
+        多句话可以依次调用，合成在事件循环中并发进行（受 max_concurrency 限制）。
+        
+        Args:
+            text: 要转换的文本
+            
+        Returns:
+            SpeechStream: 音频流；语音功能关闭时返回None
+        """
+        if not self.enabled:
+            return None
+        
+        speech = SpeechStream(text)
+        # 合成在事件循环线程中进行，span 的父级取自调用方的上下文
+        tts_span = start_span("tts.synthesize", chars=len(text))
+        
+        async def pump():
+            error = None
+            try:
+                async with self._semaphore:
+                    tts_span.add_event("started")
+                    logger.info("开始转换文字为语音: %s", truncate(text),
+                                extra={"event": "tts.start", "chars": len(text)})
+                    first = True
+                    async for chunk in self.stream(text):
+                        if first:
+                            tts_span.add_event("first_audio")
+                            first = False
+                        speech._feed(chunk)
+                        chunk_log.debug("收到音频片段: %s字节", len(chunk), extra={"event": "tts.chunk"})
+                    logger.info("语音生成完成: %s", truncate(text),
+                                extra={"event": "tts.done", "chars": len(text)})
+            except asyncio.CancelledError:
+                tts_span.set_attribute("cancelled", True)
+                raise
+            except Exception as e:
+                logger.error("语音生成失败: %s", e)
+                error = e
+            finally:
+                tts_span.end(error=error)
+                speech._finish(error)
+        
+        speech._future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        return speech
     
     def text_to_speech(self, text: str, output_file: str = None) -> str:
         """
@@ -42,25 +220,47 @@ class EdgeTTSSynthesizer:
         Args:
             text: 要转换的文本
             output_file: 可选的输出文件路径，如果不指定则自动生成
-            
+        
         Returns:
             str: 生成的音频文件路径，如果语音功能关闭则返回None
         """
         if not self.enabled:
             logger.info("语音功能已关闭，跳过语音生成")
             return None
-            
+        
         try:
-            logger.info(f"开始转换文字为语音: {text}")
+            logger.info("开始转换文字为语音: %s", truncate(text),
+                        extra={"event": "tts.start", "chars": len(text)})
             
             if output_file is None:
                 output_file = str(self.output_dir / "response.mp3")
             
-            # 运行异步任务
-            asyncio.run(self._generate_speech(text, output_file))
+            # 在常驻事件循环中运行异步任务
+            self._run(self._generate_speech(text, output_file))
             
-            logger.info(f"语音生成完成: {output_file}")
+            logger.info("语音生成完成: %s", output_file,
+                        extra={"event": "tts.done", "chars": len(text)})
             return output_file
         except Exception as e:
-            logger.error(f"语音生成失败: {str(e)}")
-            raise 
\ No newline at end of file
+            logger.error("语音生成失败: %s", e)
+            raise
+    
+    def cache_stats(self) -> dict:
+        """
+        获取合成缓存的统计信息
+        
+        Returns:
+            dict: 命中率等统计信息，未启用缓存时返回空字典
+        """
+        return self.cache.stats() if self.cache is not None else {}
+    
+    def close(self):
+        """等待尚未完成的缓存写入，然后停止事件循环"""
+        if self._loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self._loop.shutdown_default_executor(), self._loop)
+            try:
+                future.result(timeout=5)
+            except Exception as e:
+                logger.warning("等待语音缓存写入失败: %s", e)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
@@ -0,0 +1,88 @@
+"""
+识别文本拼接模块 - 合并相邻重叠窗口或相邻语句的识别结果
+"""
+import re
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+
+
+def _is_word_char(char: str) -> bool:
+    """是否为非中文单词（英文等以空格分词的语言）的组成字符"""
+    return char.isalnum() and not _CJK_PATTERN.match(char)
+
+
+def _at_word_boundary(text: str, index: int) -> bool:
+    """在 index 处切开 text 时是否不会切断一个非中文单词"""
+    if index <= 0 or index >= len(text):
+        return True
+    return not (_is_word_char(text[index - 1]) and _is_word_char(text[index]))
+
+
+def stitch_transcripts(previous: str, current: str, max_overlap: int = 32, min_match: int = 2,
+                       max_drift: int = 3) -> str:
+    """
+    拼接相邻重叠窗口的识别文本，去掉重叠区域重复识别出的内容
+
+    重叠区域只可能出现在前文末尾和新文开头，匹配必须贴着两个窗口的交界处，
+    且不能切断英文等语言的单词；找不到这样的匹配时按不重叠拼接。
+
+    Args:
+        previous: 已拼接的文本
+        current: 新窗口的识别文本
+        max_overlap: 参与匹配的最大字符数
+        min_match: 认定为重叠的最短匹配长度
+        max_drift: 近似匹配时，匹配距前文末尾、新文开头最多相差的字符数
+            （窗口边缘处的字词常被识别错）
+
+    Returns:
+        str: 拼接后的文本
+    """
+    previous = previous.rstrip()
+    current = current.strip()
+    if not previous or not current:
+        return previous or current
+
+    tail = previous[-max_overlap:]
+    head = current[:max_overlap]
+
+    # 优先匹配"前文后缀 == 新文前缀"
+    for k in range(min(len(tail), len(head)), min_match - 1, -1):
+        if (tail.endswith(head[:k])
+                and _at_word_boundary(previous, len(previous) - k)
+                and _at_word_boundary(current, k)):
+            return previous + current[k:]
+
+    # 重叠区域识别结果略有出入时，退化为交界处附近的最长公共子串对齐
+    offset = len(previous) - len(tail)
+    best_len, best_i, best_j = 0, 0, 0
+    lengths = [0] * (len(head) + 1)
+    for i in range(1, len(tail) + 1):
+        prev_diag = 0
+        for j in range(1, len(head) + 1):
+            saved = lengths[j]
+            lengths[j] = prev_diag + 1 if tail[i - 1] == head[j - 1] else 0
+            length = lengths[j]
+            if (length > max(best_len, min_match)
+                    and len(tail) - i <= max_drift
+                    and j - length <= max_drift
+                    and _at_word_boundary(previous, offset + i - length)
+                    and _at_word_boundary(previous, offset + i)
+                    and _at_word_boundary(current, j - length)
+                    and _at_word_boundary(current, j)):
+                best_len, best_i, best_j = length, i, j
+            prev_diag = saved
+    if best_len:
+        return previous[:offset + best_i] + current[best_j:]
+
+    return join_transcripts(previous, current)
+
+
+def join_transcripts(previous: str, current: str) -> str:
+    """拼接两段不重叠的识别文本：中文直接拼接，其它语言用空格分隔"""
+    previous = previous.rstrip()
+    current = current.strip()
+    if not previous or not current:
+        return previous or current
+    if _CJK_PATTERN.match(previous[-1]) or _CJK_PATTERN.match(current[0]):
+        return previous + current
+    return f"{previous} {current}"
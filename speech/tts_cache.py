@@ -0,0 +1,221 @@
+"""
+语音合成缓存模块 - 按内容寻址的两级（内存 + 磁盘）LRU缓存
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TTSCache:
+    """
+    语音合成结果缓存
+
+    以 hash(声音, 语速, 文本) 为键保存编码后的音频。磁盘层有总大小上限，
+    超出时按最近使用时间淘汰；内存层保存最近使用的小音频，命中时不读磁盘。
+    """
+
+    def __init__(self, cache_dir: str = "cache/tts",
+                 max_disk_bytes: int = 200 * 1024 * 1024,
+                 max_memory_bytes: int = 16 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            max_disk_bytes: 磁盘缓存总大小上限（字节）
+            max_memory_bytes: 内存缓存总大小上限（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes，按使用顺序排列
+        self._memory_bytes = 0
+        self._disk = OrderedDict()    # key -> 文件大小，按使用顺序排列
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(voice: str, rate: str, text: str) -> str:
+        """
+        生成缓存键
+
+        Args:
+            voice: 声音
+            rate: 语速
+            text: 清理后的文本
+
+        Returns:
+            str: sha256 十六进制摘要
+        """
+        normalized = re.sub(r"\s+", " ", text).strip()
+        return hashlib.sha256(f"{voice}\0{rate}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.mp3"
+
+    def _load_index(self):
+        """扫描磁盘缓存，按修改时间（即最近使用时间）重建LRU顺序"""
+        entries = []
+        for path in self.cache_dir.glob("*/*.mp3"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        logger.info("语音缓存已加载: %s 条, %.1fMB", len(self._disk), self._disk_bytes / 1024 / 1024)
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """
+        只查找内存层，不访问磁盘（可以在事件循环中调用）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            bytes: 音频数据，内存层未命中时返回None（不计入未命中次数）
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._disk.move_to_end(key)
+                self.memory_hits += 1
+            return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取缓存（可能读取磁盘，不要在事件循环中直接调用）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            bytes: 音频数据，未命中时返回None
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._disk.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+            if key not in self._disk:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                # 更新修改时间，重启后仍能恢复LRU顺序
+                os.utime(path)
+            except OSError:
+                # 文件被外部删除
+                self._disk_bytes -= self._disk.pop(key)
+                self.misses += 1
+                return None
+
+            self._disk.move_to_end(key)
+            self._remember(key, data)
+            self.disk_hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        """
+        写入缓存（写磁盘并可能淘汰旧文件，不要在事件循环中直接调用）
+
+        Args:
+            key: 缓存键
+            data: 音频数据
+        """
+        if not data or len(data) > self.max_disk_bytes:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # 先写临时文件再原子替换，避免读到写了一半的文件
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("写入语音缓存失败: %s", e)
+            return
+
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._remember(key, data)
+            self._evict_disk()
+
+    def _remember(self, key: str, data: bytes):
+        """放入内存层并按LRU淘汰（调用方持有锁）"""
+        # 单条超过内存上限四分之一的音频只放磁盘
+        if len(data) > self.max_memory_bytes // 4:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """磁盘层超出大小上限时淘汰最久未使用的条目（调用方持有锁）"""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted = self._memory.pop(key, None)
+            if evicted is not None:
+                self._memory_bytes -= len(evicted)
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中次数、命中率和占用空间
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,233 @@
+"""
+语音活动检测模块 - 基于帧能量和过零率的向量化VAD
+"""
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 避免 log10(0)
+_EPS = 1e-10
+
+
+class VoiceActivityDetector:
+    """帧级语音活动检测器，带自适应噪声基底估计和拖尾平滑"""
+
+    def __init__(self, sample_rate: int = 16000,
+                 frame_duration: float = 0.02,
+                 energy_margin_db: float = 9.0,
+                 min_energy_db: float = -55.0,
+                 zcr_threshold: float = 0.25,
+                 noise_window: float = 2.0,
+                 hangover_duration: float = 0.3,
+                 min_speech_duration: float = 0.2,
+                 min_silence_duration: float = 0.3,
+                 padding_duration: float = 0.15):
+        """
+        初始化VAD
+
+        Args:
+            sample_rate: 采样率
+            frame_duration: 帧长（秒）
+            energy_margin_db: 判定为语音时需高出噪声基底的分贝数
+            min_energy_db: 绝对能量下限（dBFS），低于此值一律视为静音
+            zcr_threshold: 过零率上限，能量不够高的高过零率帧视为噪声
+            noise_window: 噪声基底估计使用的最小值统计窗口（秒）
+            hangover_duration: 语音结束后继续保持为语音的拖尾时长（秒）
+            min_speech_duration: 最短语音片段时长（秒），更短的视为突发噪声
+            min_silence_duration: 切分语句所需的最短静音时长（秒，不含拖尾）
+            padding_duration: 切分语句时前后保留的余量（秒）
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_duration)
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.zcr_threshold = zcr_threshold
+        self.noise_window_frames = max(1, int(noise_window / frame_duration))
+        self.hangover_frames = int(hangover_duration / frame_duration)
+        self.min_speech_frames = max(1, int(min_speech_duration / frame_duration))
+        self.min_silence_frames = max(1, int(min_silence_duration / frame_duration))
+        self.padding_frames = int(padding_duration / frame_duration)
+
+        # 流式检测状态
+        self.noise_floor_db = None
+        self._hangover_left = 0
+
+    # ------------------------------------------------------------------
+    # 特征提取
+    # ------------------------------------------------------------------
+    def _frames(self, audio: np.ndarray) -> np.ndarray:
+        """将音频切分为不重叠的帧（零拷贝 reshape）"""
+        n_frames = len(audio) // self.frame_length
+        return audio[:n_frames * self.frame_length].reshape(n_frames, self.frame_length)
+
+    def frame_features(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算每帧的能量（dBFS）和过零率
+
+        Args:
+            audio: 一维 float32 音频
+
+        Returns:
+            tuple: (energy_db, zcr)，长度均为帧数
+        """
+        frames = self._frames(audio)
+        if frames.shape[0] == 0:
+            empty = np.empty(0, dtype=np.float32)
+            return empty, empty
+
+        power = np.einsum("ij,ij->i", frames, frames) / self.frame_length
+        energy_db = 10.0 * np.log10(power + _EPS)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+        return energy_db.astype(np.float32), zcr.astype(np.float32)
+
+    def _noise_floor(self, energy_db: np.ndarray) -> np.ndarray:
+        """最小值统计法估计每帧的噪声基底：取前 noise_window 内的能量最小值"""
+        window = min(self.noise_window_frames, len(energy_db))
+        padded = np.concatenate([np.full(window - 1, energy_db[0], dtype=energy_db.dtype), energy_db])
+        return sliding_window_view(padded, window).min(axis=1)
+
+    def _classify(self, energy_db: np.ndarray, zcr: np.ndarray,
+                  noise_floor_db: np.ndarray) -> np.ndarray:
+        """根据能量和过零率做逐帧判决"""
+        above_floor = energy_db > noise_floor_db + self.energy_margin_db
+        loud = energy_db > noise_floor_db + 2 * self.energy_margin_db
+        voiced = zcr < self.zcr_threshold
+        # 高过零率的帧（摩擦音/噪声）需要更高的能量才算作语音
+        return (energy_db > self.min_energy_db) & above_floor & (voiced | loud)
+
+    # ------------------------------------------------------------------
+    # 整段检测
+    # ------------------------------------------------------------------
+    def speech_mask(self, audio: np.ndarray) -> np.ndarray:
+        """
+        计算逐帧的语音掩码
+
+        Args:
+            audio: 一维 float32 音频
+
+        Returns:
+            np.ndarray: 布尔数组，True 表示语音帧
+        """
+        energy_db, zcr = self.frame_features(audio)
+        if energy_db.size == 0:
+            return np.zeros(0, dtype=bool)
+
+        mask = self._classify(energy_db, zcr, self._noise_floor(energy_db))
+        mask = self._remove_short_runs(mask, self.min_speech_frames)
+        return self._apply_hangover(mask)
+
+    @staticmethod
+    def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """返回掩码中连续 True 区间的起止帧（左闭右开）"""
+        edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    def _remove_short_runs(self, mask: np.ndarray, min_frames: int) -> np.ndarray:
+        """去除短于 min_frames 的语音区间（突发噪声）"""
+        starts, ends = self._runs(mask)
+        short = (ends - starts) < min_frames
+        if not short.any():
+            return mask
+        mask = mask.copy()
+        for start, end in zip(starts[short], ends[short]):
+            mask[start:end] = False
+        return mask
+
+    def _apply_hangover(self, mask: np.ndarray) -> np.ndarray:
+        """拖尾平滑：语音帧之后的 hangover_frames 帧仍视为语音"""
+        if self.hangover_frames <= 0 or not mask.any():
+            return mask
+        kernel = np.ones(self.hangover_frames + 1, dtype=np.int32)
+        return np.convolve(mask.astype(np.int32), kernel)[:len(mask)] > 0
+
+    def segments(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        检测语音片段
+
+        间隔短于 min_silence_duration 的片段会合并为同一句话。
+
+        Args:
+            audio: 一维 float32 音频
+
+        Returns:
+            list: [(start_sample, end_sample), ...]
+        """
+        mask = self.speech_mask(audio)
+        starts, ends = self._runs(mask)
+        if starts.size == 0:
+            return []
+
+        # 合并间隔过短的片段
+        gaps = starts[1:] - ends[:-1]
+        keep = np.concatenate([[True], gaps >= self.min_silence_frames])
+        merged_starts = starts[keep]
+        merged_ends = np.concatenate([ends[:-1][keep[1:]], ends[-1:]])
+
+        n_frames = len(mask)
+        merged_starts = np.maximum(merged_starts - self.padding_frames, 0)
+        merged_ends = np.minimum(merged_ends + self.padding_frames, n_frames)
+        return [(int(s) * self.frame_length, int(e) * self.frame_length)
+                for s, e in zip(merged_starts, merged_ends)]
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        """去除首尾静音，返回原数组的视图；整段静音时返回空数组"""
+        segments = self.segments(audio)
+        if not segments:
+            return audio[:0]
+        return audio[segments[0][0]:segments[-1][1]]
+
+    def split(self, audio: np.ndarray) -> List[np.ndarray]:
+        """按静音切分语句，返回原数组的视图列表"""
+        return [audio[start:end] for start, end in self.segments(audio)]
+
+    # ------------------------------------------------------------------
+    # 流式检测
+    # ------------------------------------------------------------------
+    def reset(self):
+        """重置流式检测状态"""
+        self.noise_floor_db = None
+        self._hangover_left = 0
+
+    @property
+    def threshold(self) -> float:
+        """当前的语音判定阈值（线性RMS），用于音量显示"""
+        floor = self.noise_floor_db if self.noise_floor_db is not None else self.min_energy_db
+        threshold_db = max(floor + self.energy_margin_db, self.min_energy_db)
+        return float(10 ** (threshold_db / 20))
+
+    def update(self, chunk: np.ndarray) -> bool:
+        """
+        流式检测：处理一个音频块并返回当前是否处于语音状态
+
+        噪声基底在静音时缓慢上升、遇到更低能量时立即下降。
+
+        Args:
+            chunk: 一维 float32 音频块
+
+        Returns:
+            bool: 是否检测到语音（含拖尾）
+        """
+        energy_db, zcr = self.frame_features(chunk)
+        if energy_db.size == 0:
+            return self._hangover_left > 0
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = float(energy_db.min())
+
+        floor = np.full_like(energy_db, self.noise_floor_db)
+        frame_speech = self._classify(energy_db, zcr, floor)
+
+        chunk_min = float(energy_db.min())
+        if chunk_min < self.noise_floor_db:
+            self.noise_floor_db = chunk_min
+        elif not frame_speech.any():
+            self.noise_floor_db += 0.05 * (float(energy_db.mean()) - self.noise_floor_db)
+
+        if np.count_nonzero(frame_speech) * 2 >= len(frame_speech):
+            self._hangover_left = self.hangover_frames + len(frame_speech)
+        else:
+            self._hangover_left = max(0, self._hangover_left - len(frame_speech))
+        return self._hangover_left > 0
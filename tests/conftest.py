@@ -0,0 +1,33 @@
+"""
+测试公共配置
+
+在导入任何项目模块之前设置环境变量：日志和追踪写到临时目录，
+数据库使用 SQLite，不需要 MySQL 服务。
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_TMP = tempfile.mkdtemp(prefix="jarvis-tests-")
+os.environ.setdefault("LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("LOG_FILE_FORMAT", "text")
+os.environ.setdefault("TRACE_ENABLED", "false")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("DB_RETENTION_DAYS", "0")
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """临时目录中的 SQLite 数据库，测试结束后关闭"""
+    from utils.sqlite_database import SQLiteDatabase
+
+    database = SQLiteDatabase(str(tmp_path / "jarvis.db"))
+    yield database
+    database.close()
@@ -0,0 +1,98 @@
+from speech.chunker import AdaptiveChunker
+
+
+def run(chunker: AdaptiveChunker, deltas) -> list:
+    chunks = []
+    for delta in deltas:
+        chunks.extend(chunker.feed(delta))
+    chunks.extend(chunker.flush())
+    return chunks
+
+
+def test_first_chunk_is_emitted_early():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=20, max_chunk_chars=60)
+    chunker.reset()
+    assert chunker.feed("好的，") == []  # 分句标点前不足 first_chunk_chars
+    assert chunker.feed("我来帮你查一下，") == ["好的，我来帮你查一下，"]
+
+
+def test_later_sentences_are_merged_up_to_target():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=12, max_chunk_chars=60)
+    chunks = run(chunker, ["你好。", "今天天气晴。", "气温二十度。", "适合出门散步。"])
+    assert chunks[0] == "你好。"
+    assert chunks[1] == "今天天气晴。气温二十度。"
+    assert "".join(chunks) == "你好。今天天气晴。气温二十度。适合出门散步。"
+
+
+def test_text_is_preserved_for_any_delta_split():
+    text = "Hello there. The price is 3.5 dollars, not 4. 我们明天见！再见。"
+    for step in (1, 2, 5, 13):
+        chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=10, max_chunk_chars=30)
+        deltas = [text[i:i + step] for i in range(0, len(text), step)]
+        assert "".join(run(chunker, deltas)) == text
+
+
+def test_decimal_point_is_not_a_sentence_end():
+    chunker = AdaptiveChunker(first_chunk_chars=50, min_chunk_chars=10, max_chunk_chars=100)
+    chunker.reset()
+    assert chunker.feed("It costs 3.5") == []
+    assert chunker.feed(" dollars. Next") == ["It costs 3.5 dollars."]
+
+
+def test_long_text_without_punctuation_is_force_split():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=10, max_chunk_chars=20)
+    chunks = run(chunker, ["word " * 20])
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert "".join(chunks) == "word " * 20
+    assert chunker.stats()["forced_splits"] > 0
+
+
+def test_stats_count_responses_and_chunks():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=10, max_chunk_chars=60)
+    run(chunker, ["第一句话。第二句话。"])
+    chunker.reset()
+    run(chunker, ["第三句话。"])
+    stats = chunker.stats()
+    assert stats["responses"] == 2
+    assert stats["chunks"] >= 2
+    assert stats["first_chunk_latency_p50"] is not None
+
+
+def test_sentence_cut_at_limit_is_not_a_forced_split():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=15, max_chunk_chars=20,
+                              max_hold_seconds=60)
+    chunks = run(chunker, ["你好。", "今天天气晴。", "气温二十度适合出门散步去公园"])
+    assert chunks[:2] == ["你好。", "今天天气晴。"]
+    assert chunker.stats()["forced_splits"] == 0
+
+
+def test_short_sentence_is_emitted_when_the_next_one_ends():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=40, max_chunk_chars=120,
+                              max_hold_seconds=60)
+    chunker.reset()
+    assert chunker.feed("好的。") == ["好的。"]
+    assert chunker.feed("今天晴。") == []
+    assert chunker.feed("明天下雨。后天") == ["今天晴。明天下雨。"]
+
+
+def test_short_sentence_is_emitted_after_hold_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("speech.chunker.time.perf_counter", lambda: now[0])
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=40, max_chunk_chars=120,
+                              max_hold_seconds=0.5)
+    chunker.reset()
+    assert chunker.feed("好的。") == ["好的。"]
+    assert chunker.feed("今天晴。接下来") == []
+    now[0] += 0.6
+    assert chunker.feed("是一段") == ["今天晴。"]
+
+
+def test_discard_does_not_count_dropped_text():
+    chunker = AdaptiveChunker(first_chunk_chars=4, min_chunk_chars=40, max_chunk_chars=120)
+    chunker.reset()
+    assert chunker.feed("好的。今天晴。还有") == ["好的。"]
+    chunker.discard()
+    stats = chunker.stats()
+    assert stats["chunks"] == 1
+    assert stats["avg_chunk_chars"] == 3
+    assert chunker.feed("新的回答。") == ["新的回答。"]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.fulltext import cjk_bigrams, fts5_query, mysql_boolean_query
+
+
+def test_cjk_bigrams_expands_runs_and_appends_last_char():
+    assert cjk_bigrams("今天天气").split() == ["今天", "天天", "天气", "气"]
+    assert cjk_bigrams("天").split() == ["天"]
+    assert cjk_bigrams("天气5").split() == ["天气", "气", "5"]
+    assert cjk_bigrams("hello 世界 world").split() == ["hello", "世界", "界", "world"]
+    assert cjk_bigrams("") == ""
+    assert cjk_bigrams(None) == ""
+
+
+def test_fts5_query_builds_phrases():
+    assert fts5_query("今天天气") == '"今天 天天 天气"'
+    assert fts5_query("weather 天气") == '"weather" "天气"'
+    # 后面还有其它字符时带上末尾单字，与索引中的相邻关系一致
+    assert fts5_query("天气5") == '"天气 气 5"'
+    # 单个汉字用前缀匹配
+    assert fts5_query("天") == '"天"*'
+    assert fts5_query('a"b') == '"a""b"'
+    assert fts5_query("   ") == ""
+
+
+def test_mysql_boolean_query_requires_every_term():
+    assert mysql_boolean_query("今天 天气") == '+"今天" +"天气"'
+    assert mysql_boolean_query('a"b') == '+"ab"'
+    assert mysql_boolean_query('"') == ""
+
+
+@pytest.fixture
+def history(db):
+    start = datetime(2026, 1, 1, 9, 0)
+    texts = [
+        ("s1", "今天天气怎么样", "今天是晴天"),
+        ("s1", "明天会下雨吗", "明天有小雨"),
+        ("s2", "What's the weather like", "It is sunny"),
+        ("s2", "播放天气5分钟预报", "好的"),
+        ("s2", "讲个笑话", "天上掉下一只猫"),
+    ]
+    db.save_chats([
+        (session_id, start + timedelta(minutes=i), "text", user_input, ai_response, "GeminiAI", 1.0)
+        for i, (session_id, user_input, ai_response) in enumerate(texts)
+    ])
+    return db
+
+
+def inputs(results):
+    return sorted(record["user_input"] for record in results)
+
+
+def test_search_matches_cjk_substrings(history):
+    assert inputs(history.search_history("天气")) == ["今天天气怎么样", "播放天气5分钟预报"]
+    assert inputs(history.search_history("下雨")) == ["明天会下雨吗"]
+    assert inputs(history.search_history("气怎")) == ["今天天气怎么样"]
+    assert history.search_history("雨天") == []
+
+
+def test_search_mixed_and_single_char_terms(history):
+    assert inputs(history.search_history("天气5")) == ["播放天气5分钟预报"]
+    # 单字匹配词首，"天" 出现在多条记录的输入或回复中
+    assert inputs(history.search_history("猫")) == ["讲个笑话"]
+    assert len(history.search_history("天", limit=10)) == 4
+
+
+def test_search_requires_all_terms_and_filters_session(history):
+    assert inputs(history.search_history("今天 晴天")) == ["今天天气怎么样"]
+    assert inputs(history.search_history("weather")) == ["What's the weather like"]
+    assert inputs(history.search_history("天气", session_id="s1")) == ["今天天气怎么样"]
+    assert history.search_history("   ") == []
+
+
+def test_search_ranks_user_input_above_response(db):
+    start = datetime(2026, 1, 1, 9, 0)
+    db.save_chats([
+        ("s1", start, "text", "讲个故事", "从前有一只小猫", "GeminiAI", 1.0),
+        ("s1", start + timedelta(minutes=1), "text", "小猫喜欢吃什么", "鱼", "GeminiAI", 1.0),
+    ])
+    results = db.search_history("小猫")
+    assert [record["user_input"] for record in results] == ["小猫喜欢吃什么", "讲个故事"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_deleted_rows_leave_the_index(history):
+    history.clear_history("s1")
+    assert inputs(history.search_history("天气")) == ["播放天气5分钟预报"]
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from utils.history_writer import ChatHistoryWriter
+
+
+class FakeDatabase:
+    """记录每次 save_chats 调用；前 failures 次调用失败，gate 未设置时阻塞"""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+        self.saved = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def save_chats(self, records):
+        self.calls.append(list(records))
+        self.entered.set()
+        self.gate.wait()
+        if self.delay:
+            threading.Event().wait(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("数据库不可用")
+        self.saved.extend(records)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # 退避等待只记录时长，不真正等待
+    delays = []
+    monkeypatch.setattr("utils.history_writer.time.sleep", delays.append)
+    return delays
+
+
+def save(writer, count, start=0):
+    return [writer.save_chat("s1", "text", f"问题{i}", f"回答{i}", "GeminiAI", 1.0)
+            for i in range(start, start + count)]
+
+
+def inputs(records):
+    return [record[3] for record in records]
+
+
+def test_records_are_written_in_batches():
+    db = FakeDatabase()
+    writer = ChatHistoryWriter(db, batch_size=3, flush_interval=0.2, max_queue=100, max_retries=0)
+    try:
+        assert all(save(writer, 7))
+        assert writer.flush(timeout=5)
+        assert inputs(db.saved) == [f"问题{i}" for i in range(7)]
+        assert all(len(batch) <= 3 for batch in db.calls)
+        assert len(db.calls) < 7
+        stats = writer.stats()
+        assert stats["written"] == 7 and stats["dropped"] == 0 and stats["pending"] == 0
+        assert stats["batches"] == len(db.calls)
+    finally:
+        writer.close()
+
+
+def test_failed_batch_is_retried_with_backoff(sleeps):
+    db = FakeDatabase(failures=2)
+    writer = ChatHistoryWriter(db, batch_size=10, flush_interval=0.05, max_queue=100, max_retries=3)
+    try:
+        save(writer, 2)
+        assert writer.flush(timeout=5)
+        # 同一批记录重试到成功为止
+        assert len(db.calls) == 3
+        assert db.calls[0] == db.calls[1] == db.calls[2]
+        assert inputs(db.saved) == ["问题0", "问题1"]
+        assert sleeps == [0.5, 1.0]
+        stats = writer.stats()
+        assert stats["written"] == 2 and stats["dropped"] == 0 and stats["failed_attempts"] == 2
+    finally:
+        writer.close()
+
+
+def test_batch_is_dropped_when_retries_are_exhausted(sleeps):
+    db = FakeDatabase(failures=100)
+    writer = ChatHistoryWriter(db, batch_size=10, flush_interval=0.05, max_queue=100, max_retries=2)
+    try:
+        save(writer, 3)
+        assert writer.flush(timeout=5)
+        assert len(db.calls) == 3
+        assert sleeps == [0.5, 1.0]
+        stats = writer.stats()
+        assert stats["written"] == 0 and stats["dropped"] == 3 and stats["pending"] == 0
+
+        # 数据库恢复后，之后的记录正常写入
+        db.failures = 0
+        save(writer, 1, start=3)
+        assert writer.flush(timeout=5)
+        assert inputs(db.saved) == ["问题3"]
+    finally:
+        writer.close()
+
+
+def test_records_are_dropped_when_queue_is_full():
+    db = FakeDatabase()
+    db.gate.clear()
+    writer = ChatHistoryWriter(db, batch_size=1, flush_interval=0.05, max_queue=2, max_retries=0)
+    try:
+        assert save(writer, 1) == [True]
+        # 后台线程阻塞在第一批写入中，队列只能再缓冲两条
+        assert db.entered.wait(5)
+        assert save(writer, 4, start=1) == [True, True, False, False]
+        assert writer.stats()["dropped"] == 2
+
+        db.gate.set()
+        assert writer.flush(timeout=5)
+        assert inputs(db.saved) == ["问题0", "问题1", "问题2"]
+        assert writer.stats()["written"] == 3
+    finally:
+        db.gate.set()
+        writer.close()
+
+
+def test_close_writes_all_queued_records():
+    db = FakeDatabase(delay=0.01)
+    writer = ChatHistoryWriter(db, batch_size=4, flush_interval=0.05, max_queue=100, max_retries=0)
+    save(writer, 25)
+    writer.close(timeout=5)
+
+    assert inputs(db.saved) == [f"问题{i}" for i in range(25)]
+    assert writer.stats()["pending"] == 0
+    assert not writer._thread.is_alive()
+    # 重复关闭不做任何事
+    writer.close()
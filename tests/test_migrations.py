@@ -0,0 +1,123 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.fulltext import cjk_bigrams
+from utils.migrations import SQLITE_MIGRATIONS, apply_sqlite_migrations
+from utils.rollups import aggregate
+
+LATEST = SQLITE_MIGRATIONS[-1].version
+
+
+def connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.create_function("cjk_bigrams", 1, cjk_bigrams, deterministic=True)
+    return conn
+
+
+def schema_objects(conn):
+    return {
+        (row[0], row[1])
+        for row in conn.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")
+    }
+
+
+def test_migrates_empty_database_to_latest(tmp_path):
+    conn = connect(str(tmp_path / "empty.db"))
+    assert apply_sqlite_migrations(conn) == LATEST
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == LATEST
+
+    objects = schema_objects(conn)
+    for table in ("chat_history", "chat_stats_daily", "chat_latency_histogram",
+                  "chat_session_stats", "chat_history_fts", "chat_history_archive"):
+        assert ("table", table) in objects
+    for index in ("idx_chat_history_session_time", "idx_chat_history_timestamp",
+                  "idx_chat_session_stats_last_at", "idx_chat_history_archive_month"):
+        assert ("index", index) in objects
+    for trigger in ("chat_history_fts_insert", "chat_history_fts_delete"):
+        assert ("trigger", trigger) in objects
+
+
+def test_migrations_are_idempotent(tmp_path):
+    conn = connect(str(tmp_path / "jarvis.db"))
+    apply_sqlite_migrations(conn)
+    objects = schema_objects(conn)
+
+    assert apply_sqlite_migrations(conn) == LATEST
+    assert schema_objects(conn) == objects
+
+
+def test_fulltext_migration_backfills_existing_rows(tmp_path):
+    conn = connect(str(tmp_path / "jarvis.db"))
+    assert apply_sqlite_migrations(conn, target_version=3) == 3
+    conn.execute("""
+        INSERT INTO chat_history (session_id, timestamp, input_type, user_input, ai_response)
+        VALUES ('s1', '2026-01-01 10:00:00.000000', 'text', '今天天气怎么样', '晴天')
+    """)
+
+    assert apply_sqlite_migrations(conn) == LATEST
+    rows = conn.execute(
+        "SELECT rowid FROM chat_history_fts WHERE chat_history_fts MATCH ?", ('"天气"',)
+    ).fetchall()
+    assert rows == [(1,)]
+
+
+def test_version_is_not_advanced_when_a_migration_fails(tmp_path):
+    # 未注册 cjk_bigrams 时全文索引迁移失败，整个升级回滚
+    conn = sqlite3.connect(str(tmp_path / "jarvis.db"), isolation_level=None)
+    with pytest.raises(sqlite3.OperationalError):
+        apply_sqlite_migrations(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    assert schema_objects(conn) == set()
+
+
+def test_sqlite_stats_match_python_rollups(db):
+    start = datetime(2026, 1, 1, 9, 0)
+    records = [
+        (f"s{i % 3}", start + timedelta(hours=i * 7), "voice" if i % 2 else "text",
+         f"问题{i}", f"回答{i}", "GeminiAI" if i % 4 else "DeepseekAI",
+         None if i == 5 else 0.2 * i)
+        for i in range(40)
+    ]
+    db.save_chats(records[:25])
+    db.save_chats(records[25:])
+
+    stats = db.get_session_stats("s1")
+    expected = aggregate(records)
+    assert stats["total"] == len(records)
+    assert stats["input_types"] == {"text": 20, "voice": 20}
+    assert stats["models"] == {"GeminiAI": 30, "DeepseekAI": 10}
+    assert stats["avg_response_time"] == pytest.approx(sum(r[6] or 0 for r in records) / len(records))
+
+    session = next(row for row in expected["sessions"] if row[0] == "s1")
+    assert stats["session"]["turns"] == session[1]
+    assert stats["session"]["first_at"] == session[3]
+    assert stats["session"]["last_at"] == session[4]
+
+    conn = db._connection()
+    histogram = {tuple(row) for row in conn.execute(
+        "SELECT day, model_used, bucket, turns FROM chat_latency_histogram")}
+    assert histogram == {(day.isoformat(), model, bucket, turns)
+                         for day, model, bucket, turns in expected["histogram"]}
+
+
+def test_clearing_a_session_subtracts_it_from_rollups(db):
+    # 删除时的扣减由 SQL 中的分桶表达式计算，必须与写入时 Python 的分桶一致
+    start = datetime(2026, 1, 1, 9, 0)
+    records = [
+        (f"s{i % 2}", start + timedelta(hours=i), "text", "q", "a", "GeminiAI", 0.25 * i)
+        for i in range(30)
+    ]
+    db.save_chats(records)
+    db.clear_history("s0")
+
+    remaining = [record for record in records if record[0] == "s1"]
+    expected = aggregate(remaining)
+    conn = db._connection()
+    histogram = {tuple(row) for row in conn.execute(
+        "SELECT day, model_used, bucket, turns FROM chat_latency_histogram")}
+    assert histogram == {(day.isoformat(), model, bucket, turns)
+                         for day, model, bucket, turns in expected["histogram"]}
+    assert db.get_session_stats()["total"] == len(remaining)
+    assert [row["session_id"] for row in db.get_recent_sessions()] == ["s1"]
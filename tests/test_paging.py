@@ -0,0 +1,96 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.database import page_cursor
+from utils.export import COLUMNS, export_history
+
+START = datetime(2026, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def history(db):
+    # 每三条记录共用一个时间戳，翻页必须靠 id 区分
+    db.save_chats([
+        (f"s{i % 2}", START + timedelta(seconds=i // 3), "text", f"问题{i}", f"回答{i}", "GeminiAI", 1.0)
+        for i in range(50)
+    ])
+    return db
+
+
+def read_pages(db, page_size, session_id=None):
+    pages = []
+    before = None
+    while True:
+        page = db.get_chat_history(session_id=session_id, limit=page_size, before=before)
+        if not page:
+            return pages
+        pages.append(page)
+        before = page_cursor(page)
+
+
+def test_page_cursor():
+    assert page_cursor([]) is None
+    records = [{"timestamp": START, "id": 7}, {"timestamp": START, "id": 3}]
+    assert page_cursor(records) == (START, 3)
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 7, 50, 100])
+def test_keyset_paging_has_no_duplicates_or_gaps(history, page_size):
+    pages = read_pages(history, page_size)
+    ids = [record["id"] for page in pages for record in page]
+    assert ids == list(range(50, 0, -1))
+    assert all(len(page) <= page_size for page in pages)
+
+
+def test_keyset_paging_within_a_session(history):
+    pages = read_pages(history, 4, session_id="s1")
+    records = [record for page in pages for record in page]
+    assert len(records) == 25
+    assert {record["session_id"] for record in records} == {"s1"}
+    keys = [(record["timestamp"], record["id"]) for record in records]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_rows_inserted_during_paging_do_not_shift_pages(history):
+    first = history.get_chat_history(limit=10)
+    history.save_chats([("s0", START + timedelta(days=1), "text", "新问题", "新回答", "GeminiAI", 1.0)])
+    second = history.get_chat_history(limit=10, before=page_cursor(first))
+    assert first[-1]["id"] - 1 == second[0]["id"]
+
+
+def test_iter_chat_history_is_in_time_order(history):
+    records = list(history.iter_chat_history(batch_size=7))
+    assert [record["id"] for record in records] == list(range(1, 51))
+    assert len(list(history.iter_chat_history(session_id="s0", batch_size=4))) == 25
+
+
+def test_export_jsonl_gzip(history, tmp_path):
+    output = tmp_path / "history.jsonl.gz"
+    assert export_history(history, str(output), batch_size=8) == 50
+
+    with gzip.open(output, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == 50
+    assert tuple(rows[0]) == COLUMNS
+    assert rows[0]["user_input"] == "问题0"
+    assert datetime.fromisoformat(rows[-1]["timestamp"]) == START + timedelta(seconds=49 // 3)
+
+
+def test_export_csv_by_session(history, tmp_path):
+    output = tmp_path / "history.csv"
+    assert export_history(history, str(output), fmt="csv", session_id="s1") == 25
+
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == COLUMNS
+    assert len(rows) == 26
+    assert {row[1] for row in rows[1:]} == {"s1"}
+
+
+def test_export_rejects_unknown_format(history, tmp_path):
+    with pytest.raises(ValueError):
+        export_history(history, str(tmp_path / "history.xml"), fmt="xml")
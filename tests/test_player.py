@@ -0,0 +1,30 @@
+from speech.player import SoundDeviceSink
+
+
+def test_callback_plays_buffered_pcm_and_pads_with_silence():
+    sink = SoundDeviceSink(sample_rate=8000, channels=1, blocksize=4, buffer_seconds=0.01)
+    sink._buffer.write(b"\x01\x02\x03\x04")
+    out = bytearray(b"\xff" * 8)
+    sink._callback(out, 4, None, None)
+    assert bytes(out) == b"\x01\x02\x03\x04" + b"\x00" * 4
+    assert sink.underruns == 1
+
+    # 缓冲区为空时输出静音，不计为欠载
+    out = bytearray(b"\xff" * 8)
+    sink._callback(out, 4, None, None)
+    assert bytes(out) == b"\x00" * 8
+    assert sink.underruns == 1
+
+
+def test_buffer_capacity_is_bounded_and_frame_aligned():
+    sink = SoundDeviceSink(sample_rate=24000, channels=2, blocksize=1024, buffer_seconds=0.5)
+    assert sink._buffer.capacity == 24000 * 2 * 2 // 2
+    assert sink._buffer.capacity % 4 == 0
+
+
+def test_clear_resets_playing_until():
+    sink = SoundDeviceSink(sample_rate=8000, channels=1, blocksize=4, buffer_seconds=1.0)
+    sink._scheduled(16000)
+    assert sink.playing_until > 0
+    sink.clear()
+    assert sink.playing_until == 0.0
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from utils.retention import (ArchiveWorker, RetentionPolicy, as_rollup_records, pack_records,
+                             unpack_records)
+from utils.rollups import aggregate
+
+START = datetime(2026, 1, 30, 12, 0)
+
+
+def make_records(count, sessions=2):
+    return [
+        {
+            "id": i + 1,
+            "session_id": f"s{i % sessions}",
+            "timestamp": START + timedelta(days=i // 4, microseconds=i),
+            "input_type": "voice" if i % 3 else "text",
+            "user_input": f"问题{i} \"引号\"\n换行",
+            "ai_response": f"回答{i}",
+            "model_used": "GeminiAI",
+            "response_time": None if i == 2 else 0.5 * i,
+        }
+        for i in range(count)
+    ]
+
+
+def test_pack_unpack_round_trip():
+    records = make_records(20)
+    chunks = pack_records(records)
+
+    # 1月30日起每天4条，跨两个月份，每个月份两个会话
+    assert sorted((month, session_id) for month, session_id, *_ in chunks) == [
+        ("2026-01", "s0"), ("2026-01", "s1"), ("2026-02", "s0"), ("2026-02", "s1"),
+    ]
+    unpacked = []
+    for month, session_id, first_at, last_at, row_count, raw_bytes, compressed_bytes, payload in chunks:
+        group = unpack_records(payload)
+        assert len(group) == row_count
+        assert {record["session_id"] for record in group} == {session_id}
+        assert group[0]["timestamp"] == first_at and group[-1]["timestamp"] == last_at
+        assert all(record["timestamp"].strftime("%Y-%m") == month for record in group)
+        assert compressed_bytes == len(payload) and raw_bytes > 0
+        unpacked += group
+
+    assert sorted(unpacked, key=lambda record: record["id"]) == records
+
+
+def test_pack_records_without_session():
+    records = make_records(3)
+    for record in records:
+        record["session_id"] = None
+    (chunk,) = pack_records(records)
+    assert chunk[1] is None
+    assert unpack_records(chunk[-1]) == records
+
+
+def save(db, records):
+    db.save_chats(as_rollup_records(records))
+
+
+def test_archive_keeps_stats_and_moves_rows(db):
+    records = make_records(40)
+    save(db, records)
+    before = db.get_session_stats("s1")
+
+    cutoff = START + timedelta(days=5)
+    archived = db.archive_history(cutoff, limit=7)
+    assert archived == 7
+    while db.archive_history(cutoff, limit=7):
+        pass
+
+    old = [record for record in records if record["timestamp"] < cutoff]
+    new = [record for record in records if record["timestamp"] >= cutoff]
+    assert db.get_session_stats("s1") == before
+    assert [record["id"] for record in db.iter_chat_history()] == [record["id"] for record in new]
+    # 归档的记录不再出现在检索中
+    assert db.search_history("问题0") == []
+
+    assert db.get_archived_history() == old
+    assert db.get_archived_history(session_id="s0") == [r for r in old if r["session_id"] == "s0"]
+    window = db.get_archived_history(start=START + timedelta(days=1), end=START + timedelta(days=2))
+    assert [record["id"] for record in window] == [5, 6, 7, 8]
+
+    stats = db.get_archive_stats()
+    assert stats["rows"] == len(old)
+    assert stats["oldest"] == old[0]["timestamp"]
+    assert stats["newest"] == old[-1]["timestamp"]
+    assert stats["compressed_bytes"] < stats["raw_bytes"]
+
+
+def test_clearing_a_session_removes_archived_rows_from_stats(db):
+    records = make_records(24)
+    save(db, records)
+    db.archive_history(START + timedelta(days=3))
+    db.clear_history("s0")
+
+    remaining = [record for record in records if record["session_id"] == "s1"]
+    stats = db.get_session_stats()
+    assert stats["total"] == len(remaining)
+    expected = aggregate(as_rollup_records(remaining))
+    histogram = {tuple(row) for row in db._connection().execute(
+        "SELECT day, model_used, bucket, turns FROM chat_latency_histogram")}
+    assert histogram == {(day.isoformat(), model, bucket, turns)
+                         for day, model, bucket, turns in expected["histogram"]}
+    assert {record["session_id"] for record in db.get_archived_history()} == {"s1"}
+
+
+def test_retention_policy_is_opt_in(db):
+    save(db, make_records(10))
+    policy = RetentionPolicy()
+    assert not policy.enabled
+    assert policy.apply(db) == 0
+
+    worker = ArchiveWorker(db, policy)
+    assert worker._thread is None
+    worker.close()
+
+
+def test_retention_policy_archives_in_batches(db):
+    save(db, make_records(30))
+    policy = RetentionPolicy(hot_days=1, batch_size=4, batch_pause=0)
+    assert policy.apply(db) == 30
+    assert list(db.iter_chat_history()) == []
+    assert db.get_archive_stats()["rows"] == 30
+
@@ -0,0 +1,132 @@
+import threading
+
+import numpy as np
+import pytest
+
+from speech.ring_buffer import AudioRingBuffer, ByteRingBuffer
+
+
+def samples(start: int, count: int) -> np.ndarray:
+    return np.arange(start, start + count, dtype=np.float32)
+
+
+def test_read_returns_written_samples():
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 4))
+    buffer.write(samples(4, 3))
+    assert buffer.total_written == 7
+    assert buffer.oldest == 0
+    np.testing.assert_array_equal(buffer.read(2, 6), samples(2, 4))
+
+
+def test_wrapped_range_is_contiguous_view():
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 8))
+    buffer.write(samples(8, 6))  # 跨过缓冲区末尾
+    assert buffer.oldest == 4
+    window = buffer.read(5, 14)
+    np.testing.assert_array_equal(window, samples(5, 9))
+    # 零拷贝：返回的是内部存储的视图
+    assert window.base is not None
+
+
+def test_overwritten_range_raises():
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 15))
+    with pytest.raises(IndexError):
+        buffer.read(0, 5)
+    with pytest.raises(IndexError):
+        buffer.read(10, 16)
+
+
+def test_write_larger_than_capacity_keeps_latest():
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 25))
+    assert buffer.total_written == 25
+    np.testing.assert_array_equal(buffer.latest(10), samples(15, 10))
+
+
+def test_latest_before_full():
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 3))
+    np.testing.assert_array_equal(buffer.latest(5), samples(0, 3))
+
+
+def test_view_is_overwritten_after_a_full_lap():
+    # 视图只在缓冲区写满一圈之前有效，读取方需要用 oldest 检查
+    buffer = AudioRingBuffer(10)
+    buffer.write(samples(0, 10))
+    window = buffer.read(0, 5)
+    buffer.write(samples(10, 5))
+    assert buffer.oldest > 0
+    np.testing.assert_array_equal(window, samples(10, 5))
+
+
+def test_wait_for_and_close():
+    buffer = AudioRingBuffer(10)
+    assert not buffer.wait_for(5, timeout=0.01)
+
+    writer = threading.Timer(0.01, buffer.write, args=(samples(0, 5),))
+    writer.start()
+    assert buffer.wait_for(5, timeout=5)
+    writer.join()
+
+    buffer.close()
+    assert buffer.closed
+    # 录音结束后不再等待
+    assert not buffer.wait_for(100, timeout=5)
+
+    buffer.reset()
+    assert buffer.total_written == 0 and not buffer.closed
+
+
+def test_byte_ring_round_trip_across_wrap():
+    buffer = ByteRingBuffer(8)
+    out = bytearray(8)
+    assert buffer.write(b"abcdef") == 6
+    assert buffer.read_into(out, 4) == 4
+    assert bytes(out[:4]) == b"abcd"
+    assert buffer.write(b"ghijkl") == 6  # 跨过缓冲区末尾
+    assert len(buffer) == 8
+    assert buffer.read_into(out, 8) == 8
+    assert bytes(out) == b"efghijkl"
+    assert buffer.read_into(out, 8) == 0
+
+
+def test_byte_ring_write_blocks_until_read():
+    buffer = ByteRingBuffer(4)
+    done = []
+    writer = threading.Thread(target=lambda: done.append(buffer.write(b"12345678")))
+    writer.start()
+    writer.join(0.05)
+    # 缓冲区满，写入方等待
+    assert writer.is_alive()
+    assert len(buffer) == 4
+
+    out = bytearray(8)
+    received = b""
+    while len(received) < 8:
+        n = buffer.read_into(out, 3)
+        received += bytes(out[:n])
+    writer.join(5)
+    assert done == [8]
+    assert received == b"12345678"
+
+
+def test_byte_ring_clear_releases_blocked_writer():
+    buffer = ByteRingBuffer(4)
+    done = []
+    writer = threading.Thread(target=lambda: done.append(buffer.write(b"12345678")))
+    writer.start()
+    writer.join(0.05)
+    buffer.clear()
+    writer.join(5)
+    # 清空后放弃剩余的数据
+    assert done == [4]
+    assert len(buffer) == 0
+    assert buffer.wait_empty(timeout=0)
+
+
+def test_byte_ring_write_timeout():
+    buffer = ByteRingBuffer(4)
+    assert buffer.write(b"123456", timeout=0.01) == 4
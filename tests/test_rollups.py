@@ -0,0 +1,70 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from utils.rollups import (LATENCY_BUCKETS, aggregate, histogram_percentile, latency_bucket,
+                           latency_bucket_sql)
+
+SAMPLE_TIMES = sorted({0.0, 0.1, 119.9, 120.0, 120.1, 1000.0}
+                      | set(LATENCY_BUCKETS)
+                      | {bound + 0.001 for bound in LATENCY_BUCKETS}
+                      | {bound - 0.001 for bound in LATENCY_BUCKETS})
+
+
+@pytest.mark.parametrize("seconds", SAMPLE_TIMES + [None])
+def test_sql_case_matches_python_bucket(seconds):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (response_time REAL)")
+    conn.execute("INSERT INTO t VALUES (?)", (seconds,))
+    (bucket,) = conn.execute(f"SELECT {latency_bucket_sql('response_time')} FROM t").fetchone()
+    assert bucket == latency_bucket(seconds)
+
+
+def test_bucket_bounds_are_inclusive():
+    assert latency_bucket(None) == 0
+    assert latency_bucket(0.25) == 0
+    assert latency_bucket(0.2501) == 1
+    assert latency_bucket(120) == len(LATENCY_BUCKETS) - 1
+    assert latency_bucket(121) == len(LATENCY_BUCKETS)
+
+
+def test_histogram_percentile_interpolates_within_bucket():
+    # 10 条记录都在 (1, 1.5] 区间
+    bucket = latency_bucket(1.2)
+    assert histogram_percentile({bucket: 10}, 0.5) == pytest.approx(1.25)
+    assert histogram_percentile({bucket: 10}, 1.0) == pytest.approx(1.5)
+    assert histogram_percentile({}, 0.5) is None
+    assert histogram_percentile({len(LATENCY_BUCKETS): 3}, 0.9) == LATENCY_BUCKETS[-1]
+
+
+def test_histogram_percentile_is_close_to_exact_percentile():
+    times = [0.1 * i for i in range(1, 301)]  # 0.1 ~ 30 秒均匀分布
+    counts = {}
+    for t in times:
+        counts[latency_bucket(t)] = counts.get(latency_bucket(t), 0) + 1
+    for q in (0.5, 0.9, 0.99):
+        exact = sorted(times)[int(q * len(times)) - 1]
+        assert histogram_percentile(counts, q) == pytest.approx(exact, abs=1.0)
+
+
+def test_aggregate_groups_by_day_model_type_and_session():
+    day1 = datetime(2026, 1, 1, 10, 0)
+    day2 = datetime(2026, 1, 2, 9, 0)
+    records = [
+        ("s1", day1, "text", "q", "a", "GeminiAI", 1.0),
+        ("s1", day1.replace(hour=11), "voice", "q", "a", "GeminiAI", 2.0),
+        ("s2", day2, "text", "q", "a", "DeepseekAI", None),
+    ]
+    rollups = aggregate(records)
+
+    daily = {row[:3]: row[3:] for row in rollups["daily"]}
+    assert daily[(day1.date(), "GeminiAI", "text")] == (1, 1.0)
+    assert daily[(day1.date(), "GeminiAI", "voice")] == (1, 2.0)
+    assert daily[(day2.date(), "DeepseekAI", "text")] == (1, 0.0)
+
+    assert sum(row[3] for row in rollups["histogram"]) == 3
+
+    sessions = {row[0]: row[1:] for row in rollups["sessions"]}
+    assert sessions["s1"] == (2, 3.0, day1, day1.replace(hour=11))
+    assert sessions["s2"] == (1, 0.0, day2, day2)
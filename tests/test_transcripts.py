@@ -0,0 +1,42 @@
+import pytest
+
+from speech.transcripts import join_transcripts, stitch_transcripts
+
+
+@pytest.mark.parametrize("previous, current, expected", [
+    # 精确重叠
+    ("今天天气怎么样", "怎么样啊我想出门", "今天天气怎么样啊我想出门"),
+    ("the weather is nice", "is nice today", "the weather is nice today"),
+    ("what time is it", "time is it now", "what time is it now"),
+    # 窗口边缘的字识别有出入
+    ("今天天气怎么羊", "气怎么样啊", "今天天气怎么样啊"),
+    ("打开客厅的灯吧", "开客厅的灯光", "打开客厅的灯光"),
+])
+def test_stitch_removes_overlap_at_the_seam(previous, current, expected):
+    assert stitch_transcripts(previous, current) == expected
+
+
+@pytest.mark.parametrize("previous, current, expected", [
+    # 相同的词出现在窗口中间，不是两个窗口的重叠
+    ("请帮我打开客厅的灯", "然后帮我打开卧室的空调", "请帮我打开客厅的灯然后帮我打开卧室的空调"),
+    ("I went to the store and then", "the end of the day", "I went to the store and then the end of the day"),
+    # 不能切断英文单词
+    ("hello", "lol", "hello lol"),
+    ("I like cats", "tsunami warnings", "I like cats tsunami warnings"),
+    ("please turn on the lights", "on the light in the kitchen",
+     "please turn on the lights on the light in the kitchen"),
+])
+def test_stitch_falls_back_to_join_when_match_is_not_at_the_seam(previous, current, expected):
+    assert stitch_transcripts(previous, current) == expected
+
+
+def test_stitch_handles_empty_text():
+    assert stitch_transcripts("", " 你好 ") == "你好"
+    assert stitch_transcripts("你好 ", "") == "你好"
+
+
+def test_join_transcripts():
+    assert join_transcripts("你好", "世界") == "你好世界"
+    assert join_transcripts("hello", "world") == "hello world"
+    assert join_transcripts("hello", "世界") == "hello世界"
+    assert join_transcripts("", "world") == "world"
@@ -0,0 +1,79 @@
+import os
+
+from speech.tts_cache import TTSCache
+
+
+def make_cache(tmp_path, max_disk_bytes=1000, max_memory_bytes=400):
+    return TTSCache(cache_dir=str(tmp_path), max_disk_bytes=max_disk_bytes,
+                    max_memory_bytes=max_memory_bytes)
+
+
+def test_key_depends_on_voice_rate_and_normalized_text():
+    key = TTSCache.make_key("zh-CN-XiaoxiaoNeural", "+0%", "你好  世界")
+    assert key == TTSCache.make_key("zh-CN-XiaoxiaoNeural", "+0%", " 你好 世界\n")
+    assert key != TTSCache.make_key("zh-CN-YunxiNeural", "+0%", "你好 世界")
+    assert key != TTSCache.make_key("zh-CN-XiaoxiaoNeural", "+10%", "你好 世界")
+    assert key != TTSCache.make_key("zh-CN-XiaoxiaoNeural", "+0%", "你好世界")
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("a" * 64) is None
+    cache.put("a" * 64, b"x" * 50)
+
+    assert cache.get_memory("a" * 64) == b"x" * 50
+    assert cache.get("a" * 64) == b"x" * 50
+    stats = cache.stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+
+    # 新实例从磁盘加载索引，第一次命中读磁盘
+    reloaded = make_cache(tmp_path)
+    assert reloaded.get_memory("a" * 64) is None
+    assert reloaded.get("a" * 64) == b"x" * 50
+    assert reloaded.stats()["disk_hits"] == 1
+
+
+def test_disk_lru_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, max_disk_bytes=300)
+    keys = [c * 64 for c in "abc"]
+    for key in keys:
+        cache.put(key, b"x" * 100)
+    # 访问 a，使 b 成为最久未使用的条目
+    assert cache.get(keys[0]) is not None
+    cache.put("d" * 64, b"x" * 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(cache._path(keys[1]))
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = make_cache(tmp_path, max_disk_bytes=10000, max_memory_bytes=400)
+    for c in "abcdef":
+        cache.put(c * 64, b"x" * 100)
+    stats = cache.stats()
+    assert stats["memory_bytes"] <= 400
+    assert stats["entries"] == 6
+    # 被挤出内存层的条目仍可从磁盘读取
+    assert cache.get_memory("a" * 64) is None
+    assert cache.get("a" * 64) == b"x" * 100
+
+
+def test_large_entries_skip_memory_and_oversized_entries_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path, max_disk_bytes=1000, max_memory_bytes=400)
+    cache.put("a" * 64, b"x" * 200)  # 超过内存上限的四分之一，只放磁盘
+    assert cache.get_memory("a" * 64) is None
+    assert cache.get("a" * 64) == b"x" * 200
+
+    cache.put("b" * 64, b"x" * 2000)
+    assert cache.get("b" * 64) is None
+
+
+def test_externally_deleted_file_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path, max_memory_bytes=0)
+    cache.put("a" * 64, b"x" * 50)
+    os.remove(cache._path("a" * 64))
+    assert cache.get("a" * 64) is None
+    assert cache.stats()["entries"] == 0
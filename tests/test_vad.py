@@ -0,0 +1,75 @@
+import numpy as np
+
+from speech.vad import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 0.3, freq: float = 220.0) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def noise(seconds: float, amplitude: float = 0.001, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def test_silence_has_no_segments():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    assert vad.segments(np.zeros(SAMPLE_RATE, dtype=np.float32)) == []
+    assert vad.split(noise(2.0)) == []
+
+
+def test_detects_speech_between_silence():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    audio = np.concatenate([noise(1.0), tone(1.0), noise(1.0, seed=1)])
+    segments = vad.segments(audio)
+    assert len(segments) == 1
+    start, end = segments[0]
+    # 允许前后余量和拖尾
+    assert 0.8 * SAMPLE_RATE <= start <= 1.0 * SAMPLE_RATE
+    assert 2.0 * SAMPLE_RATE <= end <= 2.6 * SAMPLE_RATE
+
+
+def test_short_pause_is_merged_and_long_pause_splits():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    merged = np.concatenate([noise(1.0), tone(0.5), noise(0.1, seed=1), tone(0.5), noise(1.0, seed=2)])
+    assert len(vad.segments(merged)) == 1
+
+    split = np.concatenate([noise(1.0), tone(0.5), noise(1.5, seed=1), tone(0.5), noise(1.0, seed=2)])
+    assert len(vad.segments(split)) == 2
+
+
+def test_short_burst_is_ignored():
+    vad = VoiceActivityDetector(SAMPLE_RATE, min_speech_duration=0.2)
+    audio = np.concatenate([noise(1.0), tone(0.06), noise(1.0, seed=1)])
+    assert vad.segments(audio) == []
+
+
+def test_trim_keeps_speech():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    audio = np.concatenate([noise(1.0), tone(1.0), noise(1.0, seed=1)])
+    trimmed = vad.trim(audio)
+    assert SAMPLE_RATE <= len(trimmed) < len(audio)
+
+
+def test_streaming_update_follows_speech_with_hangover():
+    vad = VoiceActivityDetector(SAMPLE_RATE, hangover_duration=0.3)
+    for i in range(10):
+        assert not vad.update(noise(0.1, seed=i))
+    assert vad.update(tone(0.1))
+
+    # 语音结束后拖尾期间仍然视为语音，之后恢复静音
+    states = [vad.update(noise(0.1, seed=100 + i)) for i in range(10)]
+    assert states[0]
+    assert not states[-1]
+
+
+def test_threshold_tracks_noise_floor():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    vad.update(noise(0.5, amplitude=0.001))
+    quiet = vad.threshold
+    vad.reset()
+    vad.update(noise(0.5, amplitude=0.01))
+    assert vad.threshold > quiet
@@ -0,0 +1,54 @@
+"""
+取消令牌模块 - 在线程之间传递"放弃当前回答"的信号
+"""
+import threading
+from typing import Callable, List
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CancellationToken:
+    """
+    线程安全的取消令牌
+
+    每轮对话创建一个令牌，随文本和音频流经生成、合成和播放各个阶段；
+    调用 cancel() 后，各阶段检查到令牌已取消即停止处理。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消，并执行已注册的回调（每个回调只执行一次）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("执行取消回调失败: %s", e)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        注册取消时执行的回调，已取消时立即执行
+
+        Args:
+            callback: 无参数回调
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
@@ -1,95 +1,24 @@
 """
-数据库模块 - 处理与MySQL数据库的交互
+数据库模块 - 对话记录存储的统一接口
 """
-import mysql.connector
-from mysql.connector import Error
+from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import Iterator, Optional, Tuple
+from config import DB_CONFIG
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-class Database:
-    def __init__(self):
-        """初始化数据库连接"""
-        self.db_config = {
-            'host': 'localhost',
-            'user': 'root',
-            'password': '88888888',
-            'database': 'jarvis_chat'
-        }
-        self.connection = None
-        self.create_database()
-        self.create_tables()
-    
-    def create_database(self):
-        """创建数据库"""
-        try:
-            conn = mysql.connector.connect(
-                host=self.db_config['host'],
-                user=self.db_config['user'],
-                password=self.db_config['password']
-            )
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.db_config['database']}")
-            logger.info(f"数据库 {self.db_config['database']} 创建成功")
-        except Error as e:
-            logger.error(f"创建数据库失败: {str(e)}")
-            raise
-        finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
-    
-    def create_tables(self):
-        """创建必要的表"""
-        try:
-            self.connect()
-            cursor = self.connection.cursor()
-            
-            # 创建对话历史表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    session_id VARCHAR(50),
-                    timestamp DATETIME,
-                    input_type ENUM('text', 'voice'),
-                    user_input TEXT,
-                    ai_response TEXT,
-                    model_used VARCHAR(50),
-                    response_time FLOAT
-                )
-            """)
-            
-            self.connection.commit()
-            logger.info("数据表创建成功")
-            
-        except Error as e:
-            logger.error(f"创建表失败: {str(e)}")
-            raise
-        finally:
-            self.disconnect()
-    
-    def connect(self):
-        """连接到数据库"""
-        try:
-            if not self.connection or not self.connection.is_connected():
-                self.connection = mysql.connector.connect(**self.db_config)
-                logger.debug("数据库连接成功")
-        except Error as e:
-            logger.error(f"数据库连接失败: {str(e)}")
-            raise
-    
-    def disconnect(self):
-        """断开数据库连接"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.debug("数据库连接已关闭")
-    
-    def save_chat(self, session_id: str, input_type: str, user_input: str, 
+class BaseDatabase(ABC):
+    """对话记录存储的基类"""
+
+    name = "base"
+
+    def save_chat(self, session_id: str, input_type: str, user_input: str,
                  ai_response: str, model_used: str, response_time: float):
         """
         保存对话记录
-        
+
         Args:
             session_id: 会话ID
             input_type: 输入类型 ('text' 或 'voice')
@@ -98,150 +27,190 @@ class Database:
             model_used: 使用的AI模型
             response_time: 响应时间（秒）
         """
-        try:
-            self.connect()
-            cursor = self.connection.cursor()
-            
-            query = """
-                INSERT INTO chat_history 
-                (session_id, timestamp, input_type, user_input, ai_response, model_used, response_time)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            values = (
-                session_id,
-                datetime.now(),
-                input_type,
-                user_input,
-                ai_response,
-                model_used,
-                response_time
-            )
-            
-            cursor.execute(query, values)
-            self.connection.commit()
-            logger.info(f"对话记录已保存，ID: {cursor.lastrowid}")
-            
-        except Error as e:
-            logger.error(f"保存对话记录失败: {str(e)}")
-            raise
-        finally:
-            self.disconnect()
-
-    def get_chat_history(self, session_id: str = None, limit: int = 10) -> list:
-        """
-        获取对话历史记录
-        
+        self.save_chats([(
+            session_id,
+            datetime.now(),
+            input_type,
+            user_input,
+            ai_response,
+            model_used,
+            response_time
+        )])
+
+    @abstractmethod
+    def save_chats(self, records: list):
+        """
+        在一个事务中批量保存对话记录，并更新统计汇总
+
+        Args:
+            records: (session_id, timestamp, input_type, user_input, ai_response,
+                     model_used, response_time) 元组列表
+        """
+        pass
+
+    @abstractmethod
+    def get_chat_history(self, session_id: str = None, limit: int = 10,
+                         before: Optional[Tuple[datetime, int]] = None) -> list:
+        """
+        获取对话历史记录（按 (timestamp, id) 倒序）
+
         Args:
             session_id: 可选的会话ID过滤
             limit: 返回的记录数量限制
-            
+            before: 翻页游标，上一页最后一条记录的 (timestamp, id)，
+                    只返回排在它之后的记录（见 page_cursor）
+
+        Returns:
+            list: 对话记录字典列表
+        """
+        pass
+
+    @abstractmethod
+    def iter_chat_history(self, session_id: str = None, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        按 (timestamp, id) 正序逐条读取全部对话记录，内存占用与记录总数无关
+
+        在一个只读事务中读取，结果来自同一个快照。
+
+        Args:
+            session_id: 可选的会话ID过滤
+            batch_size: 每次从数据库取回的记录数
+
+        Yields:
+            dict: 对话记录
+        """
+        pass
+
+    @abstractmethod
+    def search_history(self, query: str, session_id: str = None,
+                       limit: int = 10, offset: int = 0) -> list:
+        """
+        全文检索对话记录（用户输入和AI回复），按相关度排序
+
+        Args:
+            query: 检索词，以空白分隔的多个词需要同时出现
+            session_id: 可选的会话ID过滤
+            limit: 每页记录数
+            offset: 跳过的记录数（翻页）
+
         Returns:
-            list: 对话记录列表
-        """
-        try:
-            self.connect()
-            cursor = self.connection.cursor(dictionary=True)
-            
-            if session_id:
-                query = """
-                    SELECT * FROM chat_history 
-                    WHERE session_id = %s 
-                    ORDER BY timestamp DESC 
-                    LIMIT %s
-                """
-                cursor.execute(query, (session_id, limit))
-            else:
-                query = """
-                    SELECT * FROM chat_history 
-                    ORDER BY timestamp DESC 
-                    LIMIT %s
-                """
-                cursor.execute(query, (limit,))
-            
-            results = cursor.fetchall()
-            logger.debug(f"获取到 {len(results)} 条对话记录")
-            return results
-            
-        except Error as e:
-            logger.error(f"获取对话记录失败: {str(e)}")
-            raise
-        finally:
-            self.disconnect()
-
-    def get_session_stats(self) -> dict:
-        """
-        获取会话统计信息
-        
+            list: 对话记录字典列表，score 为相关度（越大越相关）
+        """
+        pass
+
+    @abstractmethod
+    def get_session_stats(self, session_id: str = None) -> dict:
+        """
+        获取统计信息
+
+        Args:
+            session_id: 可选的会话ID，提供时额外返回该会话的统计
+
         Returns:
-            dict: 包含统计信息的字典
-        """
-        try:
-            self.connect()
-            cursor = self.connection.cursor(dictionary=True)
-            
-            # 获取总体统计
-            stats = {}
-            
-            # 总对话数
-            cursor.execute("SELECT COUNT(*) as total FROM chat_history")
-            stats.update(cursor.fetchone())
-            
-            # 按输入类型统计
-            cursor.execute("""
-                SELECT input_type, COUNT(*) as count 
-                FROM chat_history 
-                GROUP BY input_type
-            """)
-            stats['input_types'] = {row['input_type']: row['count'] 
-                                  for row in cursor.fetchall()}
-            
-            # 平均响应时间
-            cursor.execute("""
-                SELECT AVG(response_time) as avg_response_time 
-                FROM chat_history
-            """)
-            stats.update(cursor.fetchone())
-            
-            # 使用的模型统计
-            cursor.execute("""
-                SELECT model_used, COUNT(*) as count 
-                FROM chat_history 
-                GROUP BY model_used
-            """)
-            stats['models'] = {row['model_used']: row['count'] 
-                             for row in cursor.fetchall()}
-            
-            logger.debug("统计信息获取成功")
-            return stats
-            
-        except Error as e:
-            logger.error(f"获取统计信息失败: {str(e)}")
-            raise
-        finally:
-            self.disconnect()
+            dict: total / input_types / avg_response_time / models /
+                  response_time_percentiles / session
+        """
+        pass
 
+    @abstractmethod
+    def get_recent_sessions(self, limit: int = 10) -> list:
+        """
+        获取最近活跃会话的统计
+
+        Args:
+            limit: 返回的会话数量
+
+        Returns:
+            list: 每个会话的对话数、平均响应时间和起止时间
+        """
+        pass
+
+    @abstractmethod
     def clear_history(self, session_id: str = None):
         """
         清除对话历史
-        
+
         Args:
             session_id: 可选的会话ID，如果提供则只清除该会话的记录
         """
-        try:
-            self.connect()
-            cursor = self.connection.cursor()
-            
-            if session_id:
-                query = "DELETE FROM chat_history WHERE session_id = %s"
-                cursor.execute(query, (session_id,))
-            else:
-                cursor.execute("DELETE FROM chat_history")
-            
-            self.connection.commit()
-            logger.info(f"已清除{'指定会话' if session_id else '所有'}的对话记录")
-            
-        except Error as e:
-            logger.error(f"清除对话记录失败: {str(e)}")
-            raise
-        finally:
-            self.disconnect() 
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def archive_history(self, cutoff: datetime, limit: int = 1000) -> int:
+        """
+        把最早的一批早于 cutoff 的记录压缩后移入归档表（一个事务，统计汇总不变）
+
+        Args:
+            cutoff: 早于该时间的记录需要归档
+            limit: 本批最多归档的记录数
+
+        Returns:
+            int: 本批归档的记录数，小于 limit 表示已没有需要归档的记录
+        """
+        pass
+
+    @abstractmethod
+    def get_archived_history(self, session_id: str = None, start: datetime = None,
+                             end: datetime = None) -> list:
+        """
+        读取已归档的对话记录（按 (timestamp, id) 正序）
+
+        Args:
+            session_id: 可选的会话ID过滤
+            start: 可选的起始时间（包含）
+            end: 可选的结束时间（不包含）
+
+        Returns:
+            list: 对话记录字典列表
+        """
+        pass
+
+    @abstractmethod
+    def get_archive_stats(self) -> dict:
+        """
+        获取归档表的统计
+
+        Returns:
+            dict: chunks / rows / raw_bytes / compressed_bytes / oldest / newest
+        """
+        pass
+
+    def close(self):
+        """释放连接等资源"""
+        pass
+
+def page_cursor(records: list) -> Optional[Tuple[datetime, int]]:
+    """
+    由一页对话记录得到下一页的游标
+
+    Args:
+        records: get_chat_history 返回的一页记录
+
+    Returns:
+        tuple: 最后一条记录的 (timestamp, id)，没有记录时为 None
+    """
+    if not records:
+        return None
+    return records[-1]['timestamp'], records[-1]['id']
+
+DATABASE_BACKENDS = ("mysql", "sqlite")
+
+def create_database(backend: str = None) -> BaseDatabase:
+    """
+    根据名称创建数据库后端（按需导入，未使用的后端不需要安装驱动）
+
+    Args:
+        backend: 后端名称 ("mysql", "sqlite")，默认读取配置
+
+    Returns:
+        BaseDatabase: 数据库实例
+    """
+    backend = backend or DB_CONFIG["backend"]
+    logger.info("使用 %s 数据库后端", backend)
+    if backend == "mysql":
+        from utils.mysql_database import MySQLDatabase
+        return MySQLDatabase()
+    if backend == "sqlite":
+        from utils.sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(DB_CONFIG["sqlite_path"])
+    raise ValueError(f"不支持的数据库后端: {backend}，可选: {', '.join(DATABASE_BACKENDS)}")
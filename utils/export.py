@@ -0,0 +1,149 @@
+"""
+对话历史导出模块 - 以 JSONL 或 CSV 逐条流式导出，可选 gzip 压缩
+
+记录从数据库游标逐批读取并立即写出，导出数千万条记录时内存占用保持不变。
+
+用法:
+    python -m utils.export history.jsonl.gz [--format jsonl] [--session <会话ID>] [--backend sqlite]
+
+输出文件名以 .gz 结尾时自动压缩，"-" 表示写到标准输出。
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from rich.console import Console
+
+from utils.database import BaseDatabase, create_database
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+console = Console(stderr=True)
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+COLUMNS = ("id", "session_id", "timestamp", "input_type", "user_input",
+           "ai_response", "model_used", "response_time")
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+@contextmanager
+def open_output(output: str, compress: bool = None):
+    """
+    打开导出的文本输出
+
+    Args:
+        output: 文件路径，"-" 表示标准输出
+        compress: 是否 gzip 压缩，默认根据文件名是否以 .gz 结尾判断
+    """
+    if compress is None:
+        compress = output.endswith(".gz")
+    if output == "-":
+        raw = sys.stdout.buffer
+        close_raw = False
+    else:
+        raw = open(output, "wb")
+        close_raw = True
+
+    # compresslevel=6: 与 gzip 命令默认值相同，比 9 快得多而体积相差很小
+    binary = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if compress else raw
+    # newline="": csv 模块自己写行结束符
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="", write_through=False)
+    try:
+        yield text
+    finally:
+        text.flush()
+        text.detach()
+        if compress:
+            binary.close()
+        if close_raw:
+            raw.close()
+        else:
+            raw.flush()
+
+
+def export_history(db: BaseDatabase, output: str, fmt: str = "jsonl", session_id: str = None,
+                   compress: bool = None, batch_size: int = 1000) -> int:
+    """
+    把对话记录按时间顺序导出到文件
+
+    Args:
+        db: 数据库实例
+        output: 输出文件路径，"-" 表示标准输出
+        fmt: 导出格式 ("jsonl", "csv")
+        session_id: 可选的会话ID，只导出该会话
+        compress: 是否 gzip 压缩，默认根据文件名判断
+        batch_size: 每次从数据库读取的记录数
+
+    Returns:
+        int: 导出的记录数
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+
+    count = 0
+    start = time.perf_counter()
+    with open_output(output, compress) as f:
+        records = db.iter_chat_history(session_id=session_id, batch_size=batch_size)
+        if fmt == "jsonl":
+            for record in records:
+                f.write(json.dumps({column: _serialize(record.get(column)) for column in COLUMNS},
+                                   ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for record in records:
+                writer.writerow([_serialize(record.get(column)) for column in COLUMNS])
+                count += 1
+
+    elapsed = time.perf_counter() - start
+    logger.info("导出 %s 条对话记录到 %s，耗时 %.1f秒", count, output, elapsed)
+    return count
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="导出对话历史")
+    parser.add_argument("output", help="输出文件（以 .gz 结尾时压缩，- 表示标准输出）")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None,
+                        help="导出格式，默认根据文件扩展名判断，否则为 jsonl")
+    parser.add_argument("--session", default=None, help="只导出指定会话")
+    parser.add_argument("--backend", default=None, help="数据库后端 (mysql / sqlite)，默认读取配置")
+    parser.add_argument("--gzip", action="store_true", help="强制 gzip 压缩")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每次从数据库读取的记录数")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.output.removesuffix(".gz").endswith(".csv") else "jsonl"
+
+    db = create_database(args.backend)
+    try:
+        count = export_history(
+            db,
+            args.output,
+            fmt=fmt,
+            session_id=args.session,
+            compress=True if args.gzip else None,
+            batch_size=args.batch_size
+        )
+    finally:
+        db.close()
+    console.print(f"[bold green]完成[/bold green] 导出 {count} 条记录到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
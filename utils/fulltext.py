@@ -0,0 +1,101 @@
+"""
+全文检索模块 - 检索词转换，以及为 SQLite FTS5 把中日韩文字切分为二元组
+
+FTS5 的 unicode61 分词器把连续的汉字当作一个词，无法检索其中的子串。
+这里把每段连续的中日韩文字展开为重叠的二元组（"今天天气" -> "今天 天天 天气"），
+查询时做同样的切分并按短语匹配，效果与 MySQL 的 ngram 解析器相同。
+"""
+import re
+
+# 中日韩文字（假名、汉字、谚文）
+CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+
+
+def _bigrams(run: str) -> list:
+    return [run[i:i + 2] for i in range(len(run) - 1)] or [run]
+
+
+def cjk_bigrams(text: str) -> str:
+    """
+    把文本转换为用于建立索引的形式
+
+    每段中日韩文字展开为二元组，并在末尾追加最后一个字，
+    使每个字都是某个词的开头，单字查询可以用前缀匹配找到。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        str: 以空格分隔的词
+    """
+    if not text:
+        return ""
+
+    def expand(match):
+        run = match.group(0)
+        tokens = _bigrams(run)
+        if len(run) > 1:
+            tokens.append(run[-1])
+        return f" {' '.join(tokens)} "
+
+    return CJK_RUN.sub(expand, text)
+
+
+def _query_bigrams(match, term: str) -> list:
+    """
+    检索词中一段中日韩文字的二元组
+
+    后面还有其它字符时，这段文字在原文中同样在此结束，索引里它的
+    二元组之后紧跟着末尾单字，短语中也要带上末尾单字才能相邻。
+    """
+    run = match.group(0)
+    tokens = _bigrams(run)
+    if len(run) > 1 and match.end() < len(term):
+        tokens.append(run[-1])
+    return tokens
+
+
+def fts5_query(query: str) -> str:
+    """
+    把用户输入转换为 FTS5 查询表达式
+
+    以空白分隔的每个词都必须出现（AND），每个词按短语匹配；
+    单个汉字使用前缀匹配。
+
+    Args:
+        query: 用户输入的检索词
+
+    Returns:
+        str: FTS5 MATCH 表达式，没有可检索的词时返回空字符串
+    """
+    terms = []
+    for term in query.split():
+        if CJK_RUN.fullmatch(term) and len(term) == 1:
+            terms.append(f'"{term}"*')
+            continue
+        tokens = CJK_RUN.sub(lambda m: f" {' '.join(_query_bigrams(m, term))} ", term).split()
+        if tokens:
+            phrase = " ".join(tokens).replace('"', '""')
+            terms.append(f'"{phrase}"')
+    return " ".join(terms)
+
+
+def mysql_boolean_query(query: str) -> str:
+    """
+    把用户输入转换为 MySQL 布尔模式的全文检索表达式
+
+    以空白分隔的每个词都必须出现（+），每个词按短语匹配，
+    短语由 ngram 解析器切分，与 fts5_query 的行为一致。
+
+    Args:
+        query: 用户输入的检索词
+
+    Returns:
+        str: AGAINST (... IN BOOLEAN MODE) 表达式，没有可检索的词时返回空字符串
+    """
+    terms = []
+    for term in query.split():
+        term = term.replace('"', "")
+        if term:
+            terms.append(f'+"{term}"')
+    return " ".join(terms)
@@ -0,0 +1,200 @@
+"""
+对话记录后台写入模块 - 把数据库写入移出响应路径，批量提交
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from config import DB_CONFIG
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ChatHistoryWriter:
+    """
+    对话记录的后台写入器（write-behind）
+
+    save_chat 只把记录放入有界队列就返回；后台线程攒批后用一次
+    executemany 在一个事务中写入。数据库暂时不可用时按指数退避重试，
+    队列满或重试用尽时丢弃记录并计数，不影响对话本身。
+    """
+
+    _STOP = object()
+
+    def __init__(self, db, batch_size: int = None, flush_interval: float = None,
+                 max_queue: int = None, max_retries: int = None, history_size: int = 200):
+        """
+        初始化写入器并启动后台线程
+
+        Args:
+            db: 提供 save_chats(records) 的数据库对象
+            batch_size: 每批最多写入的记录数，默认读取配置
+            flush_interval: 攒批时最多等待的时间（秒），默认读取配置
+            max_queue: 队列中最多缓冲的记录数，默认读取配置
+            max_retries: 每批写入失败后的重试次数，默认读取配置
+            history_size: 用于统计写入延迟的最近批次数
+        """
+        self.db = db
+        self.batch_size = batch_size or DB_CONFIG["write_batch_size"]
+        self.flush_interval = flush_interval or DB_CONFIG["write_flush_interval"]
+        self.max_retries = DB_CONFIG["write_max_retries"] if max_retries is None else max_retries
+        self._queue = queue.Queue(maxsize=max_queue or DB_CONFIG["write_queue_size"])
+
+        # 已入队但尚未写入（或丢弃）的记录数，flush 等待它归零
+        self._pending = 0
+        self._condition = threading.Condition()
+
+        # 统计信息
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_attempts = 0
+        self.flush_latencies = deque(maxlen=history_size)
+
+        self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self._thread.start()
+
+    def save_chat(self, session_id: str, input_type: str, user_input: str,
+                  ai_response: str, model_used: str, response_time: float) -> bool:
+        """
+        把对话记录加入写入队列，不等待数据库
+
+        Args:
+            session_id: 会话ID
+            input_type: 输入类型 ('text' 或 'voice')
+            user_input: 用户输入
+            ai_response: AI响应
+            model_used: 使用的AI模型
+            response_time: 响应时间（秒）
+
+        Returns:
+            bool: 是否成功入队，队列已满时返回False
+        """
+        record = (session_id, datetime.now(), input_type, user_input,
+                  ai_response, model_used, response_time)
+        with self._condition:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            logger.warning("对话记录写入队列已满，丢弃记录")
+            self._done(1, dropped=True)
+            return False
+
+    def _done(self, count: int, dropped: bool = False):
+        with self._condition:
+            self._pending -= count
+            if dropped:
+                self.dropped += count
+            else:
+                self.written += count
+            self._condition.notify_all()
+
+    def _next_batch(self) -> Optional[list]:
+        """等待第一条记录，然后在攒批时间内凑满一批；收到停止信号时返回None"""
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                # 写完这一批后退出
+                self._queue.put(self._STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _write(self, batch: list):
+        """写入一批记录，失败时指数退避重试"""
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self.db.save_chats(batch)
+            except Exception as e:
+                self.failed_attempts += 1
+                if attempt == self.max_retries:
+                    logger.error("写入对话记录失败，丢弃 %s 条: %s", len(batch), e)
+                    self._done(len(batch), dropped=True)
+                    return
+                logger.warning("写入对话记录失败，%.1f秒后重试: %s", delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+                continue
+            self.flush_latencies.append(time.perf_counter() - start)
+            self.batches += 1
+            self._done(len(batch))
+            return
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._write(batch)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已入队的记录全部写入
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否在超时前全部写入
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """
+        写入剩余记录并停止后台线程
+
+        Args:
+            timeout: 等待剩余记录写入的最长时间（秒）
+        """
+        if not self._thread.is_alive():
+            return
+        if not self.flush(timeout):
+            logger.warning("关闭时仍有 %s 条对话记录未写入", self._pending)
+        try:
+            self._queue.put(self._STOP, timeout=1.0)
+        except queue.Full:
+            return
+        self._thread.join(timeout=1.0)
+
+    def stats(self) -> dict:
+        """
+        获取写入统计信息
+
+        Returns:
+            dict: 队列深度、写入/丢弃数量和每批写入延迟
+        """
+        latencies = sorted(self.flush_latencies)
+
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending": self._pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "avg_batch_size": self.written / self.batches if self.batches else 0.0,
+            "failed_attempts": self.failed_attempts,
+            "flush_latency_p50": percentile(latencies, 0.5),
+            "flush_latency_p90": percentile(latencies, 0.9),
+            "flush_latency_max": latencies[-1] if latencies else None,
+        }
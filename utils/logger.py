@@ -1,13 +1,28 @@
 """
 日志配置模块
+
+所有 logger 共用一个 QueueHandler：调用方只把日志记录放入队列就返回，
+格式化以及文件和控制台的写入由唯一的 QueueListener 线程完成，
+整个进程只打开一次日志文件，轮转不会在多个处理器之间冲突。
+
+文件中每条日志是一行 JSON，事件名和字段通过 extra 传入：
+    logger.info("语音生成完成: %s", truncate(text), extra={"event": "tts.done", "chars": len(text)})
+控制台按事件名过滤，高频路径使用 SampledLogger 限制输出频率。
 """
+import atexit
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
+from config import LOG_CONFIG
+from utils.tracing import TraceContextFilter
 
 # 创建logs目录
-LOG_DIR = "logs"
+LOG_DIR = LOG_CONFIG["dir"]
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
@@ -15,78 +30,214 @@ if not os.path.exists(LOG_DIR):
 LOG_FILE = os.path.join(LOG_DIR, f"jarvis_{datetime.now().strftime('%Y%m%d')}.log")
 
 class ConsoleLogFilter(logging.Filter):
-    """控制台日志过滤器"""
+    """
+    控制台日志过滤器
+    
+    按日志记录的 event 字段过滤，不检查消息文本：
+    logger.info("AI响应: %s", truncate(response), extra={"event": "chat.response"})
+    文件中仍保留全部记录。
+    """
+    def __init__(self, quiet_events=None):
+        super().__init__()
+        self.quiet_events = frozenset(LOG_CONFIG["console_quiet_events"] if quiet_events is None else quiet_events)
+    
     def filter(self, record):
-        # 过滤语音合成相关的日志
-        if record.name == "speech.synthesizer" and (
-            "开始转换文字为语音" in record.msg or 
-            "语音生成完成" in record.msg
-        ):
-            return False
-            
-        # 过滤AI响应的重复显示
-        if record.name == "__main__" and (
-            "AI响应:" in record.msg or
-            "收到用户输入:" in record.msg
-        ):
-            return False
-            
-        # 过滤数据库的一些日志
-        if record.name == "utils.database" and (
-            "数据库连接成功" in record.msg or
-            "数据库连接已关闭" in record.msg or
-            "对话记录已保存" in record.msg
-        ):
-            return False
-            
-        # 过滤语音识别的一些日志
-        if record.name == "speech.recognizer" and (
-            "删除临时文件" in record.msg
-        ):
-            return False
-            
-        return True
+        return getattr(record, "event", None) not in self.quiet_events
 
-def setup_logger(name: str) -> logging.Logger:
+class DeferredQueueHandler(QueueHandler):
+    """
+    把未格式化的日志记录放入队列
+    
+    默认的 QueueHandler 会在调用线程中格式化消息；这里保留 msg 和 args，
+    由监听线程格式化，调用方只付出入队的开销。记录日志后不要再修改作为参数传入的对象。
+    """
+    def prepare(self, record):
+        return record
+
+class Truncated:
+    """
+    延迟截断的长文本，只有日志真正输出时才会截断
+    
+    用法: logger.info("AI响应: %s", truncate(response))
+    """
+    __slots__ = ("text", "limit")
+    
+    def __init__(self, text, limit: int):
+        self.text = text
+        self.limit = limit
+    
+    def __str__(self):
+        text = str(self.text)
+        if self.limit <= 0 or len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}…（共{len(text)}字）"
+    
+    __repr__ = __str__
+
+def truncate(text, limit: int = None) -> Truncated:
     """
-    配置并返回logger实例
+    截断写入日志的用户输入、提示词和AI回复
     
     Args:
-        name: logger名称
+        text: 原始文本
+        limit: 保留的字符数，默认读取配置，0 表示不截断
         
     Returns:
-        logging.Logger: 配置好的logger实例
+        Truncated: 作为日志参数使用的对象
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    return Truncated(text, LOG_CONFIG["max_message_chars"] if limit is None else limit)
 
-    # 设置日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+class SampledLogger:
+    """
+    按时间间隔采样的日志，用于流式响应片段、音频回调等高频路径
+    
+    每个实例对应一个调用点，间隔内只输出第一条，跳过的条数记在下一条的 suppressed 字段中。
+    级别未启用时只做一次级别检查，可以放在音频回调里。
+    
+    用法:
+        chunk_log = SampledLogger(logger)
+        chunk_log.debug("收到响应片段: %s字", len(text), extra={"event": "llm.chunk"})
+    """
+    def __init__(self, logger: logging.Logger, interval: float = None):
+        """
+        Args:
+            logger: 实际输出日志的logger
+            interval: 两条日志之间的最短间隔（秒），默认读取配置
+        """
+        self.logger = logger
+        self.interval = LOG_CONFIG["sample_interval"] if interval is None else interval
+        self._next = 0.0
+        self._suppressed = 0
+    
+    def log(self, level: int, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        # 不加锁：并发时偶尔多输出一条或计数略有偏差，不影响调用方
+        if now < self._next:
+            self._suppressed += 1
+            return
+        self._next = now + self.interval
+        extra = dict(kwargs.pop("extra", None) or {})
+        extra["suppressed"] = self._suppressed
+        self._suppressed = 0
+        self.logger.log(level, msg, *args, extra=extra, stacklevel=3, **kwargs)
+    
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+    
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+def _json_formatter() -> logging.Formatter:
+    """
+    文件日志使用的 JSON 格式：每行一个对象，extra 中的字段（event、trace_id 等）作为顶层键
+    
+    Returns:
+        logging.Formatter: 未安装 python-json-logger 时返回 None
+    """
+    try:
+        from pythonjsonlogger.json import JsonFormatter
+    except ImportError:
+        try:
+            # python-json-logger 2.x
+            from pythonjsonlogger.jsonlogger import JsonFormatter
+        except ImportError:
+            return None
+    return JsonFormatter(
+        '%(asctime)s %(name)s %(levelname)s %(message)s',
+        rename_fields={"asctime": "time", "name": "logger", "levelname": "level"},
+        json_ensure_ascii=False
     )
 
-    # 配置文件处理器 - 10MB大小，保留5个备份
+def logger_level(name: str) -> str:
+    """
+    logger 的日志级别：LOG_LEVELS 中最长的匹配前缀，没有时使用 LOG_LEVEL
+    
+    Args:
+        name: logger名称，如 "speech.recognizer"
+        
+    Returns:
+        str: 级别名称
+    """
+    levels = LOG_CONFIG["levels"]
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        level = levels.get(".".join(parts[:i]))
+        if level:
+            return level
+    return LOG_CONFIG["level"]
+
+_queue_handler = None
+_listener = None
+_lock = threading.Lock()
+
+def _start_listener() -> QueueHandler:
+    """创建文件和控制台处理器，并启动唯一的监听线程"""
+    global _listener
+    
+    # 设置日志格式：控制台为文本，文件默认为 JSON
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+    )
+    file_formatter = formatter
+    if LOG_CONFIG["file_format"] == "json":
+        file_formatter = _json_formatter()
+        if file_formatter is None:
+            # 此时 logger 还不可用，直接写到标准错误
+            print("未安装 python-json-logger，文件日志使用文本格式: pip install python-json-logger",
+                  file=sys.stderr)
+            file_formatter = formatter
+    
+    # 配置文件处理器 - 默认10MB大小，保留5个备份
     file_handler = RotatingFileHandler(
         LOG_FILE, 
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
+        maxBytes=LOG_CONFIG["max_mb"]*1024*1024,
+        backupCount=LOG_CONFIG["backup_count"],
         encoding='utf-8'
     )
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(file_formatter)
     
     # 配置控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(ConsoleLogFilter())
     
-    # 添加过滤器
-    console_filter = ConsoleLogFilter()
-    console_handler.addFilter(console_filter)
-
-    # 添加处理器
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # 无界队列：入队永远不会阻塞调用方
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    # 退出时写完队列中剩余的日志
+    atexit.register(_listener.stop)
+    handler = DeferredQueueHandler(log_queue)
+    # 在调用线程中记录 trace_id，监听线程中已经没有调用方的上下文
+    handler.addFilter(TraceContextFilter())
+    return handler
 
+def setup_logger(name: str) -> logging.Logger:
+    """
+    获取logger实例并接入共享的日志队列（重复调用不会重复添加处理器）
+    
+    Args:
+        name: logger名称
+        
+    Returns:
+        logging.Logger: 配置好的logger实例
+    """
+    global _queue_handler
+    if _queue_handler is None:
+        with _lock:
+            if _queue_handler is None:
+                _queue_handler = _start_listener()
+    
+    logger = logging.getLogger(name)
+    logger.setLevel(logger_level(name))
+    if _queue_handler not in logger.handlers:
+        logger.addHandler(_queue_handler)
+    # 不再传递给根logger，避免第三方库配置的处理器重复输出
+    logger.propagate = False
+    
     return logger
 
 # 创建默认的logger实例
-logger = setup_logger('jarvis') 
\ No newline at end of file
+logger = setup_logger('jarvis')
@@ -0,0 +1,324 @@
+"""
+数据库迁移模块 - 按版本号依次升级数据库结构
+
+MySQL 的已应用版本记录在 schema_migrations 表中，SQLite 使用 PRAGMA user_version。
+"""
+from collections import namedtuple
+from typing import List, Optional
+
+from utils.logger import setup_logger
+from utils.rollups import latency_bucket_sql
+
+logger = setup_logger(__name__)
+
+Migration = namedtuple("Migration", ["version", "description", "statements"])
+
+# 只能追加新的迁移，已发布的迁移不要修改
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建对话历史表", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            session_id VARCHAR(50),
+            timestamp DATETIME,
+            input_type ENUM('text', 'voice'),
+            user_input TEXT,
+            ai_response TEXT,
+            model_used VARCHAR(50),
+            response_time FLOAT
+        )
+        """,
+    ]),
+    Migration(2, "为按会话和按时间的查询添加索引", [
+        # 按会话查询并按时间排序、按会话删除
+        "CREATE INDEX idx_chat_history_session_time ON chat_history (session_id, timestamp)",
+        # 不带会话过滤的最近记录查询
+        "CREATE INDEX idx_chat_history_timestamp ON chat_history (timestamp)",
+    ]),
+    Migration(3, "添加按天、按模型和按会话的统计汇总表", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_stats_daily (
+            day DATE NOT NULL,
+            model_used VARCHAR(50) NOT NULL,
+            input_type VARCHAR(10) NOT NULL,
+            turns INT NOT NULL,
+            total_response_time DOUBLE NOT NULL,
+            PRIMARY KEY (day, model_used, input_type)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_latency_histogram (
+            day DATE NOT NULL,
+            model_used VARCHAR(50) NOT NULL,
+            bucket SMALLINT NOT NULL,
+            turns INT NOT NULL,
+            PRIMARY KEY (day, model_used, bucket)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_session_stats (
+            session_id VARCHAR(50) PRIMARY KEY,
+            turns INT NOT NULL,
+            total_response_time DOUBLE NOT NULL,
+            first_at DATETIME,
+            last_at DATETIME,
+            INDEX idx_chat_session_stats_last_at (last_at)
+        )
+        """,
+        # 从已有记录回填（重复执行时覆盖而不是累加）
+        """
+        INSERT INTO chat_stats_daily (day, model_used, input_type, turns, total_response_time)
+        SELECT DATE(timestamp), COALESCE(model_used, ''), COALESCE(input_type, ''),
+               COUNT(*), COALESCE(SUM(response_time), 0)
+        FROM chat_history
+        GROUP BY 1, 2, 3
+        ON DUPLICATE KEY UPDATE turns = VALUES(turns), total_response_time = VALUES(total_response_time)
+        """,
+        f"""
+        INSERT INTO chat_latency_histogram (day, model_used, bucket, turns)
+        SELECT DATE(timestamp), COALESCE(model_used, ''), {latency_bucket_sql('response_time')}, COUNT(*)
+        FROM chat_history
+        GROUP BY 1, 2, 3
+        ON DUPLICATE KEY UPDATE turns = VALUES(turns)
+        """,
+        """
+        INSERT INTO chat_session_stats (session_id, turns, total_response_time, first_at, last_at)
+        SELECT session_id, COUNT(*), COALESCE(SUM(response_time), 0), MIN(timestamp), MAX(timestamp)
+        FROM chat_history
+        WHERE session_id IS NOT NULL
+        GROUP BY session_id
+        ON DUPLICATE KEY UPDATE turns = VALUES(turns), total_response_time = VALUES(total_response_time),
+                                first_at = VALUES(first_at), last_at = VALUES(last_at)
+        """,
+    ]),
+    Migration(4, "为对话内容添加全文索引（ngram分词，支持中文）", [
+        """
+        ALTER TABLE chat_history
+        ADD FULLTEXT INDEX ft_chat_history_content (user_input, ai_response) WITH PARSER ngram
+        """,
+    ]),
+    Migration(5, "添加按月份和会话分块压缩的归档表", [
+        # payload 为 zlib 压缩的 JSONL（utils.retention.pack_records）
+        """
+        CREATE TABLE IF NOT EXISTS chat_history_archive (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            month CHAR(7) NOT NULL,
+            session_id VARCHAR(50),
+            first_at DATETIME NOT NULL,
+            last_at DATETIME NOT NULL,
+            row_count INT NOT NULL,
+            raw_bytes INT NOT NULL,
+            compressed_bytes INT NOT NULL,
+            payload LONGBLOB NOT NULL,
+            INDEX idx_chat_history_archive_month (month),
+            INDEX idx_chat_history_archive_session (session_id, first_at)
+        )
+        """,
+    ]),
+]
+
+# SQLite 的表结构，版本号与 MySQL 的迁移保持对应
+SQLITE_MIGRATIONS: List[Migration] = [
+    Migration(1, "创建对话历史表", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT,
+            timestamp TEXT,
+            input_type TEXT CHECK (input_type IN ('text', 'voice')),
+            user_input TEXT,
+            ai_response TEXT,
+            model_used TEXT,
+            response_time REAL
+        )
+        """,
+    ]),
+    Migration(2, "为按会话和按时间的查询添加索引", [
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_session_time ON chat_history (session_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)",
+    ]),
+    Migration(3, "添加按天、按模型和按会话的统计汇总表", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_stats_daily (
+            day TEXT NOT NULL,
+            model_used TEXT NOT NULL,
+            input_type TEXT NOT NULL,
+            turns INTEGER NOT NULL,
+            total_response_time REAL NOT NULL,
+            PRIMARY KEY (day, model_used, input_type)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_latency_histogram (
+            day TEXT NOT NULL,
+            model_used TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            turns INTEGER NOT NULL,
+            PRIMARY KEY (day, model_used, bucket)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_session_stats (
+            session_id TEXT PRIMARY KEY,
+            turns INTEGER NOT NULL,
+            total_response_time REAL NOT NULL,
+            first_at TEXT,
+            last_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chat_session_stats_last_at ON chat_session_stats (last_at)",
+    ]),
+    # cjk_bigrams 由 SQLiteDatabase 在每个连接上注册（utils.fulltext.cjk_bigrams）
+    Migration(4, "为对话内容添加全文索引（中日韩文字按二元组分词）", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts
+        USING fts5(user_input, ai_response, tokenize = 'unicode61')
+        """,
+        """
+        INSERT INTO chat_history_fts (rowid, user_input, ai_response)
+        SELECT id, cjk_bigrams(user_input), cjk_bigrams(ai_response) FROM chat_history
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+            INSERT INTO chat_history_fts (rowid, user_input, ai_response)
+            VALUES (new.id, cjk_bigrams(new.user_input), cjk_bigrams(new.ai_response));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+            DELETE FROM chat_history_fts WHERE rowid = old.id;
+        END
+        """,
+    ]),
+    Migration(5, "添加按月份和会话分块压缩的归档表", [
+        """
+        CREATE TABLE IF NOT EXISTS chat_history_archive (
+            id INTEGER PRIMARY KEY,
+            month TEXT NOT NULL,
+            session_id TEXT,
+            first_at TEXT NOT NULL,
+            last_at TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            raw_bytes INTEGER NOT NULL,
+            compressed_bytes INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_archive_month ON chat_history_archive (month)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_history_archive_session
+        ON chat_history_archive (session_id, first_at)
+        """,
+    ]),
+]
+
+# 多个进程同时启动时，只允许一个进程执行迁移
+LOCK_NAME = "jarvis_schema_migrations"
+LOCK_TIMEOUT = 60
+
+
+def current_version(cursor) -> int:
+    """
+    查询已应用的最新迁移版本
+
+    Args:
+        cursor: 数据库游标
+
+    Returns:
+        int: 版本号，尚未迁移时为0
+    """
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+
+def _execute(cursor, statement: str):
+    """执行一条迁移语句，索引已存在（例如手动创建过）时跳过"""
+    from mysql.connector import Error, errorcode
+    try:
+        cursor.execute(statement)
+    except Error as e:
+        if e.errno != errorcode.ER_DUP_KEYNAME:
+            raise
+        logger.warning("索引已存在，跳过: %s", statement.strip())
+
+
+def apply_migrations(conn, target_version: Optional[int] = None) -> int:
+    """
+    把数据库升级到目标版本
+
+    Args:
+        conn: 已选择数据库的连接
+        target_version: 目标版本，默认升级到最新
+
+    Returns:
+        int: 升级后的版本号
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("等待其它进程完成数据库迁移超时")
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(200),
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            version = current_version(cursor)
+
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                if target_version is not None and migration.version > target_version:
+                    break
+                logger.info("应用数据库迁移 %s: %s", migration.version, migration.description)
+                # MySQL 的 DDL 会隐式提交，每条迁移完成后才记录版本
+                for statement in migration.statements:
+                    _execute(cursor, statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (migration.version, migration.description)
+                )
+                conn.commit()
+                version = migration.version
+
+            return version
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def apply_sqlite_migrations(conn, target_version: Optional[int] = None) -> int:
+    """
+    把 SQLite 数据库升级到目标版本，所有待执行的迁移在一个事务中完成
+
+    Args:
+        conn: 自动提交模式（isolation_level=None）的 sqlite3 连接
+        target_version: 目标版本，默认升级到最新
+
+    Returns:
+        int: 升级后的版本号
+    """
+    # BEGIN IMMEDIATE 取得写锁，多个进程同时启动时依次执行
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for migration in SQLITE_MIGRATIONS:
+            if migration.version <= version:
+                continue
+            if target_version is not None and migration.version > target_version:
+                break
+            logger.info("应用数据库迁移 %s: %s", migration.version, migration.description)
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+            version = migration.version
+        conn.execute("COMMIT")
+        return version
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
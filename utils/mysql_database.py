@@ -0,0 +1,598 @@
+"""
+MySQL数据库模块 - 基于共享连接池的对话记录存储
+"""
+import threading
+import time
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+from config import DB_CONFIG
+from utils.database import BaseDatabase
+from utils.fulltext import mysql_boolean_query
+from utils.logger import setup_logger
+from utils.migrations import apply_migrations
+from utils.retention import as_rollup_records, pack_records, unpack_records
+from utils.rollups import aggregate, histogram_percentile, latency_bucket_sql
+from utils.tracing import traced
+
+logger = setup_logger(__name__)
+
+# 进程内共享的连接池，首次使用时创建
+_pool = None
+_pool_lock = threading.Lock()
+
+def _connection_config() -> dict:
+    """连接参数（不含连接池设置）"""
+    return {key: DB_CONFIG[key] for key in ('host', 'port', 'user', 'password', 'database')}
+
+def _bootstrap_schema():
+    """创建数据库并执行迁移（每个进程只执行一次，由 get_pool 调用）"""
+    config = _connection_config()
+    database = config.pop('database')
+    conn = None
+    try:
+        conn = mysql.connector.connect(**config)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        cursor.execute(f"USE `{database}`")
+        
+        # 按版本升级表结构和索引
+        version = apply_migrations(conn)
+        logger.info("数据库 %s 初始化完成，结构版本: %s", database, version)
+    except Error as e:
+        logger.error("初始化数据库失败: %s", e)
+        raise
+    finally:
+        if conn is not None and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def get_pool() -> MySQLConnectionPool:
+    """
+    获取进程内共享的连接池，首次调用时初始化数据库结构并创建连接池
+    
+    Returns:
+        MySQLConnectionPool: 连接池
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _bootstrap_schema()
+                _pool = MySQLConnectionPool(
+                    pool_name="jarvis",
+                    pool_size=DB_CONFIG['pool_size'],
+                    pool_reset_session=True,
+                    **_connection_config()
+                )
+                logger.info("数据库连接池已创建，大小: %s", DB_CONFIG['pool_size'],
+                            extra={"event": "db.connected"})
+    return _pool
+
+class MySQLDatabase(BaseDatabase):
+    """MySQL对话记录存储"""
+    
+    name = "mysql"
+    
+    def __init__(self):
+        """初始化数据库（所有实例共享同一个连接池，数据库结构只初始化一次）"""
+        self.pool = get_pool()
+    
+    def _get_connection(self):
+        """
+        从连接池取出连接，连接池耗尽时等待其它线程归还
+        
+        取出时连接池会检查连接是否仍然可用，失效的连接自动重连。
+        """
+        deadline = time.monotonic() + DB_CONFIG['pool_timeout']
+        delay = 0.01
+        while True:
+            try:
+                return self.pool.get_connection()
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+    
+    @contextmanager
+    def cursor(self, dictionary: bool = False):
+        """
+        借用连接池中的连接执行语句，成功时提交，出错时回滚，结束后归还连接
+        
+        Args:
+            dictionary: 是否以字典形式返回查询结果
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            # 归还到连接池而不是断开
+            conn.close()
+    
+    @traced("db.save_chats", root=False)
+    def save_chats(self, records: list):
+        """
+        在一个事务中批量保存对话记录
+        
+        Args:
+            records: (session_id, timestamp, input_type, user_input, ai_response,
+                     model_used, response_time) 元组列表
+        """
+        if not records:
+            return
+        try:
+            with self.cursor() as cursor:
+                query = """
+                    INSERT INTO chat_history 
+                    (session_id, timestamp, input_type, user_input, ai_response, model_used, response_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+                cursor.executemany(query, records)
+                
+                # 在同一事务中累加统计汇总
+                self._update_rollups(cursor, aggregate(records))
+            logger.debug("批量保存 %s 条对话记录", len(records),
+                         extra={"event": "db.saved", "rows": len(records)})
+            
+        except Error as e:
+            logger.error("批量保存对话记录失败: %s", e)
+            raise
+
+    def _update_rollups(self, cursor, rollups: dict):
+        """
+        把汇总增量累加到汇总表
+        
+        Args:
+            cursor: 当前事务的游标
+            rollups: utils.rollups.aggregate 的返回值
+        """
+        cursor.executemany("""
+            INSERT INTO chat_stats_daily (day, model_used, input_type, turns, total_response_time)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE turns = turns + VALUES(turns),
+                                    total_response_time = total_response_time + VALUES(total_response_time)
+        """, rollups['daily'])
+        cursor.executemany("""
+            INSERT INTO chat_latency_histogram (day, model_used, bucket, turns)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE turns = turns + VALUES(turns)
+        """, rollups['histogram'])
+        if rollups['sessions']:
+            cursor.executemany("""
+                INSERT INTO chat_session_stats (session_id, turns, total_response_time, first_at, last_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE turns = turns + VALUES(turns),
+                                        total_response_time = total_response_time + VALUES(total_response_time),
+                                        first_at = LEAST(first_at, VALUES(first_at)),
+                                        last_at = GREATEST(last_at, VALUES(last_at))
+            """, rollups['sessions'])
+
+    @traced("db.get_chat_history", root=False)
+    def get_chat_history(self, session_id: str = None, limit: int = 10,
+                         before: tuple = None) -> list:
+        """
+        获取对话历史记录（按 (timestamp, id) 倒序，游标翻页）
+        
+        Args:
+            session_id: 可选的会话ID过滤
+            limit: 返回的记录数量限制
+            before: 上一页最后一条记录的 (timestamp, id)
+        
+        Returns:
+            list: 对话记录列表
+        """
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                conditions = []
+                params = []
+                if session_id:
+                    conditions.append("session_id = %s")
+                    params.append(session_id)
+                if before:
+                    # 展开写而不是 (timestamp, id) < (%s, %s)，保证能用索引做范围扫描
+                    conditions.append("(timestamp < %s OR (timestamp = %s AND id < %s))")
+                    params += [before[0], before[0], before[1]]
+                
+                # 二级索引隐含主键，(session_id, timestamp, id) / (timestamp, id) 顺序无需额外排序
+                query = "SELECT * FROM chat_history"
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                query += " ORDER BY timestamp DESC, id DESC LIMIT %s"
+                params.append(limit)
+                cursor.execute(query, params)
+                
+                results = cursor.fetchall()
+            logger.debug("获取到 %s 条对话记录", len(results))
+            return results
+        
+        except Error as e:
+            logger.error("获取对话记录失败: %s", e)
+            raise
+    
+    def iter_chat_history(self, session_id: str = None, batch_size: int = 1000):
+        """
+        使用非缓冲（服务端）游标逐批读取全部对话记录
+        
+        导出可能持续很久，使用单独的连接而不占用连接池。
+        
+        Args:
+            session_id: 可选的会话ID过滤
+            batch_size: 每次从连接读取的记录数
+        
+        Yields:
+            dict: 对话记录
+        """
+        conn = mysql.connector.connect(**_connection_config())
+        try:
+            # 消费端写文件较慢时，服务端等待发送的时间会变长
+            setup = conn.cursor()
+            setup.execute("SET SESSION net_write_timeout = 3600")
+            setup.close()
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            
+            # buffered=False: 结果留在服务端，按需从连接读取
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            if session_id:
+                cursor.execute("""
+                    SELECT * FROM chat_history
+                    WHERE session_id = %s
+                    ORDER BY timestamp, id
+                """, (session_id,))
+            else:
+                cursor.execute("SELECT * FROM chat_history ORDER BY timestamp, id")
+            
+            count = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+            cursor.close()
+            conn.commit()
+            logger.debug("读取了 %s 条对话记录", count)
+        
+        except Error as e:
+            logger.error("读取对话记录失败: %s", e)
+            raise
+        finally:
+            # 提前结束时结果未读完，直接断开连接而不是读完剩余的记录
+            conn.close()
+    
+    @traced("db.search_history", root=False)
+    def search_history(self, query: str, session_id: str = None,
+                       limit: int = 10, offset: int = 0) -> list:
+        """
+        全文检索对话记录（ngram 全文索引，布尔模式，按相关度排序）
+        
+        Args:
+            query: 检索词
+            session_id: 可选的会话ID过滤
+            limit: 每页记录数
+            offset: 跳过的记录数（翻页）
+            
+        Returns:
+            list: 对话记录字典列表，score 为相关度
+        """
+        against = mysql_boolean_query(query)
+        if not against:
+            return []
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                sql = """
+                    SELECT *, MATCH (user_input, ai_response) AGAINST (%s IN BOOLEAN MODE) as score
+                    FROM chat_history
+                    WHERE MATCH (user_input, ai_response) AGAINST (%s IN BOOLEAN MODE)
+                """
+                params = [against, against]
+                if session_id:
+                    sql += " AND session_id = %s"
+                    params.append(session_id)
+                sql += " ORDER BY score DESC LIMIT %s OFFSET %s"
+                params += [limit, offset]
+                
+                cursor.execute(sql, params)
+                results = cursor.fetchall()
+            logger.debug("检索到 %s 条对话记录: %s", len(results), query)
+            return results
+            
+        except Error as e:
+            logger.error("检索对话记录失败: %s", e)
+            raise
+
+    @traced("db.get_session_stats", root=False)
+    def get_session_stats(self, session_id: str = None) -> dict:
+        """
+        获取会话统计信息（从汇总表读取，耗时与记录总数无关）
+        
+        Args:
+            session_id: 可选的会话ID，提供时额外返回该会话的统计
+            
+        Returns:
+            dict: 包含统计信息的字典
+        """
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                stats = {}
+                
+                # 按输入类型统计，总对话数和平均响应时间由此合计
+                cursor.execute("""
+                    SELECT input_type, SUM(turns) as count, SUM(total_response_time) as total_time
+                    FROM chat_stats_daily 
+                    GROUP BY input_type
+                """)
+                rows = cursor.fetchall()
+                stats['input_types'] = {row['input_type']: int(row['count']) for row in rows}
+                stats['total'] = sum(stats['input_types'].values())
+                total_time = sum(float(row['total_time']) for row in rows)
+                stats['avg_response_time'] = total_time / stats['total'] if stats['total'] else None
+                
+                # 使用的模型统计
+                cursor.execute("""
+                    SELECT model_used, SUM(turns) as count 
+                    FROM chat_stats_daily 
+                    GROUP BY model_used
+                """)
+                stats['models'] = {row['model_used']: int(row['count']) 
+                                 for row in cursor.fetchall()}
+                
+                # 响应时间百分位数
+                cursor.execute("""
+                    SELECT bucket, SUM(turns) as count
+                    FROM chat_latency_histogram
+                    GROUP BY bucket
+                """)
+                counts = {row['bucket']: int(row['count']) for row in cursor.fetchall()}
+                stats['response_time_percentiles'] = {
+                    name: histogram_percentile(counts, q)
+                    for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+                }
+                
+                # 单个会话的统计
+                if session_id:
+                    cursor.execute("""
+                        SELECT session_id, turns, total_response_time, first_at, last_at
+                        FROM chat_session_stats
+                        WHERE session_id = %s
+                    """, (session_id,))
+                    stats['session'] = cursor.fetchone()
+            
+            logger.debug("统计信息获取成功")
+            return stats
+            
+        except Error as e:
+            logger.error("获取统计信息失败: %s", e)
+            raise
+
+    @traced("db.get_recent_sessions", root=False)
+    def get_recent_sessions(self, limit: int = 10) -> list:
+        """
+        获取最近活跃会话的统计
+        
+        Args:
+            limit: 返回的会话数量
+            
+        Returns:
+            list: 每个会话的对话数、平均响应时间和起止时间
+        """
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT session_id, turns, total_response_time / turns as avg_response_time,
+                           first_at, last_at
+                    FROM chat_session_stats
+                    ORDER BY last_at DESC
+                    LIMIT %s
+                """, (limit,))
+                return cursor.fetchall()
+            
+        except Error as e:
+            logger.error("获取会话统计失败: %s", e)
+            raise
+
+    @traced("db.clear_history", root=False)
+    def clear_history(self, session_id: str = None):
+        """
+        清除对话历史
+        
+        Args:
+            session_id: 可选的会话ID，如果提供则只清除该会话的记录
+        """
+        try:
+            with self.cursor() as cursor:
+                if session_id:
+                    # 先从汇总中扣除该会话的记录
+                    cursor.execute("""
+                        UPDATE chat_stats_daily d
+                        JOIN (
+                            SELECT DATE(timestamp) as day, COALESCE(model_used, '') as model_used,
+                                   COALESCE(input_type, '') as input_type,
+                                   COUNT(*) as turns, COALESCE(SUM(response_time), 0) as total_time
+                            FROM chat_history
+                            WHERE session_id = %s
+                            GROUP BY 1, 2, 3
+                        ) s ON d.day = s.day AND d.model_used = s.model_used AND d.input_type = s.input_type
+                        SET d.turns = d.turns - s.turns,
+                            d.total_response_time = d.total_response_time - s.total_time
+                    """, (session_id,))
+                    cursor.execute(f"""
+                        UPDATE chat_latency_histogram h
+                        JOIN (
+                            SELECT DATE(timestamp) as day, COALESCE(model_used, '') as model_used,
+                                   {latency_bucket_sql('response_time')} as bucket, COUNT(*) as turns
+                            FROM chat_history
+                            WHERE session_id = %s
+                            GROUP BY 1, 2, 3
+                        ) s ON h.day = s.day AND h.model_used = s.model_used AND h.bucket = s.bucket
+                        SET h.turns = h.turns - s.turns
+                    """, (session_id,))
+                    self._subtract_archived(cursor, session_id)
+                    cursor.execute("DELETE FROM chat_stats_daily WHERE turns <= 0")
+                    cursor.execute("DELETE FROM chat_latency_histogram WHERE turns <= 0")
+                    cursor.execute("DELETE FROM chat_session_stats WHERE session_id = %s", (session_id,))
+                    
+                    query = "DELETE FROM chat_history WHERE session_id = %s"
+                    cursor.execute(query, (session_id,))
+                    cursor.execute("DELETE FROM chat_history_archive WHERE session_id = %s", (session_id,))
+                else:
+                    cursor.execute("DELETE FROM chat_history")
+                    cursor.execute("DELETE FROM chat_history_archive")
+                    for table in ('chat_stats_daily', 'chat_latency_histogram', 'chat_session_stats'):
+                        cursor.execute(f"DELETE FROM {table}")
+            
+            logger.info("已清除%s的对话记录", '指定会话' if session_id else '所有')
+            
+        except Error as e:
+            logger.error("清除对话记录失败: %s", e)
+            raise 
+
+    def _subtract_archived(self, cursor, session_id: str):
+        """从汇总中扣除该会话已归档的记录"""
+        cursor.execute("SELECT payload FROM chat_history_archive WHERE session_id = %s", (session_id,))
+        archived = [record for (payload,) in cursor.fetchall() for record in unpack_records(payload)]
+        if not archived:
+            return
+        rollups = aggregate(as_rollup_records(archived))
+        cursor.executemany("""
+            UPDATE chat_stats_daily
+            SET turns = turns - %s, total_response_time = total_response_time - %s
+            WHERE day = %s AND model_used = %s AND input_type = %s
+        """, [
+            (turns, total, day, model_used, input_type)
+            for day, model_used, input_type, turns, total in rollups['daily']
+        ])
+        cursor.executemany("""
+            UPDATE chat_latency_histogram
+            SET turns = turns - %s
+            WHERE day = %s AND model_used = %s AND bucket = %s
+        """, [
+            (turns, day, model_used, bucket)
+            for day, model_used, bucket, turns in rollups['histogram']
+        ])
+    
+    @traced("db.archive_history", root=False)
+    def archive_history(self, cutoff, limit: int = 1000) -> int:
+        """
+        把最早的一批早于 cutoff 的记录压缩后移入归档表
+        
+        Args:
+            cutoff: 早于该时间的记录需要归档
+            limit: 本批最多归档的记录数
+            
+        Returns:
+            int: 本批归档的记录数
+        """
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                # 只锁住本批记录（沿 idx_chat_history_timestamp 从最早处扫描），
+                # 新写入的记录时间都晚于 cutoff，不会被阻塞
+                cursor.execute("""
+                    SELECT * FROM chat_history
+                    WHERE timestamp < %s
+                    ORDER BY timestamp, id
+                    LIMIT %s
+                    FOR UPDATE
+                """, (cutoff, limit))
+                records = cursor.fetchall()
+                if not records:
+                    return 0
+                
+                cursor.executemany("""
+                    INSERT INTO chat_history_archive
+                    (month, session_id, first_at, last_at, row_count, raw_bytes, compressed_bytes, payload)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, pack_records(records))
+                # 按主键删除，统计汇总保持不变
+                ids = [record['id'] for record in records]
+                cursor.execute(
+                    f"DELETE FROM chat_history WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+                )
+            logger.debug("归档 %s 条对话记录", len(records))
+            return len(records)
+            
+        except Error as e:
+            logger.error("归档对话记录失败: %s", e)
+            raise
+    
+    @traced("db.get_archived_history", root=False)
+    def get_archived_history(self, session_id: str = None, start=None, end=None) -> list:
+        """
+        读取已归档的对话记录
+        
+        Args:
+            session_id: 可选的会话ID过滤
+            start: 可选的起始时间（包含）
+            end: 可选的结束时间（不包含）
+            
+        Returns:
+            list: 对话记录字典列表（按时间正序）
+        """
+        try:
+            with self.cursor() as cursor:
+                conditions = []
+                params = []
+                if session_id:
+                    conditions.append("session_id = %s")
+                    params.append(session_id)
+                # 先按块的时间范围筛选，解压后再精确过滤
+                if start:
+                    conditions.append("last_at >= %s")
+                    params.append(start)
+                if end:
+                    conditions.append("first_at < %s")
+                    params.append(end)
+                
+                query = "SELECT payload FROM chat_history_archive"
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                cursor.execute(query, params)
+                payloads = [payload for (payload,) in cursor.fetchall()]
+            
+            results = [
+                record
+                for payload in payloads
+                for record in unpack_records(payload)
+                if (start is None or record['timestamp'] >= start) and (end is None or record['timestamp'] < end)
+            ]
+            results.sort(key=lambda record: (record['timestamp'], record['id']))
+            logger.debug("读取到 %s 条已归档的对话记录", len(results))
+            return results
+            
+        except Error as e:
+            logger.error("读取归档记录失败: %s", e)
+            raise
+    
+    def get_archive_stats(self) -> dict:
+        """
+        获取归档表的统计
+        
+        Returns:
+            dict: chunks / rows / raw_bytes / compressed_bytes / oldest / newest
+        """
+        try:
+            with self.cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) as chunks, COALESCE(SUM(row_count), 0) as `rows`,
+                           COALESCE(SUM(raw_bytes), 0) as raw_bytes,
+                           COALESCE(SUM(compressed_bytes), 0) as compressed_bytes,
+                           MIN(first_at) as oldest, MAX(last_at) as newest
+                    FROM chat_history_archive
+                """)
+                stats = cursor.fetchone()
+            # SUM 返回 Decimal
+            for key in ('rows', 'raw_bytes', 'compressed_bytes'):
+                stats[key] = int(stats[key])
+            return stats
+            
+        except Error as e:
+            logger.error("获取归档统计失败: %s", e)
+            raise
@@ -0,0 +1,273 @@
+"""
+保留策略模块 - 把超过保留期的对话记录压缩后移入归档表
+
+主表 chat_history 只保留最近的记录，查询和索引大小不随总记录数增长。
+更早的记录按 (月份, 会话) 分组，序列化为 JSONL 后用 zlib 压缩，
+每组一行存入 chat_history_archive。归档在后台线程中分批进行，
+每批在一个短事务中写入归档并按主键删除，不会长时间锁住主表。
+统计汇总表不受归档影响。
+
+用法:
+    python -m utils.retention --days 90            # 立即归档一次
+    python -m utils.retention --show <会话ID>      # 查看已归档的记录
+"""
+import argparse
+import atexit
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Optional
+
+from rich.console import Console
+
+from config import DB_CONFIG
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+console = Console()
+
+# 归档记录中保存的列（id 保留，便于与导出文件对照）
+ARCHIVE_COLUMNS = ("id", "session_id", "timestamp", "input_type", "user_input",
+                   "ai_response", "model_used", "response_time")
+
+# zlib 压缩级别：6 与 9 的压缩率相差很小，速度快得多
+COMPRESS_LEVEL = 6
+
+
+def pack_records(records: list) -> list:
+    """
+    把一批对话记录按 (月份, 会话) 分组并压缩
+
+    Args:
+        records: 按 (timestamp, id) 排序的对话记录字典
+
+    Returns:
+        list: (month, session_id, first_at, last_at, row_count, raw_bytes,
+              compressed_bytes, payload) 元组列表
+    """
+    def key(record):
+        return record["timestamp"].strftime("%Y-%m"), record["session_id"] or ""
+
+    chunks = []
+    for (month, session_id), group in groupby(sorted(records, key=key), key=key):
+        group = list(group)
+        raw = "\n".join(
+            json.dumps({column: _serialize(record.get(column)) for column in ARCHIVE_COLUMNS},
+                       ensure_ascii=False)
+            for record in group
+        ).encode("utf-8")
+        payload = zlib.compress(raw, COMPRESS_LEVEL)
+        chunks.append((
+            month,
+            session_id or None,
+            group[0]["timestamp"],
+            group[-1]["timestamp"],
+            len(group),
+            len(raw),
+            len(payload),
+            payload
+        ))
+    return chunks
+
+
+def unpack_records(payload: bytes) -> list:
+    """
+    解压一个归档块
+
+    Args:
+        payload: pack_records 生成的压缩数据
+
+    Returns:
+        list: 对话记录字典，timestamp 为 datetime
+    """
+    records = []
+    for line in zlib.decompress(payload).decode("utf-8").splitlines():
+        record = json.loads(line)
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+        records.append(record)
+    return records
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def as_rollup_records(records: list) -> list:
+    """把对话记录字典转换为 utils.rollups.aggregate 使用的元组"""
+    return [
+        (record["session_id"], record["timestamp"], record["input_type"], record["user_input"],
+         record["ai_response"], record["model_used"], record["response_time"])
+        for record in records
+    ]
+
+
+class RetentionPolicy:
+    """对话记录保留策略"""
+
+    def __init__(self, hot_days: int = None, batch_size: int = None, batch_pause: float = None):
+        """
+        Args:
+            hot_days: 记录在主表中保留的天数，0 表示不归档，默认读取配置
+            batch_size: 每批归档的记录数，默认读取配置
+            batch_pause: 两批之间的间隔（秒），让出写锁给正常的写入，默认读取配置
+        """
+        self.hot_days = DB_CONFIG["retention_days"] if hot_days is None else hot_days
+        self.batch_size = batch_size or DB_CONFIG["archive_batch_size"]
+        self.batch_pause = DB_CONFIG["archive_batch_pause"] if batch_pause is None else batch_pause
+
+    @property
+    def enabled(self) -> bool:
+        return self.hot_days > 0
+
+    def cutoff(self, now: datetime = None) -> datetime:
+        """早于该时间的记录需要归档"""
+        return (now or datetime.now()) - timedelta(days=self.hot_days)
+
+    def apply(self, db, stop: threading.Event = None) -> int:
+        """
+        分批归档所有超过保留期的记录
+
+        Args:
+            db: 数据库实例
+            stop: 设置后在当前批次完成后停止
+
+        Returns:
+            int: 本次归档的记录数
+        """
+        if not self.enabled:
+            return 0
+        cutoff = self.cutoff()
+        total = 0
+        start = time.perf_counter()
+        while stop is None or not stop.is_set():
+            archived = db.archive_history(cutoff, self.batch_size)
+            total += archived
+            if archived < self.batch_size:
+                break
+            if stop is not None:
+                stop.wait(self.batch_pause)
+            else:
+                time.sleep(self.batch_pause)
+        if total:
+            logger.info("归档了 %s 条 %s 之前的对话记录，耗时 %.1f秒",
+                        total, cutoff.date(), time.perf_counter() - start)
+        return total
+
+
+class ArchiveWorker:
+    """按固定间隔执行保留策略的后台线程"""
+
+    def __init__(self, db, policy: RetentionPolicy = None, interval: float = None):
+        """
+        初始化并启动后台线程（保留策略未启用时不启动）
+
+        Args:
+            db: 数据库实例
+            policy: 保留策略，默认读取配置
+            interval: 两次归档之间的间隔（秒），默认读取配置
+        """
+        self.db = db
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval or DB_CONFIG["archive_interval"]
+        self.archived = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = None
+        if self.policy.enabled:
+            self._thread = threading.Thread(target=self._run, name="chat-history-archiver", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.archived += self.policy.apply(self.db, stop=self._stop)
+                self.last_error = None
+            except Exception as e:
+                # 下一个周期重试，未归档的记录仍在主表中
+                self.last_error = str(e)
+                logger.error("归档对话记录失败: %s", e)
+            self._stop.wait(self.interval)
+
+    def close(self, timeout: float = 10.0):
+        """停止后台线程，等待当前批次完成"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_worker: Optional[ArchiveWorker] = None
+_worker_lock = threading.Lock()
+
+
+def start_archive_worker() -> ArchiveWorker:
+    """
+    启动进程内唯一的归档线程（重复调用返回同一个实例）
+
+    每个 Jarvis 实例（服务端每个会话一个）都会调用，但只有一个线程执行归档。
+    归档线程使用自己的数据库实例，不受会话关闭数据库的影响，进程退出时停止。
+
+    Returns:
+        ArchiveWorker: 归档线程；保留策略未启用时不启动线程
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            from utils.database import create_database
+
+            policy = RetentionPolicy()
+            db = create_database() if policy.enabled else None
+            _worker = ArchiveWorker(db, policy)
+            atexit.register(stop_archive_worker)
+    return _worker
+
+
+def stop_archive_worker():
+    """停止进程内的归档线程并关闭其数据库实例"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.close()
+        if worker.db is not None:
+            worker.db.close()
+
+
+def main():
+    """命令行入口"""
+    from utils.database import create_database
+
+    parser = argparse.ArgumentParser(description="归档超过保留期的对话记录")
+    parser.add_argument("--days", type=int, default=None, help="主表中保留的天数，默认读取配置")
+    parser.add_argument("--batch-size", type=int, default=None, help="每批归档的记录数")
+    parser.add_argument("--backend", default=None, help="数据库后端 (mysql / sqlite)，默认读取配置")
+    parser.add_argument("--show", metavar="SESSION_ID", default=None, help="显示指定会话已归档的记录，不执行归档")
+    args = parser.parse_args()
+
+    db = create_database(args.backend)
+    try:
+        if args.show:
+            for record in db.get_archived_history(session_id=args.show):
+                console.print(f"[dim]{record['timestamp']}[/dim] [green]用户:[/green] {record['user_input']}")
+                console.print(f"[blue]Jarvis:[/blue] {record['ai_response']}")
+            return
+
+        policy = RetentionPolicy(hot_days=args.days, batch_size=args.batch_size)
+        if not policy.enabled:
+            console.print("[yellow]保留策略未启用（保留天数为0）[/yellow]")
+            return
+        count = policy.apply(db)
+        stats = db.get_archive_stats()
+        console.print(f"[bold green]完成[/bold green] 归档 {count} 条记录；归档共 {stats['rows']} 条，"
+                      f"压缩后 {stats['compressed_bytes'] / 1024 / 1024:.1f}MB"
+                      f"（原始 {stats['raw_bytes'] / 1024 / 1024:.1f}MB）")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+统计汇总模块 - 把对话记录累加到按天、按模型、按会话的汇总行
+
+写入对话记录时在同一事务中更新汇总表，统计查询只读取汇总行，
+耗时与记录总数无关。响应时间按固定的区间计数，用于估算百分位数。
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+# 响应时间区间上界（秒），最后一个区间收集超过 120 秒的记录
+LATENCY_BUCKETS = (0.25, 0.5, 0.75, 1, 1.5, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 60, 120)
+
+
+def latency_bucket(seconds: Optional[float]) -> int:
+    """
+    响应时间所属的区间编号
+
+    Args:
+        seconds: 响应时间（秒）
+
+    Returns:
+        int: 区间编号，0 到 len(LATENCY_BUCKETS)
+    """
+    return bisect_left(LATENCY_BUCKETS, seconds or 0.0)
+
+
+def latency_bucket_sql(column: str) -> str:
+    """
+    与 latency_bucket 等价的SQL表达式，用于从原始记录回填或扣减汇总
+
+    Args:
+        column: 响应时间列名
+
+    Returns:
+        str: CASE 表达式
+    """
+    cases = " ".join(f"WHEN COALESCE({column}, 0) <= {bound} THEN {i}"
+                     for i, bound in enumerate(LATENCY_BUCKETS))
+    return f"CASE {cases} ELSE {len(LATENCY_BUCKETS)} END"
+
+
+def aggregate(records: Iterable[tuple]) -> dict:
+    """
+    把一批对话记录合并为汇总增量
+
+    Args:
+        records: (session_id, timestamp, input_type, user_input, ai_response,
+                 model_used, response_time) 元组
+
+    Returns:
+        dict: daily / histogram / sessions 三类汇总行
+    """
+    daily = defaultdict(lambda: [0, 0.0])
+    histogram = defaultdict(int)
+    sessions = {}
+    for session_id, timestamp, input_type, _, _, model_used, response_time in records:
+        day = timestamp.date()
+        model_used = model_used or ""
+        response_time = response_time or 0.0
+
+        row = daily[(day, model_used, input_type or "")]
+        row[0] += 1
+        row[1] += response_time
+        histogram[(day, model_used, latency_bucket(response_time))] += 1
+
+        if session_id is not None:
+            if session_id in sessions:
+                turns, total, first_at, last_at = sessions[session_id]
+                sessions[session_id] = (turns + 1, total + response_time,
+                                        min(first_at, timestamp), max(last_at, timestamp))
+            else:
+                sessions[session_id] = (1, response_time, timestamp, timestamp)
+
+    return {
+        "daily": [key + tuple(value) for key, value in daily.items()],
+        "histogram": [key + (count,) for key, count in histogram.items()],
+        "sessions": [(session_id,) + value for session_id, value in sessions.items()],
+    }
+
+
+def histogram_percentile(counts: Dict[int, int], q: float) -> Optional[float]:
+    """
+    根据区间计数估算百分位数（区间内线性插值）
+
+    Args:
+        counts: 区间编号 -> 记录数
+        q: 百分位（0~1）
+
+    Returns:
+        float: 估算的响应时间（秒），没有记录时返回None
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in sorted(counts):
+        count = counts[bucket]
+        if count <= 0:
+            continue
+        if seen + count >= rank:
+            lower = LATENCY_BUCKETS[bucket - 1] if bucket > 0 else 0.0
+            if bucket >= len(LATENCY_BUCKETS):
+                # 最后一个区间没有上界，返回下界
+                return lower
+            upper = LATENCY_BUCKETS[bucket]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return LATENCY_BUCKETS[-1]
@@ -0,0 +1,501 @@
+"""
+SQLite数据库模块 - 无需数据库服务器的嵌入式对话记录存储
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from utils.database import BaseDatabase
+from utils.fulltext import cjk_bigrams, fts5_query
+from utils.logger import setup_logger
+from utils.migrations import apply_sqlite_migrations
+from utils.retention import as_rollup_records, pack_records, unpack_records
+from utils.rollups import aggregate, histogram_percentile, latency_bucket_sql
+from utils.tracing import traced
+
+logger = setup_logger(__name__)
+
+# 语句保持不变，sqlite3 按连接缓存编译好的语句，重复执行时不再解析
+INSERT_CHAT = """
+    INSERT INTO chat_history
+    (session_id, timestamp, input_type, user_input, ai_response, model_used, response_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_DAILY = """
+    INSERT INTO chat_stats_daily (day, model_used, input_type, turns, total_response_time)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, model_used, input_type) DO UPDATE
+    SET turns = turns + excluded.turns,
+        total_response_time = total_response_time + excluded.total_response_time
+"""
+UPSERT_HISTOGRAM = """
+    INSERT INTO chat_latency_histogram (day, model_used, bucket, turns)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (day, model_used, bucket) DO UPDATE
+    SET turns = turns + excluded.turns
+"""
+UPSERT_SESSION = """
+    INSERT INTO chat_session_stats (session_id, turns, total_response_time, first_at, last_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE
+    SET turns = turns + excluded.turns,
+        total_response_time = total_response_time + excluded.total_response_time,
+        first_at = MIN(first_at, excluded.first_at),
+        last_at = MAX(last_at, excluded.last_at)
+"""
+INSERT_ARCHIVE = """
+    INSERT INTO chat_history_archive
+    (month, session_id, first_at, last_at, row_count, raw_bytes, compressed_bytes, payload)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SUBTRACT_DAILY = """
+    UPDATE chat_stats_daily
+    SET turns = turns - ?, total_response_time = total_response_time - ?
+    WHERE day = ? AND model_used = ? AND input_type = ?
+"""
+SUBTRACT_HISTOGRAM = """
+    UPDATE chat_latency_histogram
+    SET turns = turns - ?
+    WHERE day = ? AND model_used = ? AND bucket = ?
+"""
+
+# 以文本保存的时间列，读取时转换回 datetime
+DATETIME_COLUMNS = ("timestamp", "first_at", "last_at")
+
+def _format_datetime(value: datetime) -> str:
+    """统一精确到微秒，保证按字符串排序与按时间排序一致"""
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+def _to_dict(row: sqlite3.Row) -> dict:
+    record = dict(row)
+    for column in DATETIME_COLUMNS:
+        if isinstance(record.get(column), str):
+            record[column] = datetime.fromisoformat(record[column])
+    return record
+
+class SQLiteDatabase(BaseDatabase):
+    """
+    SQLite对话记录存储
+
+    - WAL 模式：读取不阻塞写入，提交只追加日志
+    - 每个线程一个连接，语句按连接缓存
+    - 每批记录及其统计汇总在一个事务中写入
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/jarvis.db", busy_timeout: float = 5.0):
+        """
+        打开（或创建）数据库并升级表结构
+
+        Args:
+            path: 数据库文件路径，":memory:" 表示内存数据库（每个线程各自独立，仅用于单线程测试）
+            busy_timeout: 其它进程持有写锁时等待的最长时间（秒）
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        version = apply_sqlite_migrations(self._connection())
+        logger.info("SQLite数据库 %s 已打开，结构版本: %s", path, version,
+                    extra={"event": "db.connected"})
+
+    def _connection(self) -> sqlite3.Connection:
+        """当前线程的连接，首次使用时打开"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: 由 _transaction 显式控制事务边界
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=128
+            )
+            conn.row_factory = sqlite3.Row
+            # 全文索引的触发器在写入时调用
+            conn.create_function("cjk_bigrams", 1, cjk_bigrams, deterministic=True)
+            conn.execute("PRAGMA journal_mode = WAL")
+            # WAL 模式下 NORMAL 不会损坏数据库，只在断电时可能丢失最近的提交
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -16000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = False):
+        """
+        在一个事务中执行，成功时提交，出错时回滚
+
+        Args:
+            write: 是否写入；写事务立即取得写锁，避免读后升级写锁时死锁
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @traced("db.save_chats", root=False)
+    def save_chats(self, records: list):
+        if not records:
+            return
+        rows = [
+            (session_id, _format_datetime(timestamp), input_type, user_input,
+             ai_response, model_used, response_time)
+            for session_id, timestamp, input_type, user_input, ai_response, model_used, response_time
+            in records
+        ]
+        rollups = aggregate(records)
+        try:
+            with self._transaction(write=True) as conn:
+                conn.executemany(INSERT_CHAT, rows)
+
+                # 在同一事务中累加统计汇总
+                conn.executemany(UPSERT_DAILY, [
+                    (day.isoformat(),) + tuple(row) for day, *row in rollups['daily']
+                ])
+                conn.executemany(UPSERT_HISTOGRAM, [
+                    (day.isoformat(),) + tuple(row) for day, *row in rollups['histogram']
+                ])
+                conn.executemany(UPSERT_SESSION, [
+                    (session_id, turns, total, _format_datetime(first_at), _format_datetime(last_at))
+                    for session_id, turns, total, first_at, last_at in rollups['sessions']
+                ])
+            logger.debug("批量保存 %s 条对话记录", len(records),
+                         extra={"event": "db.saved", "rows": len(records)})
+
+        except sqlite3.Error as e:
+            logger.error("批量保存对话记录失败: %s", e)
+            raise
+
+    @traced("db.get_chat_history", root=False)
+    def get_chat_history(self, session_id: str = None, limit: int = 10,
+                         before: tuple = None) -> list:
+        try:
+            conditions = []
+            params = []
+            if session_id:
+                conditions.append("session_id = ?")
+                params.append(session_id)
+            if before:
+                # 行值比较可以直接用 (session_id, timestamp) / (timestamp) 索引（隐含 rowid）做范围扫描
+                conditions.append("(timestamp, id) < (?, ?)")
+                params += [_format_datetime(before[0]), before[1]]
+
+            sql = "SELECT * FROM chat_history"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            params.append(limit)
+
+            results = [_to_dict(row) for row in self._connection().execute(sql, params)]
+            logger.debug("获取到 %s 条对话记录", len(results))
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("获取对话记录失败: %s", e)
+            raise
+
+    def iter_chat_history(self, session_id: str = None, batch_size: int = 1000):
+        if self.path == ":memory:":
+            # 内存数据库无法从另一个连接打开
+            yield from (_to_dict(row) for row in self._connection().execute(
+                "SELECT * FROM chat_history WHERE ? IS NULL OR session_id = ? ORDER BY timestamp, id",
+                (session_id, session_id)))
+            return
+
+        # 单独的连接：生成器可能跨线程或与其它查询交错使用，读事务不能影响当前线程的连接
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            # WAL 模式下读事务看到的是开始时的快照，且不阻塞写入
+            conn.execute("BEGIN")
+            if session_id:
+                cursor = conn.execute("""
+                    SELECT * FROM chat_history
+                    WHERE session_id = ?
+                    ORDER BY timestamp, id
+                """, (session_id,))
+            else:
+                cursor = conn.execute("SELECT * FROM chat_history ORDER BY timestamp, id")
+
+            # sqlite3 按需逐行执行查询，fetchmany 不会读取整个结果集
+            count = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                count += len(rows)
+                for row in rows:
+                    yield _to_dict(row)
+            logger.debug("读取了 %s 条对话记录", count)
+
+        except sqlite3.Error as e:
+            logger.error("读取对话记录失败: %s", e)
+            raise
+        finally:
+            conn.close()
+
+    @traced("db.search_history", root=False)
+    def search_history(self, query: str, session_id: str = None,
+                       limit: int = 10, offset: int = 0) -> list:
+        match = fts5_query(query)
+        if not match:
+            return []
+        try:
+            # bm25 越小越相关，用户输入的权重高于AI回复
+            sql = """
+                SELECT h.*, -bm25(chat_history_fts, 2.0, 1.0) as score
+                FROM chat_history_fts
+                JOIN chat_history h ON h.id = chat_history_fts.rowid
+                WHERE chat_history_fts MATCH ?
+            """
+            params = [match]
+            if session_id:
+                sql += " AND h.session_id = ?"
+                params.append(session_id)
+            sql += " ORDER BY bm25(chat_history_fts, 2.0, 1.0) LIMIT ? OFFSET ?"
+            params += [limit, offset]
+
+            results = [_to_dict(row) for row in self._connection().execute(sql, params)]
+            logger.debug("检索到 %s 条对话记录: %s", len(results), query)
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("检索对话记录失败: %s", e)
+            raise
+
+    @traced("db.get_session_stats", root=False)
+    def get_session_stats(self, session_id: str = None) -> dict:
+        try:
+            # 在同一个读事务中读取，各项统计来自同一个快照
+            with self._transaction() as conn:
+                stats = {}
+
+                rows = conn.execute("""
+                    SELECT input_type, SUM(turns) as count, SUM(total_response_time) as total_time
+                    FROM chat_stats_daily
+                    GROUP BY input_type
+                """).fetchall()
+                stats['input_types'] = {row['input_type']: row['count'] for row in rows}
+                stats['total'] = sum(stats['input_types'].values())
+                total_time = sum(row['total_time'] for row in rows)
+                stats['avg_response_time'] = total_time / stats['total'] if stats['total'] else None
+
+                stats['models'] = {
+                    row['model_used']: row['count']
+                    for row in conn.execute("""
+                        SELECT model_used, SUM(turns) as count
+                        FROM chat_stats_daily
+                        GROUP BY model_used
+                    """)
+                }
+
+                counts = {
+                    row['bucket']: row['count']
+                    for row in conn.execute("""
+                        SELECT bucket, SUM(turns) as count
+                        FROM chat_latency_histogram
+                        GROUP BY bucket
+                    """)
+                }
+                stats['response_time_percentiles'] = {
+                    name: histogram_percentile(counts, q)
+                    for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+                }
+
+                if session_id:
+                    row = conn.execute("""
+                        SELECT session_id, turns, total_response_time, first_at, last_at
+                        FROM chat_session_stats
+                        WHERE session_id = ?
+                    """, (session_id,)).fetchone()
+                    stats['session'] = _to_dict(row) if row else None
+
+            logger.debug("统计信息获取成功")
+            return stats
+
+        except sqlite3.Error as e:
+            logger.error("获取统计信息失败: %s", e)
+            raise
+
+    @traced("db.get_recent_sessions", root=False)
+    def get_recent_sessions(self, limit: int = 10) -> list:
+        try:
+            cursor = self._connection().execute("""
+                SELECT session_id, turns, total_response_time / turns as avg_response_time,
+                       first_at, last_at
+                FROM chat_session_stats
+                ORDER BY last_at DESC
+                LIMIT ?
+            """, (limit,))
+            return [_to_dict(row) for row in cursor]
+
+        except sqlite3.Error as e:
+            logger.error("获取会话统计失败: %s", e)
+            raise
+
+    @traced("db.clear_history", root=False)
+    def clear_history(self, session_id: str = None):
+        try:
+            with self._transaction(write=True) as conn:
+                if session_id:
+                    # 先从汇总中扣除该会话的记录
+                    daily = conn.execute("""
+                        SELECT COUNT(*), COALESCE(SUM(response_time), 0), substr(timestamp, 1, 10),
+                               COALESCE(model_used, ''), COALESCE(input_type, '')
+                        FROM chat_history
+                        WHERE session_id = ?
+                        GROUP BY 3, 4, 5
+                    """, (session_id,)).fetchall()
+                    conn.executemany(SUBTRACT_DAILY, [tuple(row) for row in daily])
+
+                    histogram = conn.execute(f"""
+                        SELECT COUNT(*), substr(timestamp, 1, 10), COALESCE(model_used, ''),
+                               {latency_bucket_sql('response_time')}
+                        FROM chat_history
+                        WHERE session_id = ?
+                        GROUP BY 2, 3, 4
+                    """, (session_id,)).fetchall()
+                    conn.executemany(SUBTRACT_HISTOGRAM, [tuple(row) for row in histogram])
+
+                    # 已归档的记录也计入了汇总
+                    archived = [
+                        record
+                        for row in conn.execute(
+                            "SELECT payload FROM chat_history_archive WHERE session_id = ?", (session_id,))
+                        for record in unpack_records(row['payload'])
+                    ]
+                    if archived:
+                        rollups = aggregate(as_rollup_records(archived))
+                        conn.executemany(SUBTRACT_DAILY, [
+                            (turns, total, day.isoformat(), model_used, input_type)
+                            for day, model_used, input_type, turns, total in rollups['daily']
+                        ])
+                        conn.executemany(SUBTRACT_HISTOGRAM, [
+                            (turns, day.isoformat(), model_used, bucket)
+                            for day, model_used, bucket, turns in rollups['histogram']
+                        ])
+
+                    conn.execute("DELETE FROM chat_stats_daily WHERE turns <= 0")
+                    conn.execute("DELETE FROM chat_latency_histogram WHERE turns <= 0")
+                    conn.execute("DELETE FROM chat_session_stats WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM chat_history_archive WHERE session_id = ?", (session_id,))
+                else:
+                    for table in ('chat_history', 'chat_history_archive', 'chat_stats_daily',
+                                  'chat_latency_histogram', 'chat_session_stats'):
+                        conn.execute(f"DELETE FROM {table}")
+
+            logger.info("已清除%s的对话记录", '指定会话' if session_id else '所有')
+
+        except sqlite3.Error as e:
+            logger.error("清除对话记录失败: %s", e)
+            raise
+
+    @traced("db.archive_history", root=False)
+    def archive_history(self, cutoff: datetime, limit: int = 1000) -> int:
+        try:
+            with self._transaction(write=True) as conn:
+                # 按 (timestamp, id) 从最早的记录开始，走 idx_chat_history_timestamp 的范围扫描
+                records = [_to_dict(row) for row in conn.execute("""
+                    SELECT * FROM chat_history
+                    WHERE timestamp < ?
+                    ORDER BY timestamp, id
+                    LIMIT ?
+                """, (_format_datetime(cutoff), limit))]
+                if not records:
+                    return 0
+
+                conn.executemany(INSERT_ARCHIVE, [
+                    (month, session_id, _format_datetime(first_at), _format_datetime(last_at),
+                     row_count, raw_bytes, compressed_bytes, payload)
+                    for month, session_id, first_at, last_at, row_count, raw_bytes, compressed_bytes, payload
+                    in pack_records(records)
+                ])
+                # 按主键删除（全文索引由触发器同步删除），统计汇总保持不变
+                conn.executemany("DELETE FROM chat_history WHERE id = ?",
+                                 [(record['id'],) for record in records])
+
+            logger.debug("归档 %s 条对话记录", len(records))
+            return len(records)
+
+        except sqlite3.Error as e:
+            logger.error("归档对话记录失败: %s", e)
+            raise
+
+    @traced("db.get_archived_history", root=False)
+    def get_archived_history(self, session_id: str = None, start: datetime = None,
+                             end: datetime = None) -> list:
+        try:
+            conditions = []
+            params = []
+            if session_id:
+                conditions.append("session_id = ?")
+                params.append(session_id)
+            # 先按块的时间范围筛选，解压后再精确过滤
+            if start:
+                conditions.append("last_at >= ?")
+                params.append(_format_datetime(start))
+            if end:
+                conditions.append("first_at < ?")
+                params.append(_format_datetime(end))
+
+            sql = "SELECT payload FROM chat_history_archive"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+
+            results = [
+                record
+                for row in self._connection().execute(sql, params)
+                for record in unpack_records(row['payload'])
+                if (start is None or record['timestamp'] >= start) and (end is None or record['timestamp'] < end)
+            ]
+            results.sort(key=lambda record: (record['timestamp'], record['id']))
+            logger.debug("读取到 %s 条已归档的对话记录", len(results))
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("读取归档记录失败: %s", e)
+            raise
+
+    def get_archive_stats(self) -> dict:
+        try:
+            row = self._connection().execute("""
+                SELECT COUNT(*) as chunks, COALESCE(SUM(row_count), 0) as rows,
+                       COALESCE(SUM(raw_bytes), 0) as raw_bytes,
+                       COALESCE(SUM(compressed_bytes), 0) as compressed_bytes,
+                       MIN(first_at) as oldest, MAX(last_at) as newest
+                FROM chat_history_archive
+            """).fetchone()
+            stats = dict(row)
+            for column in ('oldest', 'newest'):
+                if stats[column]:
+                    stats[column] = datetime.fromisoformat(stats[column])
+            return stats
+
+        except sqlite3.Error as e:
+            logger.error("获取归档统计失败: %s", e)
+            raise
+
+    def close(self):
+        """关闭所有线程打开的连接"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -0,0 +1,423 @@
+"""
+请求追踪模块 - 用 trace / span 记录一轮对话在各阶段的耗时
+
+一轮对话（语音识别、模型生成、语音合成、播放、数据库）属于同一个 trace，
+每个阶段是一个 span。当前 span 保存在 contextvars 中，同一线程内以及
+asyncio.to_thread 中嵌套的 span 自动成为它的子 span；交给其它线程的工作
+需要显式传递 parent。结束的 span 以 JSONL 写入 TRACE_CONFIG["path"]，
+最近几轮保留在内存中，用于显示瀑布图。
+
+用法:
+    python -m utils.tracing logs/traces.jsonl --last 3     # 显示最近3轮的瀑布图
+    python -m utils.tracing logs/traces.jsonl --trace <trace_id>
+"""
+import argparse
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import TRACE_CONFIG
+
+# 注意：utils.logger 导入本模块（日志中的 trace_id），这里不能在模块级别导入 utils.logger
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    """一个阶段的耗时记录"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_time", "_start",
+                 "duration", "attributes", "events", "error")
+
+    def __init__(self, name: str, trace_id: str = None, parent_id: str = None, attributes: dict = None):
+        self.trace_id = trace_id or _new_id(8)
+        self.span_id = _new_id(4)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes or {}
+        self.events = []
+        self.error: Optional[str] = None
+
+    @property
+    def ended(self) -> bool:
+        return self.duration is not None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        """记录阶段内的一个时间点（例如首个token、首个音频块）"""
+        self.events.append((name, time.perf_counter() - self._start, attributes))
+
+    def end(self, error: BaseException = None):
+        """结束 span 并导出（重复调用无效）"""
+        if self.ended:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _get_collector().record(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "events": [
+                {"name": name, "offset": offset, "attributes": attributes}
+                for name, offset, attributes in self.events
+            ],
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Span":
+        span = cls.__new__(cls)
+        span.trace_id = data["trace_id"]
+        span.span_id = data["span_id"]
+        span.parent_id = data["parent_id"]
+        span.name = data["name"]
+        span.start_time = data["start"]
+        span._start = None
+        span.duration = data["duration"]
+        span.attributes = data["attributes"]
+        span.events = [(e["name"], e["offset"], e["attributes"]) for e in data["events"]]
+        span.error = data["error"]
+        return span
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中的 span"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def start_span(name: str, parent: Span = None, **attributes) -> Span:
+    """
+    开始一个 span，不改变当前上下文（用于跨线程传递或手动结束的阶段）
+
+    Args:
+        name: 阶段名称，如 "llm.generate"
+        parent: 父 span，默认为当前上下文中的 span；都没有时开始新的 trace
+        **attributes: 附加属性
+
+    Returns:
+        Span: 需要调用 end() 结束
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        return Span(name, attributes=attributes)
+    return Span(name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, parent: Span = None, **attributes):
+    """
+    在 with 块中记录一个阶段，块内的日志和嵌套 span 都属于它
+
+    Args:
+        name: 阶段名称
+        parent: 父 span，默认为当前上下文中的 span
+        **attributes: 附加属性
+    """
+    current = start_span(name, parent, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def use_span(parent: Optional[Span]):
+    """
+    在 with 块中把已有的 span 设为当前 span（用于在工作线程中恢复调用方的上下文）
+
+    Args:
+        parent: 从其它线程传来的 span，为 None 时不改变上下文
+    """
+    if parent is None:
+        yield None
+        return
+    token = _current_span.set(parent)
+    try:
+        yield parent
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str, root: bool = True):
+    """
+    把函数调用记录为一个 span 的装饰器
+
+    Args:
+        name: 阶段名称
+        root: 不在任何 trace 中调用时是否开始新的 trace；为 False 时只记录属于某一轮
+              对话的调用，后台批量写入、归档等调用不产生孤立的 trace
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not root and _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceContextFilter(logging.Filter):
+    """在日志记录中加入当前的 trace_id（需要在调用线程中执行）"""
+
+    def filter(self, record):
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class JsonlSpanExporter:
+    """在后台线程中把结束的 span 逐行追加到 JSONL 文件"""
+
+    _STOP = object()
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 输出文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                span = self._queue.get()
+                # 把已排队的 span 一次写完再刷新
+                batch = [span]
+                while not self._queue.empty() and batch[-1] is not self._STOP:
+                    batch.append(self._queue.get())
+                for item in batch:
+                    if item is self._STOP:
+                        f.flush()
+                        return
+                    try:
+                        f.write(json.dumps(item.to_dict(), ensure_ascii=False, default=str))
+                        f.write("\n")
+                    except Exception as e:
+                        from utils.logger import setup_logger
+                        setup_logger(__name__).error("导出span失败: %s", e)
+                f.flush()
+
+    def close(self, timeout: float = 5.0):
+        """写完队列中剩余的 span"""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+
+class TraceCollector:
+    """保留最近几轮 trace 的 span（用于瀑布图），并交给导出器"""
+
+    def __init__(self, max_traces: int = 50, exporter: JsonlSpanExporter = None):
+        """
+        Args:
+            max_traces: 内存中保留的 trace 数量
+            exporter: 可选的导出器
+        """
+        self.max_traces = max_traces
+        self.exporter = exporter
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def get_trace(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return list(self._traces.get(trace_id, ()))
+
+
+_collector: Optional[TraceCollector] = None
+_collector_lock = threading.Lock()
+
+
+def _get_collector() -> TraceCollector:
+    global _collector
+    if _collector is None:
+        with _collector_lock:
+            if _collector is None:
+                exporter = JsonlSpanExporter(TRACE_CONFIG["path"]) if TRACE_CONFIG["enabled"] else None
+                if exporter is not None:
+                    atexit.register(exporter.close)
+                _collector = TraceCollector(TRACE_CONFIG["max_traces"], exporter)
+    return _collector
+
+
+def get_trace(trace_id: str) -> List[Span]:
+    """
+    获取内存中某个 trace 已结束的 span
+
+    Args:
+        trace_id: trace ID
+
+    Returns:
+        list: Span 列表
+    """
+    return _get_collector().get_trace(trace_id)
+
+
+def waterfall(spans: List[Span]) -> List[dict]:
+    """
+    把一个 trace 的 span 排列为瀑布图的行（父 span 在前，同级按开始时间排序）
+
+    Args:
+        spans: 同一个 trace 的 span
+
+    Returns:
+        list: 每行包含 depth / name / offset / duration / attributes / error，
+              事件行的 duration 为 None；时间单位为秒，offset 相对于最早的 span
+    """
+    if not spans:
+        return []
+    origin = min(span.start_time for span in spans)
+    ids = {span.span_id for span in spans}
+    children: Dict[Optional[str], List[Span]] = {}
+    for span in spans:
+        # 父 span 尚未结束（或不在内存中）时作为顶层显示
+        parent = span.parent_id if span.parent_id in ids else None
+        children.setdefault(parent, []).append(span)
+
+    rows = []
+
+    def visit(parent_id, depth):
+        for span in sorted(children.get(parent_id, ()), key=lambda s: s.start_time):
+            offset = span.start_time - origin
+            rows.append({"depth": depth, "name": span.name, "offset": offset,
+                         "duration": span.duration, "attributes": span.attributes, "error": span.error})
+            for name, event_offset, attributes in span.events:
+                rows.append({"depth": depth + 1, "name": f"· {name}", "offset": offset + event_offset,
+                             "duration": None, "attributes": attributes, "error": None})
+            visit(span.span_id, depth + 1)
+
+    visit(None, 0)
+    return rows
+
+
+def format_waterfall(spans: List[Span], width: int = 40) -> str:
+    """
+    以文本形式显示瀑布图
+
+    Args:
+        spans: 同一个 trace 的 span
+        width: 时间条的宽度（字符）
+
+    Returns:
+        str: 多行文本
+    """
+    rows = waterfall(spans)
+    if not rows:
+        return ""
+    total = max(row["offset"] + (row["duration"] or 0) for row in rows) or 1e-9
+    name_width = max(2 * row["depth"] + len(row["name"]) for row in rows)
+
+    lines = [f"trace {spans[0].trace_id}  "
+             f"{datetime.fromtimestamp(min(s.start_time for s in spans)):%Y-%m-%d %H:%M:%S}  "
+             f"共 {total * 1000:.0f}ms"]
+    for row in rows:
+        start = int(row["offset"] / total * width)
+        if row["duration"] is None:
+            bar = " " * start + "|"
+            timing = f"@{row['offset'] * 1000:8.0f}ms"
+        else:
+            length = max(1, round(row["duration"] / total * width))
+            bar = " " * start + "█" * length
+            timing = f"{row['duration'] * 1000:9.0f}ms"
+        label = ("  " * row["depth"] + row["name"]).ljust(name_width)
+        suffix = f"  ! {row['error']}" if row["error"] else ""
+        lines.append(f"{label}  {timing}  {bar.ljust(width)}{suffix}")
+    return "\n".join(lines)
+
+
+def load_spans(path: str) -> "OrderedDict[str, List[Span]]":
+    """
+    从 JSONL 文件读取 span，按 trace 分组（按首次出现的顺序）
+
+    Args:
+        path: JSONL 文件路径
+
+    Returns:
+        OrderedDict: trace_id -> Span 列表
+    """
+    traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = Span.from_dict(json.loads(line))
+                traces.setdefault(span.trace_id, []).append(span)
+    return traces
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="显示请求追踪的瀑布图")
+    parser.add_argument("path", nargs="?", default=TRACE_CONFIG["path"], help="span JSONL 文件")
+    parser.add_argument("--trace", default=None, help="只显示指定的 trace")
+    parser.add_argument("--last", type=int, default=1, help="显示最近几个 trace")
+    parser.add_argument("--name", default=None, help="只显示包含该名称 span 的 trace，如 chat.turn")
+    args = parser.parse_args()
+
+    traces = load_spans(args.path)
+    if args.trace:
+        selected = [traces.get(args.trace, [])]
+    else:
+        selected = [spans for spans in traces.values()
+                    if args.name is None or any(s.name == args.name for s in spans)][-args.last:]
+    for spans in selected:
+        print(format_waterfall(spans))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -134,6 +134,29 @@ class WebSocketService {
     }
   }
 
+  // 打断正在生成的回答
+  public cancel() {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({
+        type: 'cancel',
+        sessionId: this.sessionId,
+      }));
+    }
+  }
+
+  // 全文检索对话历史，结果以 type 为 'search_results' 的消息返回
+  public search(query: string, offset: number = 0, currentSessionOnly: boolean = false) {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({
+        type: 'search',
+        sessionId: this.sessionId,
+        query,
+        offset,
+        currentSessionOnly,
+      }));
+    }
+  }
+
   private saveMessageToLocal(message: string, options: any) {
     const pendingMessages = JSON.parse(localStorage.getItem('pendingMessages') || '[]');
     pendingMessages.push({ message, options, timestamp: Date.now() });